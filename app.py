@@ -1,18 +1,23 @@
 import os
 import json
-import asyncio
 import threading
+import contextlib
 from datetime import datetime, timezone
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, render_template_string
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, render_template_string, Response, stream_with_context, send_file
 import logging
 
-# Import our main scraper
-from main_master_only import JobSyncApplication, Config, GoogleSheetManager, Notifier
+# The scraper (main_master_only: pandas, gspread, google-auth, Selenium) is imported on first use
+# so that gunicorn boot and /health do not pay for it; only the plain settings are loaded here
+from sync_config import Config
+from status_store import StatusStore, StatusLogHandler, RunHeartbeat
+from stats_store import StatsStore
+from search_index import SearchIndex
+from browser_watchdog import load_status as load_browser_status
+from exporter import parse_since, filter_rows, stream_csv, stream_xlsx
+from sync_profiler import SyncProfiler, profiling_requested, list_profiles, load_profile, profile_file
+from asset_cache import AssetCache, cached_response, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)  # /static is served from the in-memory asset cache below
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'your-secret-key-change-this')
 
 # Configure logging
@@ -20,48 +25,70 @@ logging.basicConfig(level=logging.INFO)
 logging.getLogger('werkzeug').setLevel(logging.WARNING)  # Reduce Flask logs
 logger = logging.getLogger(__name__)
 
-# Global variables to track scraping status
-scraping_status = {
-    'is_running': False,
-    'last_run': None,
-    'last_result': None,
-    'progress': '',
-    'logs': []
-}
-
-def add_log(message):
-    """Add log message with timestamp"""
-    timestamp = datetime.now().strftime('%H:%M:%S')
-    log_entry = f"[{timestamp}] {message}"
-    scraping_status['logs'].append(log_entry)
-    if len(scraping_status['logs']) > 100:  # Keep only last 100 logs
-        scraping_status['logs'] = scraping_status['logs'][-100:]
-    logger.info(message)
-
-def run_scraping_sync():
-    """Run scraping in sync context"""
-    global scraping_status
+# Shared scraping status (SQLite, visible to every gunicorn worker)
+status_store = StatusStore(lock_ttl=int(os.environ.get('SYNC_LOCK_TTL', 1800)))
+
+# Sync modules log through `logging`; while a sync runs their records also go to the ring buffer
+SYNC_LOGGERS = ('main_master_only', 'sync_checkpoint', 'snapshot_store', 'stats_store', 'search_index', 'schema_registry', 'browser_watchdog')
+
+# Dashboard aggregates, maintained incrementally by each sync
+stats_store = StatsStore(finished_tab=Config.TAB_NAMES.get(Config.FINISHED_TAB))
+
+# Full-text index over Master_Data (loaded on the first search, then follows each sync's changes)
+search_index = SearchIndex()
+
+# Static files and static pages, cached in memory with gzip/brotli variants and strong ETags
+asset_cache = AssetCache(os.path.join(app.root_path, 'static'))
+
+@app.template_global()
+def asset_url(filename):
+    """Versioned static URL (changes whenever the file content changes)"""
+    return url_for('static', filename=filename, v=asset_cache.version(filename))
+
+def add_log(message, level='INFO', stage=None, tab=None):
+    """Add a structured log record (timestamp is added by the store)"""
+    status_store.add_log(message, level=level, stage=stage, tab=tab)  # Fixed-capacity ring buffer
+    logger.log(logging.getLevelName(level), message)
+
+def run_scraping_sync(owner, profile=False):
+    """Run scraping in sync context (caller must hold the run lock as `owner`)"""
+    last_result = None
+    progress = None
+    sync_log_handler = StatusLogHandler(status_store, default_stage='sync')
+    for name in SYNC_LOGGERS:
+        logging.getLogger(name).addHandler(sync_log_handler)
+    # Renew the run lock for the whole sync (a sync may outlast SYNC_LOCK_TTL)
+    heartbeat = RunHeartbeat(status_store, owner).start()
     try:
-        scraping_status['is_running'] = True
-        scraping_status['progress'] = 'กำลังเริ่มต้น...'
-        add_log('🚀 Starting job synchronization...')
+        status_store.update(owner, progress='กำลังเริ่มต้น...')
+        add_log('🚀 Starting job synchronization...', stage='sync')
         
+        from main_master_only import JobSyncApplication
         app_config = Config()
         app_instance = JobSyncApplication(app_config)
+        # Lost lock = another worker took over: stop before the next tab / Sheets write
+        app_instance.cancelled = heartbeat.lost
         
-        scraping_status['progress'] = 'กำลังดำเนินการ...'
+        status_store.update(owner, progress='กำลังดำเนินการ...')
         
         # ✅ เปลี่ยนจาก app_instance.run() เป็น:
         # ตรวจสอบว่ามี method run หรือไม่
         if hasattr(app_instance, 'run'):
-            app_instance.run()
+            profiler = SyncProfiler() if profile else None
+            with profiler or contextlib.nullcontext():
+                result = app_instance.run()
+                if profiler:
+                    profiler.meta.update({k: result.get(k) for k in ('snapshot_run_id', 'new_jobs', 'updated_jobs',
+                                                                      'successful_tabs', 'failed_tabs')})
+            if profiler:
+                add_log(f'🔬 Profile saved: {profiler.profile_id}', stage='sync')
         elif hasattr(app_instance, 'execute'):
             app_instance.execute()
         elif hasattr(app_instance, 'start'):
             app_instance.start()
         else:
             # หากไม่มี method run ให้สร้างการทำงานเอง
-            add_log('⚠️ No run method found, creating manual execution...')
+            add_log('⚠️ No run method found, creating manual execution...', level='WARNING')
             
             # Manual execution
             start_time = datetime.now()
@@ -83,17 +110,19 @@ def run_scraping_sync():
                 
                 # Scrape แต่ละ tab
                 for tab in app_instance.config.TABS_TO_SCRAPE:
-                    scraping_status['progress'] = f'กำลังกวาดข้อมูลจากแท็บ {tab}...'
-                    add_log(f'📊 Scraping tab {tab}...')
+                    if heartbeat.lost.is_set():
+                        raise Exception("Run lock lost")
+                    status_store.update(owner, progress=f'กำลังกวาดข้อมูลจากแท็บ {tab}...')
+                    add_log(f'📊 Scraping tab {tab}...', stage='scrape', tab=tab)
                     
                     df = app_instance.scraper.extract_data_from_tab(driver, tab)
                     if not df.empty:
                         all_tab_data[tab] = df
                         successful_tabs.append(tab)
-                        add_log(f'✅ Tab {tab}: Found {len(df)} records')
+                        add_log(f'✅ Tab {tab}: Found {len(df)} records', stage='scrape', tab=tab)
                     else:
                         failed_tabs.append(tab)
-                        add_log(f'⚠️ Tab {tab}: No data found')
+                        add_log(f'⚠️ Tab {tab}: No data found', level='WARNING', stage='scrape', tab=tab)
                     
                     time.sleep(1)
             
@@ -102,7 +131,7 @@ def run_scraping_sync():
                 driver.quit()
             
             # ประมวลผลและเพิ่มข้อมูลใหม่
-            scraping_status['progress'] = 'กำลังประมวลผลข้อมูล...'
+            status_store.update(owner, progress='กำลังประมวลผลข้อมูล...')
             add_log('🔄 Processing scraped data...')
             
             new_jobs_count, updated_jobs_count = app_instance._process_and_add_new_jobs(all_tab_data)
@@ -125,42 +154,62 @@ def run_scraping_sync():
             app_instance.notifier.send(summary_msg)
             add_log(f'🎉 Job synchronization completed in {duration:.2f} seconds')
         
-        scraping_status['last_result'] = 'สำเร็จ'
-        scraping_status['progress'] = 'เสร็จสิ้น'
-        add_log('✅ Job synchronization completed successfully!')
+        last_result = 'สำเร็จ'
+        progress = 'เสร็จสิ้น'
+        add_log('✅ Job synchronization completed successfully!', stage='sync')
         
     except Exception as e:
-        scraping_status['last_result'] = f'ข้อผิดพลาด: {str(e)}'
-        scraping_status['progress'] = 'เกิดข้อผิดพลาด'
-        add_log(f'❌ Error during synchronization: {str(e)}')
+        last_result = f'ข้อผิดพลาด: {str(e)}'
+        progress = 'เกิดข้อผิดพลาด'
+        add_log(f'❌ Error during synchronization: {str(e)}', level='ERROR', stage='sync')
         
         # Log additional error info for debugging
         import traceback
-        add_log(f'🔍 Error details: {traceback.format_exc()}')
+        add_log(f'🔍 Error details: {traceback.format_exc()}', level='ERROR', stage='sync')
         
     finally:
-        scraping_status['is_running'] = False
-        scraping_status['last_run'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-def run_scraping_thread():
+        heartbeat.stop()
+        for name in SYNC_LOGGERS:
+            logging.getLogger(name).removeHandler(sync_log_handler)
+        final_fields = {'last_run': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        if last_result is not None:
+            final_fields.update(last_result=last_result, progress=progress)
+        status_store.release_run(owner, **final_fields)
+
+def run_scraping_thread(owner, profile=False):
     """Run scraping in a separate thread"""
-    run_scraping_sync()
+    run_scraping_sync(owner, profile)
 
 @app.route('/')
 def dashboard():
     """Main dashboard page - now serves the modern SPA"""
-    # Read the modern dashboard HTML file
-    try:
-        with open('templates/modern_dashboard.html', 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
+    # Rendered once, then served from memory until the template file changes
+    cached = asset_cache.template('modern_dashboard.html',
+                                  os.path.join(app.root_path, 'templates', 'modern_dashboard.html'),
+                                  lambda: render_template('modern_dashboard.html'))
+    if cached is None:
         # Fallback to inline template if file doesn't exist
         return render_template_string(MODERN_DASHBOARD_TEMPLATE)
+    return cached_response(request, cached, REVALIDATE_CACHE_CONTROL)
+
+@app.route('/static/<path:filename>', endpoint='static')
+def static_asset(filename):
+    """Static assets: immutable when requested with the current ?v= version, revalidated otherwise"""
+    cached = asset_cache.static_file(filename)
+    if cached is None:
+        return not_found(None)
+    versioned = request.args.get('v') == cached.version
+    return cached_response(request, cached, IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL)
+
+def fragment_response(html):
+    """Per-request page loaded by the dashboard via AJAX: 304 when unchanged"""
+    return cached_response(request, asset_cache.fragment(html), 'private, ' + REVALIDATE_CACHE_CONTROL)
 
 # Legacy routes for backward compatibility and AJAX loading
 @app.route('/dashboard')
 def dashboard_legacy():
     """Legacy dashboard route"""
-    return render_template('dashboard.html', status=scraping_status)
+    return render_template('dashboard.html', status=status_store.snapshot())
 
 @app.route('/settings')
 def settings():
@@ -172,12 +221,13 @@ def settings():
         'has_google_creds': bool(os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON_B64') or 
                                 os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON'))
     }
-    return render_template('settings.html', config=config)
+    return fragment_response(render_template('settings.html', config=config))
 
 @app.route('/data')
 def view_data():
     """View scraped data from Google Sheets"""
     try:
+        from main_master_only import GoogleSheetManager
         config = Config()
         sheet_manager = GoogleSheetManager(
             config.GOOGLE_SHEET_ID,
@@ -197,7 +247,7 @@ def view_data():
                              total_count=len(data),
                              sheet_url=f"https://docs.google.com/spreadsheets/d/{config.GOOGLE_SHEET_ID}")
     except Exception as e:
-        add_log(f'Error fetching data: {str(e)}')
+        add_log(f'Error fetching data: {str(e)}', level='ERROR')
         return render_template('data.html', 
                              data=[], 
                              error=str(e),
@@ -206,38 +256,53 @@ def view_data():
 @app.route('/logs')
 def view_logs():
     """View application logs"""
-    return render_template('logs.html', logs=scraping_status['logs'])
+    return fragment_response(render_template('logs.html', logs=status_store.get_logs(),
+                                             last_seq=status_store.last_log_seq()))
 
 # API Endpoints
 @app.route('/api/start-scraping', methods=['POST'])
 def start_scraping():
     """API endpoint to start scraping"""
-    global scraping_status
-    
-    if scraping_status['is_running']:
+    # Atomic single-flight lock shared by all workers
+    owner = status_store.try_acquire_run()
+    if not owner:
         return jsonify({'success': False, 'message': 'กำลังดำเนินการอยู่แล้ว'})
     
     try:
         # Start scraping in a separate thread
-        scraping_thread = threading.Thread(target=run_scraping_thread)
+        # Opt-in profiling: /api/start-scraping?profile=1 or SYNC_PROFILE=1
+        profile = profiling_requested(request.args.get('profile'))
+        scraping_thread = threading.Thread(target=run_scraping_thread, args=(owner, profile))
         scraping_thread.daemon = True
         scraping_thread.start()
         
-        add_log('🎯 Scraping process initiated by user')
+        add_log('🎯 Scraping process initiated by user' + (' (profiling enabled)' if profile else ''))
         return jsonify({'success': True, 'message': 'เริ่มการกวาดข้อมูลแล้ว'})
     except Exception as e:
-        add_log(f'Failed to start scraping: {str(e)}')
+        status_store.release_run(owner)
+        add_log(f'Failed to start scraping: {str(e)}', level='ERROR')
         return jsonify({'success': False, 'message': f'ไม่สามารถเริ่มได้: {str(e)}'})
 
 @app.route('/api/status')
 def get_status():
-    """API endpoint to get current scraping status"""
-    return jsonify(scraping_status)
+    """API endpoint to get current scraping status (plus the browser's latest RSS/CPU/recycle numbers)"""
+    return jsonify(dict(status_store.snapshot(), browser=load_browser_status()))
+
+@app.route('/api/logs')
+def get_logs():
+    """API endpoint to tail structured logs: /api/logs?after=<seq>&level=<LEVEL>&limit=<n>"""
+    try:
+        after = int(request.args.get('after', 0))
+        limit = min(max(int(request.args.get('limit', 500)), 1), 5000)
+        return jsonify({'success': True, **status_store.logs_after(after, request.args.get('level'), limit)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
 @app.route('/api/test-connection', methods=['POST'])
 def test_connection():
     """Test Google Sheets and LINE Notify connections"""
     try:
+        from main_master_only import GoogleSheetManager, Notifier
         config = Config()
         results = {}
         
@@ -254,7 +319,7 @@ def test_connection():
             add_log('✅ Google Sheets connection test successful')
         except Exception as e:
             results['google_sheets'] = {'status': 'error', 'message': f'Google Sheets Error: {str(e)}'}
-            add_log(f'❌ Google Sheets connection test failed: {str(e)}')
+            add_log(f'❌ Google Sheets connection test failed: {str(e)}', level='ERROR')
         
         # Test LINE Notify
         try:
@@ -265,20 +330,21 @@ def test_connection():
                 add_log('✅ LINE Notify connection test successful')
             else:
                 results['line_notify'] = {'status': 'error', 'message': 'LINE Notify ส่งไม่สำเร็จ'}
-                add_log('❌ LINE Notify connection test failed')
+                add_log('❌ LINE Notify connection test failed', level='ERROR')
         except Exception as e:
             results['line_notify'] = {'status': 'error', 'message': f'LINE Notify Error: {str(e)}'}
-            add_log(f'❌ LINE Notify connection test failed: {str(e)}')
+            add_log(f'❌ LINE Notify connection test failed: {str(e)}', level='ERROR')
         
         return jsonify({'success': True, 'results': results})
     except Exception as e:
-        add_log(f'Connection test error: {str(e)}')
+        add_log(f'Connection test error: {str(e)}', level='ERROR')
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/api/data')
 def get_data_json():
     """API endpoint to get data as JSON"""
     try:
+        from main_master_only import GoogleSheetManager
         config = Config()
         sheet_manager = GoogleSheetManager(
             config.GOOGLE_SHEET_ID,
@@ -303,6 +369,96 @@ def get_data_json():
             'total_count': 0
         })
 
+@app.route('/api/export')
+def export_data():
+    """Stream Master_Data as CSV or XLSX (?format=csv|xlsx&tab=&since=)"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'xlsx'):
+        return jsonify({'success': False, 'error': f'Unsupported format: {fmt}'}), 400
+    
+    try:
+        since = parse_since(request.args.get('since'))
+        tab_arg = request.args.get('tab', '').strip()
+        tab_name = Config.TAB_NAMES.get(int(tab_arg), tab_arg) if tab_arg.isdigit() else (tab_arg or None)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        from main_master_only import GoogleSheetManager
+        config = Config()
+        sheet_manager = GoogleSheetManager(
+            config.GOOGLE_SHEET_ID,
+            config.GOOGLE_SVC_JSON_RAW,
+            config.GOOGLE_SVC_JSON_B64
+        )
+        ws = sheet_manager.get_or_create_worksheet(config.MASTER_SHEET_NAME)
+        headers = ws.row_values(1)
+    except Exception as e:
+        add_log(f'Export failed: {str(e)}', level='ERROR')
+        return jsonify({'success': False, 'error': str(e)})
+    
+    # Rows are read from Sheets in pages and written out as they arrive
+    rows = filter_rows(headers, sheet_manager.iter_rows(config.MASTER_SHEET_NAME), tab_name, since)
+    filename = f"master_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    if fmt == 'csv':
+        body, mimetype = stream_csv(headers, rows), 'text/csv; charset=utf-8'
+    else:
+        body = stream_xlsx(headers, rows, config.MASTER_SHEET_NAME)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/api/stats')
+def get_stats():
+    """API endpoint to get precomputed throughput/backlog aggregates"""
+    try:
+        return jsonify({'success': True, 'stats': stats_store.summary()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e), 'stats': {}})
+
+@app.route('/api/search')
+def search_jobs():
+    """API endpoint for ranked full-text search over all Master_Data jobs (?q=&limit=)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Missing query parameter q'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    try:
+        return jsonify({'success': True, **search_index.search(query, limit)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e), 'results': []})
+
+@app.route('/api/profiles')
+def get_profiles():
+    """API endpoint to list stored sync profiles"""
+    return jsonify({'success': True, 'profiles': list_profiles()})
+
+@app.route('/api/profiles/<profile_id>')
+def get_profile(profile_id):
+    """API endpoint for one profile's top-N CPU and memory tables (?top=N)"""
+    summary = load_profile(profile_id, top=request.args.get('top', 30, type=int))
+    if summary is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return jsonify({'success': True, 'profile': summary})
+
+@app.route('/api/profiles/<profile_id>/download')
+def download_profile(profile_id):
+    """Download raw profile data: ?kind=json|folded|tracemalloc"""
+    kind = request.args.get('kind', 'folded')
+    path = profile_file(profile_id, kind)
+    if path is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
+
+@app.route('/profiles')
+def view_profiles():
+    """Sync profiles page: list of runs and the top-N tables of the selected one"""
+    profiles = list_profiles()
+    selected_id = request.args.get('id') or (profiles[0]['profile_id'] if profiles else None)
+    selected = load_profile(selected_id, top=request.args.get('top', 30, type=int)) if selected_id else None
+    return render_template('profiles.html', profiles=profiles, selected=selected)
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
@@ -0,0 +1,170 @@
+# asset_cache.py
+# แคช static file และหน้า template ในหน่วยความจำหลังอ่านครั้งแรก พร้อมบีบอัด gzip/brotli ไว้ล่วงหน้า
+# ตอบด้วย strong ETag และ 304 Not Modified เมื่อ client มีเวอร์ชันเดียวกันอยู่แล้ว
+
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Request, Response
+import logging
+
+try:
+    import brotli
+except ImportError:  # brotli เป็น optional: ไม่มีก็ส่ง gzip อย่างเดียว
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# asset ที่มี ?v=<version> ตรงกับเนื้อหาปัจจุบัน cache ได้ 1 ปี (URL เปลี่ยนเมื่อเนื้อหาเปลี่ยน)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# หน้า/fragment ต้องถามกลับทุกครั้ง แต่ได้ 304 ถ้าไม่เปลี่ยน
+REVALIDATE_CACHE_CONTROL = "no-cache"
+MIN_COMPRESS_BYTES = 512
+ENCODING_SUFFIX = {'br': '-br', 'gzip': '-gz', 'identity': ''}
+
+
+class CachedBody:
+    """เนื้อหาหนึ่งชิ้นพร้อม representation ที่บีบอัดแล้ว และ ETag ของแต่ละ representation"""
+
+    def __init__(self, body: bytes, mimetype: str):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.version = self.etag[:12]
+        self.encoded: Dict[str, bytes] = {'identity': body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gz) < len(body):
+                self.encoded['gzip'] = gz
+            if brotli is not None:
+                br = brotli.compress(body, quality=11)
+                if len(br) < len(body):
+                    self.encoded['br'] = br
+
+    def etag_for(self, encoding: str) -> str:
+        # strong ETag ต้องต่างกันในแต่ละ encoding เพราะ byte ไม่เหมือนกัน
+        return self.etag + ENCODING_SUFFIX[encoding]
+
+    def negotiate(self, request: Request) -> str:
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and accepted[encoding] > 0:
+                return encoding
+        return 'identity'
+
+    def matches(self, request: Request) -> bool:
+        return any(request.if_none_match.contains(self.etag_for(e)) for e in self.encoded)
+
+
+def cached_response(request: Request, cached: CachedBody, cache_control: str) -> Response:
+    """สร้าง response จาก CachedBody (304 ถ้า If-None-Match ตรง)"""
+    encoding = cached.negotiate(request)
+    if cached.matches(request):
+        response = Response(status=304)
+    else:
+        response = Response(cached.encoded[encoding], content_type=cached.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(cached.etag_for(encoding))
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class AssetCache:
+    """แคชไฟล์ใน static_dir และ template ที่ render แล้ว (โหลดใหม่อัตโนมัติเมื่อ mtime ของไฟล์เปลี่ยน
+    หรือเมื่อเวอร์ชันของ asset ที่ template อ้างถึงเปลี่ยน) และแคช representation ของ fragment ล่าสุดตาม ETag"""
+
+    def __init__(self, static_dir: str, max_fragments: int = 32):
+        self.static_dir = os.path.abspath(static_dir)
+        self.max_fragments = max_fragments
+        self._files: Dict[str, Tuple[float, CachedBody]] = {}
+        # template -> (mtime, {asset: version ที่ใช้ตอน render}, body)
+        self._templates: Dict[str, Tuple[float, Dict[str, str], CachedBody]] = {}
+        self._local = threading.local()  # asset ที่ version() ถูกเรียกระหว่าง render template
+        self._fragments: 'OrderedDict[str, CachedBody]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _cached(self, key: str, path: str, load: Callable[[], bytes], mimetype: str) -> Optional[CachedBody]:
+        mtime = self._mtime(path)
+        if mtime is None:
+            return None
+        entry = self._files.get(key)
+        if entry is None or entry[0] != mtime:
+            cached = CachedBody(load(), mimetype)
+            with self._lock:
+                self._files[key] = (mtime, cached)
+            logger.info(f"📦 Cached {key} ({len(cached.encoded['identity'])} bytes, encodings: {sorted(cached.encoded)})")
+            return cached
+        return entry[1]
+
+    def static_file(self, filename: str) -> Optional[CachedBody]:
+        """ไฟล์ใน static_dir หรือ None ถ้าไม่มี (หรือพยายามออกนอกโฟลเดอร์)"""
+        path = os.path.abspath(os.path.join(self.static_dir, filename))
+        if not path.startswith(self.static_dir + os.sep):
+            return None
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype == 'application/javascript':
+            mimetype += '; charset=utf-8'
+
+        def load() -> bytes:
+            with open(path, 'rb') as f:
+                return f.read()
+        return self._cached(f"static:{filename}", path, load, mimetype)
+
+    def version(self, filename: str) -> str:
+        cached = self.static_file(filename)
+        version = cached.version if cached else '0'
+        deps = getattr(self._local, 'deps', None)
+        if deps is not None:
+            deps[filename] = version
+        return version
+
+    def template(self, name: str, path: str, render: Callable[[], str]) -> Optional[CachedBody]:
+        """หน้า template ที่ไม่ขึ้นกับ request: render ครั้งเดียวแล้วใช้ซ้ำจนกว่าไฟล์จะเปลี่ยน
+        หรือ asset ที่อ้างถึงผ่าน asset_url (?v=) เปลี่ยนเวอร์ชัน"""
+        mtime = self._mtime(path)
+        if mtime is None:
+            return None
+        key = f"template:{name}"
+        entry = self._templates.get(key)
+        if entry is not None and entry[0] == mtime and all(self.version(f) == v for f, v in entry[1].items()):
+            return entry[2]
+        self._local.deps = {}
+        try:
+            body = render().encode('utf-8')
+        finally:
+            deps = self._local.deps
+            self._local.deps = None
+        cached = CachedBody(body, 'text/html; charset=utf-8')
+        with self._lock:
+            self._templates[key] = (mtime, deps, cached)
+        logger.info(f"📦 Cached {key} ({len(body)} bytes, assets: {sorted(deps)})")
+        return cached
+
+    def fragment(self, body: str, mimetype: str = 'text/html; charset=utf-8') -> CachedBody:
+        """เนื้อหาที่ render ทุก request (เช่น /logs): ใช้ ETag จากเนื้อหา และแคช representation ล่าสุดไว้"""
+        data = body.encode('utf-8')
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            cached = self._fragments.get(etag)
+            if cached is not None:
+                self._fragments.move_to_end(etag)
+                return cached
+        cached = CachedBody(data, mimetype)
+        with self._lock:
+            self._fragments[etag] = cached
+            while len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return cached
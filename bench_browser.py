@@ -0,0 +1,53 @@
+# bench_browser.py
+# เปรียบเทียบโหมดเบราว์เซอร์ปกติกับโหมด lean บนแท็บจริง
+# วิธีใช้: python bench_browser.py [tab ...]   (ต้องตั้ง EDOCLITE_USER / EDOCLITE_PASS)
+
+import sys
+from typing import Dict, List, Any
+
+from main_master_only import Config, WebScraper, logger
+
+
+def run_mode(tabs: List[int], lean: bool) -> Dict[int, Dict[str, Any]]:
+    scraper = WebScraper(Config.EDOCLITE_USER, Config.EDOCLITE_PASS, lean=lean)
+    driver = scraper.create_driver()
+    try:
+        logged_in, driver = scraper.login(driver)
+        if not logged_in:
+            raise RuntimeError("Login failed")
+        for tab in tabs:
+            scraper.extract_data_from_tab(driver, tab)
+    finally:
+        driver.quit()
+    return scraper.tab_metrics
+
+
+def _mb(v) -> str:
+    return f"{v / 1024 / 1024:8.1f}" if v is not None else "     n/a"
+
+
+def _saving(full, lean) -> str:
+    if not full or lean is None:
+        return "    n/a"
+    return f"{(1 - lean / full) * 100:6.1f}%"
+
+
+def main(argv: List[str]) -> int:
+    tabs = [int(t) for t in argv] or Config.TABS_TO_SCRAPE
+    logger.info("⏱️ Benchmarking full browser profile...")
+    full = run_mode(tabs, lean=False)
+    logger.info("⏱️ Benchmarking lean browser profile...")
+    lean = run_mode(tabs, lean=True)
+
+    print(f"{'tab':>4} | {'MB full':>8} {'MB lean':>8} {'saved':>7} | "
+          f"{'ms full':>8} {'ms lean':>8} {'saved':>7} | {'RSS full':>8} {'RSS lean':>8} {'saved':>7}")
+    for tab in tabs:
+        f, l = full.get(tab, {}), lean.get(tab, {})
+        print(f"{tab:>4} | {_mb(f.get('bytes'))} {_mb(l.get('bytes'))} {_saving(f.get('bytes'), l.get('bytes'))} | "
+              f"{str(f.get('load_ms')):>8} {str(l.get('load_ms')):>8} {_saving(f.get('load_ms'), l.get('load_ms'))} | "
+              f"{_mb(f.get('rss_bytes'))} {_mb(l.get('rss_bytes'))} {_saving(f.get('rss_bytes'), l.get('rss_bytes'))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
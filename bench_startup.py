@@ -0,0 +1,172 @@
+# bench_startup.py
+# วัดเวลา import ของ app.py และเวลา cold start ของ gunicorn จนถึงคำตอบแรกของ /health (แบบเดียวกับ production)
+# และตรวจว่า app.py ไม่ได้โหลด dependency หนัก (pandas/gspread/google-auth/selenium/openpyxl) ตอนเริ่มต้น
+# exit 1 เมื่อเกินงบเวลา หรือมี module หนักถูกโหลด (ใช้ใน CI/ก่อน deploy ได้)
+#
+# วิธีใช้: python bench_startup.py [--runs 5] [--max-import-ms 300] [--max-startup-ms 1000] [--json result.json]
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import http.client
+from typing import Dict, List, Tuple
+
+import logging
+
+from lean_browser import process_tree_pids, process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# module ที่ต้องโหลดเมื่อใช้ scraper/ชีต/การส่งออกครั้งแรกเท่านั้น
+HEAVY_MODULES = ('main_master_only', 'pandas', 'gspread', 'google.oauth2', 'google.auth', 'selenium', 'openpyxl', 'requests')
+
+_LOADED_HEAVY_CODE = ("import sys, json, app; "
+                      f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+
+
+def _env() -> Dict[str, str]:
+    return dict(os.environ, PYTHONPATH=APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+
+def measure_import(workdir: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """เวลา import app (ms, สะสมทั้ง module tree) และ module ที่ app import ตรงๆ เรียงจากช้าสุด"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir, env=_env(),
+                            capture_output=True, text=True, check=True)
+    total, children = None, []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue
+        depth = len(name) - len(name.lstrip(' '))
+        if name.strip() == 'app' and depth == 1:
+            total = int(cumulative) / 1000
+        elif depth == 3:
+            # module ที่ app import ตรงๆ (ระดับถัดจาก app)
+            children.append((name.strip(), int(cumulative) / 1000))
+    if total is None:
+        raise RuntimeError("import app did not report its import time")
+    return total, sorted(children, key=lambda c: -c[1])
+
+
+def loaded_heavy_modules(workdir: str) -> List[str]:
+    result = subprocess.run([sys.executable, '-c', _LOADED_HEAVY_CODE], cwd=workdir, env=_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_startup(workdir: str) -> Dict[str, float]:
+    """spawn gunicorn แบบ production แล้วจับเวลาจนได้ 200 จาก /health ครั้งแรก (รวมเวลา interpreter + import + fork)"""
+    port = _free_port()
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--workers', '1',
+               '--timeout', '120', '--chdir', workdir, '--pythonpath', APP_DIR, '--log-level', 'warning']
+    log = open(os.path.join(workdir, 'server.log'), 'ab')
+    started = time.perf_counter()
+    server = subprocess.Popen(command, env=_env(), stdout=log, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode} (see {log.name})")
+            try:
+                request_started = time.perf_counter()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                conn.request('GET', '/health')
+                status = conn.getresponse().status
+                conn.close()
+            except OSError:
+                time.sleep(0.005)
+                continue
+            if status != 200:
+                raise RuntimeError(f"/health answered {status}")
+            ready = time.perf_counter()
+            return {
+                'startup_ms': (ready - started) * 1000,
+                'first_health_ms': (ready - request_started) * 1000,
+                'rss_mb': process_rss_bytes(process_tree_pids(server.pid)) / 1024 / 1024,
+            }
+        raise RuntimeError("gunicorn did not answer /health within 60 seconds")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        log.close()
+
+
+def _median(values: List[float]) -> float:
+    return round(statistics.median(values), 1)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Import-time and cold-start benchmark for app.py")
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument('--max-import-ms', type=float, default=300, help="budget for `import app` (median)")
+    parser.add_argument('--max-startup-ms', type=float, default=1000,
+                        help="budget from spawning gunicorn to the first /health answer (median)")
+    parser.add_argument('--json', help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    imports, children = [], {}
+    for _ in range(args.runs):
+        total, direct = measure_import(workdir)
+        imports.append(total)
+        for name, ms in direct:
+            children.setdefault(name, []).append(ms)
+    startups = [measure_startup(workdir) for _ in range(args.runs)]
+    heavy = loaded_heavy_modules(workdir)
+
+    report = {
+        'runs': args.runs,
+        'import_ms': _median(imports),
+        'import_ms_max': round(max(imports), 1),
+        'slowest_imports_ms': dict(sorted(((name, _median(ms)) for name, ms in children.items()),
+                                          key=lambda c: -c[1])[:8]),
+        'startup_ms': _median([s['startup_ms'] for s in startups]),
+        'startup_ms_max': round(max(s['startup_ms'] for s in startups), 1),
+        'first_health_ms': _median([s['first_health_ms'] for s in startups]),
+        'rss_mb': _median([s['rss_mb'] for s in startups]),
+        'heavy_modules_loaded': heavy,
+    }
+    print(f"import app        : {report['import_ms']:8.1f} ms median ({report['import_ms_max']:.1f} max, "
+          f"budget {args.max_import_ms:.0f})")
+    for name, ms in report['slowest_imports_ms'].items():
+        print(f"  {name:<16}: {ms:8.1f} ms")
+    print(f"spawn -> /health  : {report['startup_ms']:8.1f} ms median ({report['startup_ms_max']:.1f} max, "
+          f"budget {args.max_startup_ms:.0f})")
+    print(f"first /health     : {report['first_health_ms']:8.1f} ms")
+    print(f"gunicorn RSS      : {report['rss_mb']:8.1f} MB (master + worker)")
+    print(f"heavy at startup  : {', '.join(heavy) or 'none'}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if report['import_ms'] > args.max_import_ms:
+        failures.append(f"import {report['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if report['startup_ms'] > args.max_startup_ms:
+        failures.append(f"startup {report['startup_ms']:.0f} ms > {args.max_startup_ms:.0f} ms")
+    if heavy:
+        failures.append(f"loaded at import: {', '.join(heavy)}")
+    if failures:
+        print(f"❌ Startup budget exceeded: {'; '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main(sys.argv[1:]))
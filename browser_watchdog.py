@@ -0,0 +1,279 @@
+# browser_watchdog.py
+# เฝ้าทรัพยากรของ Chrome ที่ selenium เปิด: RSS และ CPU รวมของ process tree (chromedriver + chrome ทุก process)
+# - ขอ recycle driver เมื่อเกินงบหน่วยความจำ (BROWSER_MAX_RSS_MB) หรือจำนวนหน้าที่โหลด (BROWSER_MAX_PAGES)
+# - ปิด driver แล้วฆ่า process ใน tree ที่ยังค้าง (driver.quit() ล้มเหลวหรือ chrome ไม่ยอมปิด)
+# - ตอนเริ่มการซิงค์ ฆ่า chrome/chromedriver ที่ค้างจากรอบก่อน (process ที่เปิดมันตายไปแล้ว)
+# สถิติล่าสุดบันทึกลงไฟล์ (BROWSER_WATCHDOG_PATH) ทุก gunicorn worker จึงแสดงใน /api/status ได้
+#
+# วิธีใช้: python browser_watchdog.py status
+#         python browser_watchdog.py cleanup
+
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from lean_browser import (process_tree_pids, process_parent, process_start_ticks, process_cpu_seconds,
+                          process_rss_bytes)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "browser_watchdog.json"
+CHROMEDRIVER_NAMES = ('chromedriver',)
+# ชื่อใน /proc/<pid>/comm ถูกตัดที่ 15 ตัวอักษร
+CHROME_NAMES = ('chrome', 'chromium', 'chromium-browse', 'headless_shell')
+# สวิตช์ที่ chromedriver ใส่ให้ chrome ทุกครั้ง (ไม่แตะ chrome ที่ผู้ใช้เปิดเอง)
+WEBDRIVER_SWITCHES = ('--test-type=webdriver', '--remote-debugging-port')
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8', 'replace')
+    except OSError:
+        return ''
+
+
+def _alive(pid: int, start: Optional[int]) -> bool:
+    """process ยังอยู่และเป็นตัวเดิม (pid ไม่ได้ถูกนำกลับมาใช้ใหม่)"""
+    return start is not None and process_start_ticks(pid) == start
+
+
+def _kill(processes: List[Tuple[int, Optional[int]]]) -> int:
+    killed = 0
+    for pid, start in processes:
+        if not _alive(pid, start):
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+    return killed
+
+
+def _tree(root_pid: int) -> List[Tuple[int, Optional[int]]]:
+    return [(pid, process_start_ticks(pid)) for pid in process_tree_pids(root_pid)]
+
+
+class BrowserWatchdog:
+    """driver ที่ process นี้เปิดอยู่ งบทรัพยากร และสถิติล่าสุด (หนึ่ง instance ต่อ WebScraper)"""
+
+    def __init__(self, path: Optional[str] = None, max_rss_mb: Optional[float] = None,
+                 max_pages: Optional[int] = None):
+        self.path = path or os.getenv("BROWSER_WATCHDOG_PATH", DEFAULT_STATE_PATH)
+        max_rss_mb = float(os.getenv("BROWSER_MAX_RSS_MB", "400")) if max_rss_mb is None else max_rss_mb
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)  # 0 = ไม่จำกัด
+        self.max_pages = int(os.getenv("BROWSER_MAX_PAGES", "25")) if max_pages is None else max_pages
+        # root pid (chromedriver) -> {'start', 'pages', 'cpu', 'sampled_at'}
+        self._drivers: Dict[int, Dict[str, Any]] = {}
+        self._owner = (os.getpid(), process_start_ticks(os.getpid()))
+        self.stats: Dict[str, Any] = {
+            'rss_bytes': None, 'peak_rss_bytes': 0, 'cpu_percent': None, 'cpu_seconds': 0.0,
+            'processes': 0, 'pages': 0, 'launches': 0, 'recycles': 0, 'last_recycle_reason': None,
+            'leaked_killed': 0, 'orphans_killed': 0,
+            'max_rss_bytes': self.max_rss_bytes or None, 'max_pages': self.max_pages or None,
+        }
+
+    @staticmethod
+    def _root_pid(driver) -> Optional[int]:
+        try:
+            return driver.service.process.pid
+        except AttributeError:
+            return None
+
+    # --------------------------------------------------------------------------
+    # Driver lifecycle
+    # --------------------------------------------------------------------------
+
+    def register(self, driver):
+        """เริ่มติดตาม driver ที่เพิ่งสร้าง (บันทึก pid ไว้ให้รอบถัดไปเก็บกวาดได้ถ้า process นี้ตาย)"""
+        self.stats['launches'] += 1
+        root = self._root_pid(driver)
+        if root is None:
+            return
+        self._drivers[root] = {'start': process_start_ticks(root), 'pages': 0,
+                               'cpu': process_cpu_seconds(process_tree_pids(root)), 'sampled_at': time.monotonic()}
+        self._save()
+
+    def page_loaded(self, driver):
+        self.stats['pages'] += 1
+        state = self._drivers.get(self._root_pid(driver))
+        if state is not None:
+            state['pages'] += 1
+
+    def sample(self, driver) -> Dict[str, Any]:
+        """อ่าน RSS/CPU ของ process tree ตอนนี้ แล้วบันทึกสถิติ"""
+        root = self._root_pid(driver)
+        state = self._drivers.get(root)
+        if state is None:
+            return self.stats
+        pids = process_tree_pids(root)
+        rss = process_rss_bytes(pids)
+        cpu, now = process_cpu_seconds(pids), time.monotonic()
+        elapsed = now - state['sampled_at']
+        self.stats.update(
+            rss_bytes=rss, peak_rss_bytes=max(self.stats['peak_rss_bytes'], rss), processes=len(pids),
+            cpu_percent=round((cpu - state['cpu']) / elapsed * 100, 1) if elapsed > 0 else None,
+            cpu_seconds=round(self.stats['cpu_seconds'] + max(cpu - state['cpu'], 0), 2))
+        state.update(cpu=cpu, sampled_at=now)
+        self._save()
+        return self.stats
+
+    def over_memory_budget(self, driver) -> bool:
+        return bool(self.max_rss_bytes) and (self.sample(driver)['rss_bytes'] or 0) > self.max_rss_bytes
+
+    def recycle_reason(self, driver) -> Optional[str]:
+        """เหตุผลที่ควรปิดแล้วเปิด driver ใหม่ก่อนโหลดหน้าถัดไป (None = ยังอยู่ในงบ)"""
+        state = self._drivers.get(self._root_pid(driver))
+        if state is None:
+            return None
+        if self.over_memory_budget(driver):
+            return f"RSS {self.stats['rss_bytes'] / 1024 / 1024:.0f}MB > {self.max_rss_bytes / 1024 / 1024:.0f}MB"
+        if self.max_pages and state['pages'] >= self.max_pages:
+            return f"{state['pages']} pages loaded"
+        return None
+
+    def recycled(self, reason: str):
+        self.stats['recycles'] += 1
+        self.stats['last_recycle_reason'] = reason
+
+    def quit(self, driver):
+        """driver.quit() แล้วฆ่า process ใน tree ที่ยังไม่ปิด"""
+        root = self._root_pid(driver)
+        processes = _tree(root) if root is not None else []
+        if root in self._drivers:
+            self.sample(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"⚠️ driver.quit() failed: {e}")
+        if processes:
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and any(_alive(pid, start) for pid, start in processes):
+                time.sleep(0.1)
+            leaked = _kill(processes)
+            if leaked:
+                self.stats['leaked_killed'] += leaked
+                logger.warning(f"🧹 Killed {leaked} browser processes left running after driver.quit()")
+        self._drivers.pop(root, None)
+        self._save()
+
+    # --------------------------------------------------------------------------
+    # Orphans from earlier runs
+    # --------------------------------------------------------------------------
+
+    def _orphan_roots(self) -> List[int]:
+        """chromedriver ที่ parent ตายแล้ว (ถูกย้ายไปอยู่ใต้ pid 1) และ chrome ของ webdriver ที่ไม่มี chromedriver คุม"""
+        if not os.path.isdir("/proc"):
+            return []
+        uid, roots = os.getuid(), []
+        for name in os.listdir("/proc"):
+            if not name.isdigit() or int(name) in self._drivers:
+                continue
+            pid = int(name)
+            comm = _read(f"/proc/{pid}/comm").strip()
+            if comm not in CHROMEDRIVER_NAMES + CHROME_NAMES:
+                continue
+            try:
+                if os.stat(f"/proc/{pid}").st_uid != uid:
+                    continue
+            except OSError:
+                continue
+            parent = process_parent(pid)
+            if comm in CHROMEDRIVER_NAMES:
+                if parent == 1:
+                    roots.append(pid)
+                continue
+            args = _read(f"/proc/{pid}/cmdline").split('\0')
+            # เฉพาะ process หลักของ browser (process ลูกมี --type=renderer/gpu-process/...)
+            if any(a.startswith('--type=') for a in args) or not any(a.startswith(WEBDRIVER_SWITCHES) for a in args):
+                continue
+            if _read(f"/proc/{parent}/comm").strip() not in CHROMEDRIVER_NAMES:
+                roots.append(pid)
+        return roots
+
+    def cleanup_orphans(self) -> int:
+        """ฆ่า browser ที่ค้างจากรอบก่อน: driver ในไฟล์ state ที่ process เจ้าของตายแล้ว และ process ที่ไม่มีเจ้าของ"""
+        state = self._load()
+        kept, processes = [], []
+        for entry in state.get('drivers', []):
+            if _alive(entry['owner_pid'], entry['owner_start']):
+                kept.append(entry)
+            elif _alive(entry['root_pid'], entry['root_start']):
+                processes.extend(_tree(entry['root_pid']))
+        for root in self._orphan_roots():
+            processes.extend(_tree(root))
+        killed = _kill(list(dict.fromkeys(processes)))
+        self.stats['orphans_killed'] += killed
+        if killed:
+            logger.warning(f"🧹 Killed {killed} orphaned chrome/chromedriver processes from an earlier run")
+        state['drivers'] = kept
+        self._save(state)
+        return killed
+
+    # --------------------------------------------------------------------------
+    # State file
+    # --------------------------------------------------------------------------
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, state: Dict[str, Any]):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=".watchdog.")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"❌ Failed to save browser watchdog state '{self.path}': {e}")
+
+    def _save(self, state: Optional[Dict[str, Any]] = None):
+        """driver ของ process นี้ (แทนที่ของเดิม ไม่แตะของ process อื่น) และสถิติล่าสุด"""
+        state = self._load() if state is None else state
+        owner_pid, owner_start = self._owner
+        drivers = [e for e in state.get('drivers', []) if e['owner_pid'] != owner_pid]
+        drivers += [{'owner_pid': owner_pid, 'owner_start': owner_start, 'root_pid': root, 'root_start': d['start']}
+                    for root, d in self._drivers.items()]
+        self._write({'drivers': drivers, 'stats': dict(self.stats, open_drivers=len(self._drivers)),
+                     'updated_at': time.time()})
+
+
+def load_status(path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """สถิติล่าสุดของ browser สำหรับ /api/status (None ถ้ายังไม่เคยเปิด browser)"""
+    try:
+        with open(path or os.getenv("BROWSER_WATCHDOG_PATH", DEFAULT_STATE_PATH), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if 'stats' not in state:
+        return None
+    return dict(state['stats'], updated_seconds_ago=round(time.time() - state['updated_at'], 1))
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def main(argv: List[str]) -> int:
+    command = argv[0] if argv else 'status'
+    if command == 'cleanup':
+        print(f"🧹 Killed {BrowserWatchdog().cleanup_orphans()} orphaned browser processes")
+        return 0
+    if command != 'status':
+        print("usage: python browser_watchdog.py [status|cleanup]")
+        return 2
+    print(json.dumps(load_status(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
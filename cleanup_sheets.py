@@ -1,85 +1,228 @@
-# สคริปต์ทำความสะอาดข้อมูลใน Google Sheets (รันแยกต่างหาก)
-# สร้างไฟล์ cleanup_sheets.py
+# สคริปต์ซ่อมบำรุงข้อมูลใน Google Sheets (รันแยกต่างหาก)
+# โหลด Master_Data ครั้งเดียว คำนวณแผนซ่อมทั้งหมด แล้วเขียนกลับทีเดียว:
+#   - รวมคอลัมน์ Job No. ที่ซ้ำให้เหลือ Job_No คอลัมน์เดียว
+#   - ลบแถวที่ Job_No ซ้ำ (เก็บแถวที่ Last_Updated ใหม่สุด และคง First_Seen ที่เก่าที่สุด)
+#   - ลบแถวว่าง
+#   - เรียงคอลัมน์ตามลำดับมาตรฐาน (Job_No, First_Seen, Last_Updated, Source_Tab, ...)
+#
+# วิธีใช้: python cleanup_sheets.py           # dry-run แสดงรายงานอย่างเดียว
+#         python cleanup_sheets.py --apply   # เขียนแผนลงชีต
+
+import sys
+import argparse
+from typing import Dict, List, Optional, Tuple
 
-import os
 import gspread
-from google.oauth2.service_account import Credentials
-import json
-import base64
 
-def cleanup_duplicate_job_columns():
-    """ลบคอลัมน์ Job No. ที่ซ้ำออกจาก Google Sheets"""
-    
-    # เชื่อมต่อ Google Sheets
-    try:
-        # ใช้ credentials จาก environment
-        if os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON_B64"):
-            info = json.loads(base64.b64decode(os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON_B64")).decode("utf-8"))
-        else:
-            info = json.loads(os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"))
-        
-        creds = Credentials.from_service_account_info(info, scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ])
-        client = gspread.authorize(creds)
-        
-        # เปิด spreadsheet
-        sheet_id = os.getenv("GOOGLE_SHEET_ID")
-        spreadsheet = client.open_by_key(sheet_id)
-        worksheet = spreadsheet.worksheet("Master_Data")
-        
-        print("📊 Analyzing current sheet structure...")
-        
-        # ดึง headers ปัจจุบัน
-        headers = worksheet.row_values(1)
-        print(f"Current headers: {headers}")
-        
-        # หาคอลัมน์ที่ซ้ำกัน
-        job_columns = []
-        for idx, header in enumerate(headers):
-            if 'job' in str(header).lower() and 'no' in str(header).lower():
-                job_columns.append((idx + 1, header))  # 1-based index
-        
-        print(f"Found Job columns: {job_columns}")
-        
-        if len(job_columns) > 1:
-            print("🔄 Removing duplicate Job columns...")
-            
-            # เก็บเฉพาะคอลัมน์ Job_No (หรือคอลัมน์แรกถ้าไม่มี Job_No)
-            keep_column = None
-            remove_columns = []
-            
-            for col_idx, col_name in job_columns:
-                if col_name == 'Job_No':
-                    keep_column = (col_idx, col_name)
-                else:
-                    remove_columns.append((col_idx, col_name))
-            
-            # ถ้าไม่มี Job_No ให้เก็บคอลัมน์แรก
-            if keep_column is None:
-                keep_column = job_columns[0]
-                remove_columns = job_columns[1:]
-            
-            print(f"Keeping column: {keep_column[1]} at position {keep_column[0]}")
-            print(f"Removing columns: {[col[1] for col in remove_columns]}")
-            
-            # ลบคอลัมน์ที่ซ้ำ (เรียงจากขวาไปซ้ายเพื่อไม่ให้ index เปลี่ยน)
-            for col_idx, col_name in sorted(remove_columns, reverse=True):
-                print(f"Deleting column {col_name} at position {col_idx}")
-                worksheet.delete_columns(col_idx)
-            
-            print("✅ Cleanup completed!")
-            
-            # แสดง headers ใหม่
-            new_headers = worksheet.row_values(1)
-            print(f"New headers: {new_headers}")
-            
+from schema_registry import (compile_schema, canonical_header_order, SchemaRegistry,
+                             CANONICAL_HEADERS, JOB_NO, FIRST_SEEN, LAST_UPDATED)
+from stats_store import parse_sheet_time
+
+
+class RepairPlan:
+    """ผลลัพธ์ของการวิเคราะห์ชีต: ค่าใหม่ทั้งชีต และรายการสิ่งที่เปลี่ยน"""
+
+    def __init__(self, original: List[List[str]], values: List[List[str]]):
+        self.original = original
+        self.values = values
+        self.removed_job_columns: List[str] = []
+        self.empty_rows: List[int] = []
+        self.duplicate_rows: List[Tuple[str, int, List[int]]] = []  # (job_no, kept_row, dropped_rows)
+        self.rows_without_job_no: List[int] = []
+        self.reordered = False
+
+    @property
+    def has_changes(self) -> bool:
+        return self.values != self.original
+
+    def report(self, sample: int = 10) -> str:
+        old_headers = self.original[0] if self.original else []
+        new_headers = self.values[0] if self.values else []
+        lines = [
+            f"📊 Rows: {max(len(self.original) - 1, 0)} → {max(len(self.values) - 1, 0)}   "
+            f"Columns: {len(old_headers)} → {len(new_headers)}",
+            f"🧹 Duplicate Job No. columns removed: {self.removed_job_columns or 'none'}",
+            f"🧹 Empty rows removed: {len(self.empty_rows)}",
+            f"🧹 Duplicate Job_No rows removed: {sum(len(d) for _, _, d in self.duplicate_rows)} "
+            f"({len(self.duplicate_rows)} jobs)",
+        ]
+        for job_no, kept, dropped in self.duplicate_rows[:sample]:
+            lines.append(f"     {job_no}: keep row {kept}, drop rows {dropped}")
+        if len(self.duplicate_rows) > sample:
+            lines.append(f"     ... and {len(self.duplicate_rows) - sample} more")
+        if self.reordered:
+            lines.append("🔀 Column order:")
+            lines.append(f"     before: {old_headers}")
+            lines.append(f"     after:  {new_headers}")
+        if self.rows_without_job_no:
+            lines.append(f"⚠️ Rows with data but no Job_No (kept): {self.rows_without_job_no[:sample]}"
+                         f"{' ...' if len(self.rows_without_job_no) > sample else ''}")
+        return "\n".join(lines)
+
+
+def _row_time(row: List[str], idx: Optional[int]) -> Optional[float]:
+    return parse_sheet_time(row[idx]) if idx is not None and idx < len(row) else None
+
+
+def build_repair_plan(values: List[List[str]]) -> RepairPlan:
+    """คำนวณแผนซ่อมจากค่าทั้งชีต (แถวแรกคือ header) โดยไม่แตะชีตจริง"""
+    if not values:
+        return RepairPlan(values, values)
+    headers = [str(h).strip() for h in values[0]]
+    width = len(headers)
+    rows = [list(r) + [''] * (width - len(r)) for r in values[1:]]
+    schema = compile_schema(headers)
+    plan = RepairPlan(values, values)
+
+    job_idx = schema.index(JOB_NO)
+    extra_job_positions = [i for i in schema.job_no_positions if i != job_idx]
+    plan.removed_job_columns = [headers[i] for i in extra_job_positions]
+    first_idx = schema.index(FIRST_SEEN)
+    last_idx = schema.index(LAST_UPDATED)
+
+    # คอลัมน์ปลายทาง: field มาตรฐาน + คอลัมน์ข้อมูล (header ว่างที่มีข้อมูลเก็บไว้ท้ายสุด)
+    new_headers = canonical_header_order(h for _, h in schema.data_columns)
+    source_of: Dict[str, Optional[int]] = {CANONICAL_HEADERS[f]: schema.index(f) for f in CANONICAL_HEADERS}
+    source_of.update({h: schema.index(h) for h in new_headers if h not in source_of})
+    blank_with_data = [i for i, h in schema.data_columns if not h and any(r[i].strip() for r in rows)]
+    positions = [source_of[h] for h in new_headers] + blank_with_data
+    new_headers = new_headers + [''] * len(blank_with_data)
+
+    kept: Dict[str, int] = {}           # job_no -> index ใน output_rows
+    kept_sheet_row: Dict[str, int] = {}
+    dropped: Dict[str, List[int]] = {}
+    output_rows: List[List[str]] = []
+    for sheet_row, row in enumerate(rows, start=2):
+        if not any(cell.strip() for cell in row):
+            plan.empty_rows.append(sheet_row)
+            continue
+        job_no = row[job_idx].strip() if job_idx is not None else ''
+        if not job_no:
+            # ใช้ค่าจากคอลัมน์ Job No. ที่ซ้ำถ้าคอลัมน์หลักว่าง
+            job_no = next((row[i].strip() for i in extra_job_positions if row[i].strip()), '')
+            if job_no and job_idx is not None:
+                row[job_idx] = job_no
+        new_row = [row[i] if i is not None else '' for i in positions]
+        if not job_no:
+            plan.rows_without_job_no.append(sheet_row)
+            output_rows.append(new_row)
+            continue
+
+        if job_no not in kept:
+            kept[job_no] = len(output_rows)
+            kept_sheet_row[job_no] = sheet_row
+            output_rows.append(new_row)
+            continue
+
+        # Job_No ซ้ำ: เก็บแถวที่ Last_Updated ใหม่กว่า (เท่ากันให้แถวล่างชนะ) และ First_Seen ที่เก่ากว่า
+        current = output_rows[kept[job_no]]
+        current_time = parse_sheet_time(current[2]) or 0
+        candidate_time = _row_time(row, last_idx) or 0
+        earliest_first = min(
+            (t for t in (parse_sheet_time(current[1]), _row_time(row, first_idx)) if t is not None),
+            default=None)
+        earliest_text = current[1] if earliest_first == parse_sheet_time(current[1]) else new_row[1]
+        if candidate_time >= current_time:
+            dropped.setdefault(job_no, []).append(kept_sheet_row[job_no])
+            kept_sheet_row[job_no] = sheet_row
+            output_rows[kept[job_no]] = new_row
         else:
-            print("✅ No duplicate columns found!")
-            
+            dropped.setdefault(job_no, []).append(sheet_row)
+        if earliest_first is not None:
+            output_rows[kept[job_no]][1] = earliest_text
+
+    plan.duplicate_rows = [(job_no, kept_sheet_row[job_no], sorted(rows_)) for job_no, rows_ in dropped.items()]
+    plan.reordered = ([h for i, h in enumerate(headers) if h and i not in extra_job_positions]
+                      != [h for h in new_headers if h])
+    plan.values = [new_headers] + output_rows
+    return plan
+
+
+def build_job_column_plan(values: List[List[str]]) -> RepairPlan:
+    """แผนที่ลบเฉพาะคอลัมน์ Job No. ที่ซ้ำ (เติม Job_No ที่ว่างจากคอลัมน์ที่ถูกลบ) ไม่แตะแถวหรือลำดับคอลัมน์อื่น"""
+    if not values:
+        return RepairPlan(values, values)
+    schema = compile_schema(values[0])
+    plan = RepairPlan(values, values)
+    job_idx = schema.index(JOB_NO)
+    extra_job_positions = [i for i in schema.job_no_positions if i != job_idx]
+    if not extra_job_positions:
+        return plan
+    plan.removed_job_columns = [schema.headers[i] for i in extra_job_positions]
+    width = len(values[0])
+    new_values = []
+    for row in values:
+        row = list(row) + [''] * (width - len(row))
+        if not row[job_idx].strip():
+            row[job_idx] = next((row[i].strip() for i in extra_job_positions if row[i].strip()), row[job_idx])
+        new_values.append([cell for i, cell in enumerate(row) if i not in extra_job_positions])
+    plan.values = new_values
+    return plan
+
+
+def padded_values(values: List[List[str]], rows: int, cols: int) -> List[List[str]]:
+    """ขยายค่าให้เต็มพื้นที่ rows x cols ด้วยช่องว่าง (เขียนทับแถว/คอลัมน์เดิมที่เกินมาใน update เดียว)"""
+    padded = [list(row) + [''] * (cols - len(row)) for row in values]
+    padded += [[''] * cols for _ in range(rows - len(values))]
+    return padded
+
+
+def apply_plan(worksheet: gspread.Worksheet, plan: RepairPlan):
+    """เขียนค่าใหม่ทับทั้งชีตในครั้งเดียว (ล้างแถว/คอลัมน์เดิมที่เกินในคำขอเดียวกัน) แล้วจึงตัดส่วนเกินออก
+    ถ้าตัดไม่สำเร็จหรือ process ตายก่อน ชีตมีแค่แถวว่างต่อท้าย ไม่มีแถวเก่าที่ซ้ำกับงานที่รวมไปแล้ว"""
+    rows = len(plan.values)
+    cols = max(len(plan.values[0]), 1)
+    if cols > worksheet.col_count:
+        worksheet.add_cols(cols - worksheet.col_count)
+    values = padded_values(plan.values, max(rows, worksheet.row_count), max(cols, worksheet.col_count))
+    worksheet.update("A1", values, value_input_option='USER_ENTERED')
+    worksheet.resize(rows=max(rows, 2), cols=cols)
+
+
+def connect_master_worksheet() -> gspread.Worksheet:
+    from main_master_only import Config, GoogleSheetManager
+    sheet_manager = GoogleSheetManager(Config.GOOGLE_SHEET_ID, Config.GOOGLE_SVC_JSON_RAW, Config.GOOGLE_SVC_JSON_B64)
+    return sheet_manager.spreadsheet.worksheet(Config.MASTER_SHEET_NAME)
+
+
+def cleanup_master_data(apply: bool = False, build_plan=build_repair_plan) -> Optional[RepairPlan]:
+    """วิเคราะห์ Master_Data และ (ถ้า apply) เขียนแผนซ่อมลงชีต"""
+    try:
+        worksheet = connect_master_worksheet()
+        print("📊 Loading sheet...")
+        values = worksheet.get_all_values()
+        plan = build_plan(values)
+        print(plan.report())
+
+        if not plan.has_changes:
+            print("✅ Nothing to repair!")
+            return plan
+        if not apply:
+            print("ℹ️ Dry run only. Re-run with --apply to write these changes.")
+            return plan
+
+        print("🔄 Applying repair plan...")
+        apply_plan(worksheet, plan)
+        # header ใหม่มาจากเครื่องมือนี้เอง ไม่ต้องรายงานเป็น drift ในการซิงค์รอบถัดไป
+        registry = SchemaRegistry()
+        registry.accept(f"sheet:{worksheet.title}", plan.values[0])
+        registry.save()
+        print("✅ Cleanup completed!")
+        return plan
+
     except Exception as e:
         print(f"❌ Error during cleanup: {e}")
+        return None
+
+
+def cleanup_duplicate_job_columns():
+    """ลบคอลัมน์ Job No. ที่ซ้ำออกจาก Google Sheets (คงไว้เพื่อความเข้ากันได้)
+    ไม่ลบแถวหรือเรียงคอลัมน์ใหม่ การซ่อมทั้งหมดใช้ `python cleanup_sheets.py --apply`"""
+    return cleanup_master_data(apply=True, build_plan=build_job_column_plan)
+
 
 if __name__ == "__main__":
-    cleanup_duplicate_job_columns()
+    parser = argparse.ArgumentParser(description="Repair Master_Data in one pass")
+    parser.add_argument('--apply', action='store_true', help='write the repair plan to the sheet')
+    args = parser.parse_args()
+    sys.exit(0 if cleanup_master_data(apply=args.apply) is not None else 1)
@@ -0,0 +1,95 @@
+# exporter.py
+# ส่งออกข้อมูล Master_Data เป็น CSV/XLSX แบบ streaming (ไม่โหลดทั้งชีตไว้ในหน่วยความจำ)
+
+import io
+import os
+import csv
+import tempfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import logging
+
+from stats_store import parse_sheet_time, THAILAND_TZ
+
+logger = logging.getLogger(__name__)
+
+CSV_BATCH_ROWS = 500
+FILE_CHUNK_BYTES = 64 * 1024
+
+
+def parse_since(value: Optional[str]) -> Optional[float]:
+    """รับวันที่แบบ YYYY-MM-DD หรือ DD/MM/YYYY (เวลาไทย) คืนค่าเป็น timestamp"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d', '%Y-%m-%d %H:%M', '%d/%m/%Y', '%d/%m/%Y %H:%M'):
+        try:
+            return THAILAND_TZ.localize(datetime.strptime(value.strip(), fmt)).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid 'since' value: {value}")
+
+
+def filter_rows(headers: List[str], rows: Iterable[List[str]], tab_name: Optional[str] = None,
+                since: Optional[float] = None) -> Iterator[List[str]]:
+    """กรองแถวตาม Source_Tab และ First_Seen >= since และเติมช่องว่างให้ครบทุกคอลัมน์"""
+    width = len(headers)
+    tab_idx = headers.index('Source_Tab') if 'Source_Tab' in headers else None
+    seen_idx = headers.index('First_Seen') if 'First_Seen' in headers else None
+    for row in rows:
+        if not any(row):
+            continue
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+        if tab_name is not None and (tab_idx is None or row[tab_idx] != tab_name):
+            continue
+        if since is not None:
+            first_seen = parse_sheet_time(row[seen_idx]) if seen_idx is not None else None
+            if first_seen is None or first_seen < since:
+                continue
+        yield row
+
+
+def stream_csv(headers: List[str], rows: Iterable[List[str]]) -> Iterator[bytes]:
+    """สร้าง CSV ทีละชุด (มี BOM ให้ Excel อ่านภาษาไทยได้)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_BATCH_ROWS:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_xlsx(headers: List[str], rows: Iterable[List[str]], sheet_title: str = 'Master_Data') -> Iterator[bytes]:
+    """เขียน XLSX ด้วย openpyxl write-only ลงไฟล์ชั่วคราว แล้วส่งออกทีละ chunk"""
+    from openpyxl import Workbook  # โหลดเมื่อส่งออก XLSX ครั้งแรก (ไม่ให้ app.py ต้อง import ตอนเริ่มต้น)
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_title)
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+        wb.save(path)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(FILE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not remove temporary export file {path}: {e}")
@@ -0,0 +1,156 @@
+# job_index.py
+# index งานใน Master_Data แบบประหยัดหน่วยความจำ: Job_No -> slot ใน dict เดียว
+# แถวในชีตเก็บใน array('I') และ Source_Tab เก็บเป็นรหัสตัวเลขเล็ก (intern ชื่อแท็บ) ใน array('H')
+# แทน dict ย่อยต่องาน ({'row', 'source_tab_col', 'current_status'}) ที่กินหลายร้อยไบต์ต่องาน
+#
+# วิธีใช้: python job_index.py bench [จำนวนงาน ...]   # ค่าเริ่มต้น 10000 100000 1000000
+
+import gc
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class JobIndex:
+    """ตำแหน่งและสถานะของงานใน Master_Data (slot ของงาน = ตำแหน่งใน array rows/tabs)
+    row = 0 คืองานใหม่ที่ยังไม่อยู่ในชีต (เพิ่มระหว่างคำนวณ change set, append ค้างอยู่ใน journal)
+    cell ของงานเหล่านี้บันทึกด้วย row 0 แล้ว drain รวมเข้ากับแถวที่ append หรือหาแถวจริงด้วย Job_No"""
+
+    __slots__ = ('source_tab_col', '_slots', '_rows', '_tabs', '_tab_names', '_tab_codes')
+
+    def __init__(self, source_tab_col: Optional[int] = None):
+        self.source_tab_col = source_tab_col
+        self._slots: Dict[str, int] = {}
+        self._rows = array('I')
+        self._tabs = array('H')
+        # รหัส 0 = ไม่มี Source_Tab
+        self._tab_names: List[str] = ['']
+        self._tab_codes: Dict[str, int] = {'': 0}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, str, str]], source_tab_col: Optional[int] = None) -> 'JobIndex':
+        """สร้างจาก (row, job_no, source_tab) ที่อ่านทีละช่วง (Job_No ซ้ำ: ใช้แถวล่าสุดเหมือนเดิม)"""
+        index = cls(source_tab_col)
+        for row, job_no, status in rows:
+            job_no = job_no.strip()
+            if job_no:
+                index.add(job_no, row, status)
+        return index
+
+    def _code(self, status: str) -> int:
+        code = self._tab_codes.get(status)
+        if code is None:
+            code = len(self._tab_names)
+            self._tab_names.append(status)
+            self._tab_codes[status] = code
+        return code
+
+    def add(self, job_no: str, row: int, status: str = ''):
+        slot = self._slots.get(job_no)
+        if slot is None:
+            self._slots[job_no] = len(self._rows)
+            self._rows.append(row)
+            self._tabs.append(self._code(status))
+        else:
+            self._rows[slot] = row
+            self._tabs[slot] = self._code(status)
+
+    def set_status(self, job_no: str, status: str):
+        self._tabs[self._slots[job_no]] = self._code(status)
+
+    def __contains__(self, job_no: object) -> bool:
+        return job_no in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._slots)
+
+    def row(self, job_no: str) -> Optional[int]:
+        """แถวในชีต (None ถ้าไม่มีงานนี้หรือยังไม่ได้เขียนลงชีต)"""
+        slot = self._slots.get(job_no)
+        return (self._rows[slot] or None) if slot is not None else None
+
+    def status(self, job_no: str) -> str:
+        return self._tab_names[self._tabs[self._slots[job_no]]]
+
+    def jobs_in(self, status: str) -> Set[str]:
+        """Job_No ทั้งหมดที่ Source_Tab เป็นค่านี้"""
+        code = self._tab_codes.get(status)
+        if code is None:
+            return set()
+        tabs = self._tabs
+        return {job_no for job_no, slot in self._slots.items() if tabs[slot] == code}
+
+    def items(self) -> Iterator[Tuple[str, int, str]]:
+        """(job_no, row, source_tab) ของทุกงาน"""
+        rows, tabs, names = self._rows, self._tabs, self._tab_names
+        for job_no, slot in self._slots.items():
+            yield job_no, rows[slot], names[tabs[slot]]
+
+
+# ==============================================================================
+# ⏱️ Memory benchmark
+# ==============================================================================
+
+BENCH_TABS = ["รอดำเนินการ", "กำลังดำเนินการ", "รอตรวจสอบ", "รออนุมัติ", "เสร็จสิ้น", "ยกเลิก", "ส่งคืน", "อื่นๆ"]
+BENCH_COLUMNS = 15   # ความกว้างโดยประมาณของ Master_Data (field มาตรฐาน + คอลัมน์ข้อมูลของแท็บ)
+BENCH_PAGE_ROWS = 20000
+
+
+def _bench_row(i: int) -> List[str]:
+    return [f"JOB-{i:08d}", BENCH_TABS[i % len(BENCH_TABS)]] + [f"value {i} / {c}" for c in range(BENCH_COLUMNS - 2)]
+
+
+def _legacy_index(n: int) -> Dict[str, Dict]:
+    """แบบเดิม: ค่าทั้งชีต (get_all_values) แล้วสร้าง dict ย่อยต่องาน"""
+    all_values = [['Job_No', 'Source_Tab'] + [f"Col_{c}" for c in range(BENCH_COLUMNS - 2)]]
+    all_values.extend(_bench_row(i) for i in range(n))
+    jobs = {}
+    for row_idx, row in enumerate(all_values[1:], start=2):
+        jobs[row[0].strip()] = {'row': row_idx, 'source_tab_col': 2, 'current_status': row[1]}
+    return jobs
+
+
+def _streamed_index(n: int) -> JobIndex:
+    """แบบใหม่: อ่านเฉพาะคอลัมน์ Job_No/Source_Tab ทีละหน้า (หน้าเก่าถูกปล่อยก่อนอ่านหน้าถัดไป)"""
+    def pages() -> Iterator[Tuple[int, str, str]]:
+        for start in range(0, n, BENCH_PAGE_ROWS):
+            page = [_bench_row(i)[:2] for i in range(start, min(start + BENCH_PAGE_ROWS, n))]
+            for offset, (job_no, status) in enumerate(page):
+                yield start + offset + 2, job_no, status
+    return JobIndex.from_rows(pages(), source_tab_col=2)
+
+
+def _measure(build: Callable[[int], Any], n: int) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = build(n)
+    elapsed = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del index
+    return {'seconds': elapsed, 'retained_mb': retained / 1024 / 1024, 'peak_mb': peak / 1024 / 1024}
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] != 'bench':
+        print("usage: python job_index.py bench [jobs ...]")
+        return 2
+    sizes = [int(n) for n in argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'jobs':>9} | {'peak old':>9} {'peak new':>9} {'saved':>7} | "
+          f"{'kept old':>9} {'kept new':>9} {'saved':>7} | {'s old':>6} {'s new':>6}")
+    for n in sizes:
+        old, new = _measure(_legacy_index, n), _measure(_streamed_index, n)
+        print(f"{n:>9} | {old['peak_mb']:9.1f} {new['peak_mb']:9.1f} {(1 - new['peak_mb'] / old['peak_mb']) * 100:6.1f}% | "
+              f"{old['retained_mb']:9.1f} {new['retained_mb']:9.1f} {(1 - new['retained_mb'] / old['retained_mb']) * 100:6.1f}% | "
+              f"{old['seconds']:6.2f} {new['seconds']:6.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
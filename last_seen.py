@@ -0,0 +1,143 @@
+# last_seen.py
+# เวลาที่พบงานล่าสุด (last seen) แบบ run-stamp: แต่ละรอบการซิงค์บันทึก run id + เวลาครั้งเดียว
+# ส่วนแต่ละงานเก็บแค่ run id ล่าสุดที่พบ (อัปเดตเป็นก้อนต่อแท็บ) แทนการเขียน Last_Updated ทุกงานลงชีตทุกรอบ
+# คอลัมน์ Last_Updated ใน Master_Data ถูก materialize เป็นก้อนตามรอบเวลา หรือสั่งเองด้วย CLI
+#
+# วิธีใช้: python last_seen.py status
+#         python last_seen.py materialize   # เขียน Last_Updated ที่ค้างลงชีตทันที
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "last_seen.db"
+
+
+class LastSeenStore:
+    """runs: หนึ่งแถวต่อรอบ (run_key จาก checkpoint/shard round), job_seen: run id ล่าสุดที่พบและที่เขียนลงชีตแล้ว"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("LAST_SEEN_DB_PATH", DEFAULT_DB_PATH)
+        self._local = threading.local()
+        self._init_schema()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_key TEXT UNIQUE NOT NULL,
+                    started_at REAL NOT NULL,
+                    stamp TEXT NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_seen (
+                    job_no TEXT PRIMARY KEY,
+                    run_id INTEGER NOT NULL,
+                    written_run_id INTEGER
+                )""")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)")
+
+    # --------------------------------------------------------------------------
+    # Per-run stamps
+    # --------------------------------------------------------------------------
+
+    def begin_run(self, run_key: str, stamp: str) -> int:
+        """run id ของรอบ (รอบที่ทำต่อจาก checkpoint ใช้ run id และเวลาเดิม)"""
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO runs (run_key, started_at, stamp) VALUES (?, ?, ?)",
+                              (run_key, time.time(), stamp))
+            return self.conn.execute("SELECT run_id FROM runs WHERE run_key = ?", (run_key,)).fetchone()[0]
+
+    def mark_seen(self, run_id: int, job_nos: Iterable[str]) -> int:
+        rows = [(job_no, run_id) for job_no in job_nos]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO job_seen (job_no, run_id) VALUES (?, ?) "
+                "ON CONFLICT(job_no) DO UPDATE SET run_id = excluded.run_id", rows)
+        return len(rows)
+
+    def last_seen(self, job_no: str) -> Optional[str]:
+        row = self.conn.execute("SELECT r.stamp FROM job_seen j JOIN runs r ON r.run_id = j.run_id "
+                                "WHERE j.job_no = ?", (job_no,)).fetchone()
+        return row[0] if row else None
+
+    # --------------------------------------------------------------------------
+    # Materialization (Last_Updated in Master_Data)
+    # --------------------------------------------------------------------------
+
+    def materialize_due(self, interval_hours: float) -> bool:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'materialized_at'").fetchone()
+        return row is None or time.time() - row[0] >= interval_hours * 3600
+
+    def pending(self) -> List[Tuple[str, int, str]]:
+        """(job_no, run_id, stamp) ของงานที่ last seen ยังไม่ได้เขียนลงชีต"""
+        return self.conn.execute("""
+            SELECT j.job_no, j.run_id, r.stamp FROM job_seen j JOIN runs r ON r.run_id = j.run_id
+            WHERE j.written_run_id IS NULL OR j.written_run_id != j.run_id""").fetchall()
+
+    def mark_written(self, items: Iterable[Tuple[str, int]]):
+        with self.conn:
+            self.conn.executemany("UPDATE job_seen SET written_run_id = ? WHERE job_no = ?",
+                                  [(run_id, job_no) for job_no, run_id in items])
+
+    def finish_materialize(self):
+        """บันทึกเวลาที่ materialize ครบ และลบรอบที่ไม่มีงานอ้างถึงแล้ว"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('materialized_at', ?)", (time.time(),))
+            self.conn.execute("DELETE FROM runs WHERE run_id NOT IN (SELECT DISTINCT run_id FROM job_seen) "
+                              "AND run_id < (SELECT MAX(run_id) FROM runs)")
+
+    def status(self) -> Dict[str, Any]:
+        jobs, pending = self.conn.execute(
+            "SELECT COUNT(*), SUM(written_run_id IS NULL OR written_run_id != run_id) FROM job_seen").fetchone()
+        last_run = self.conn.execute("SELECT run_key, stamp FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        materialized = self.conn.execute("SELECT value FROM meta WHERE key = 'materialized_at'").fetchone()
+        return {
+            'jobs': jobs,
+            'pending_last_updated': pending or 0,
+            'last_run': {'run_key': last_run[0], 'stamp': last_run[1]} if last_run else None,
+            'materialized_hours_ago': round((time.time() - materialized[0]) / 3600, 1) if materialized else None,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def main(argv: List[str]) -> int:
+    command = argv[0] if argv else 'status'
+    if command == 'materialize':
+        from main_master_only import Config, JobSyncApplication
+        app = JobSyncApplication(Config())
+        app.materialize_last_seen(force=True)
+        print(json.dumps(app.last_seen.status(), ensure_ascii=False, indent=2))
+        return 0
+    if command != 'status':
+        print("usage: python last_seen.py [status|materialize]")
+        return 2
+    print(json.dumps(LastSeenStore().status(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
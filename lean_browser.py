@@ -0,0 +1,202 @@
+# lean_browser.py
+# โปรไฟล์ Chrome แบบประหยัดทรัพยากร (lean) และการวัดผลต่อแท็บ
+# ใช้ร่วมกันโดย WebScraper.create_driver และ SeleniumBrowser._create_driver
+
+import os
+from typing import Dict, List, Optional, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ไฟล์ที่ไม่จำเป็นต่อการอ่านตาราง (รูป, ฟอนต์, สื่อ, stylesheet)
+# ต่อท้ายด้วย * เพื่อให้ตรงกับ URL ที่มี query string ด้วย (เช่น style.css?v=3)
+BLOCKED_ASSET_PATTERNS: List[str] = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.bmp*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    "*.mp4*", "*.webm*", "*.ogg*", "*.mp3*", "*.wav*",
+    "*.css*",
+]
+
+# third-party ที่เป็น tracker/analytics เท่านั้น
+# (ไม่บล็อก third-party ทั้งหมด เพราะ jQuery/DataTables อาจโหลดจาก CDN)
+BLOCKED_THIRD_PARTY_PATTERNS: List[str] = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*facebook.com/tr*",
+    "*hotjar.com*", "*clarity.ms*", "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+]
+
+# ปิดการโหลดผ่าน content settings (2 = block)
+LEAN_CONTENT_SETTINGS: Dict[str, int] = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.fonts": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.plugins": 2,
+    "profile.managed_default_content_settings.popups": 2,
+    "profile.managed_default_content_settings.geolocation": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+}
+
+LEAN_CHROME_ARGS: List[str] = [
+    "--window-size=1024,768",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-features=site-per-process,TranslateUI,MediaRouter,OptimizationHints",
+    "--renderer-process-limit=1",
+    "--no-first-run",
+    "--mute-audio",
+    "--disk-cache-size=1",
+    "--media-cache-size=1",
+    "--js-flags=--max-old-space-size=256",
+]
+
+
+def blocked_url_patterns() -> List[str]:
+    """รายการ URL pattern ที่จะส่งให้ Network.setBlockedURLs (เพิ่มเติมได้ผ่าน LEAN_EXTRA_BLOCKED_URLS)"""
+    extra = [p.strip() for p in os.getenv("LEAN_EXTRA_BLOCKED_URLS", "").split(",") if p.strip()]
+    return BLOCKED_ASSET_PATTERNS + BLOCKED_THIRD_PARTY_PATTERNS + extra
+
+
+def apply_lean_options(chrome_options) -> None:
+    """เพิ่ม flags และ content settings แบบประหยัดหน่วยความจำลงใน ChromeOptions"""
+    for arg in LEAN_CHROME_ARGS:
+        chrome_options.add_argument(arg)
+    chrome_options.add_experimental_option("prefs", dict(LEAN_CONTENT_SETTINGS))
+
+
+def enable_request_blocking(driver) -> bool:
+    """บล็อก request ที่ไม่จำเป็นผ่าน Chrome DevTools Protocol"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns()})
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Could not enable CDP request blocking: {e}")
+        return False
+
+
+# ==============================================================================
+# 📏 Per-tab metrics
+# ==============================================================================
+
+_PAGE_METRICS_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+const res = performance.getEntriesByType('resource');
+let bytes = nav ? (nav.transferSize || 0) : 0;
+for (const r of res) { bytes += (r.transferSize || 0); }
+return {
+    bytes: bytes,
+    requests: res.length + (nav ? 1 : 0),
+    load_ms: nav ? Math.round(nav.loadEventEnd - nav.startTime) : null
+};
+"""
+
+
+def _proc_stat(pid: int) -> Optional[List[str]]:
+    """field ของ /proc/<pid>/stat ตั้งแต่ state (field ที่ 3) เป็นต้นไป"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        # ชื่อ process อยู่ในวงเล็บและอาจมีช่องว่าง จึงตัดหลัง ')' ตัวสุดท้าย
+        return stat.rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        fields = _proc_stat(int(name))
+        try:
+            children.setdefault(int(fields[1]), []).append(int(name))
+        except (TypeError, ValueError, IndexError):
+            continue
+    return children
+
+
+def process_parent(pid: int) -> Optional[int]:
+    fields = _proc_stat(pid)
+    return int(fields[1]) if fields else None
+
+
+def process_start_ticks(pid: int) -> Optional[int]:
+    """เวลาเริ่มของ process (clock ticks หลัง boot) ใช้แยก process เดิมกับ pid ที่ถูกนำกลับมาใช้ใหม่
+    None ถ้า process จบแล้ว (รวม zombie ที่ยังไม่ถูก reap)"""
+    fields = _proc_stat(pid)
+    return int(fields[19]) if fields and fields[0] != 'Z' else None
+
+
+def process_cpu_seconds(pids: List[int]) -> float:
+    """เวลา CPU (user + system) รวมของ process ทั้งหมด"""
+    ticks = 0
+    for pid in pids:
+        fields = _proc_stat(pid)
+        if fields:
+            ticks += int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def process_rss_bytes(pids: List[int]) -> int:
+    return sum(_read_status_kb(pid, "VmRSS") for pid in pids) * 1024
+
+
+def process_tree_pids(root_pid: int) -> List[int]:
+    """คืนค่า pid ของ process และลูกหลานทั้งหมด (Linux /proc เท่านั้น)"""
+    if not os.path.isdir("/proc"):
+        return []
+    children = _proc_children()
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _read_status_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def browser_rss_bytes(driver) -> Optional[int]:
+    """RSS รวมของ chromedriver และ chrome ทุก process (None ถ้าอ่านไม่ได้)"""
+    try:
+        root_pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    pids = process_tree_pids(root_pid)
+    if not pids:
+        return None
+    return process_rss_bytes(pids)
+
+
+def collect_page_metrics(driver) -> Dict[str, Any]:
+    """เก็บ bytes ที่โหลด, จำนวน request, เวลาโหลดหน้า และ RSS ของเบราว์เซอร์"""
+    metrics: Dict[str, Any] = {"bytes": None, "requests": None, "load_ms": None}
+    try:
+        metrics.update(driver.execute_script(_PAGE_METRICS_JS) or {})
+    except Exception as e:
+        logger.debug(f"Could not read performance entries: {e}")
+    metrics["rss_bytes"] = browser_rss_bytes(driver)
+    return metrics
+
+
+def format_metrics(metrics: Dict[str, Any]) -> str:
+    def mb(v):
+        return f"{v / 1024 / 1024:.1f}MB" if v is not None else "n/a"
+    load = f"{metrics['load_ms']}ms" if metrics.get("load_ms") is not None else "n/a"
+    return (f"transferred={mb(metrics.get('bytes'))} requests={metrics.get('requests')} "
+            f"load={load} browser_rss={mb(metrics.get('rss_bytes'))}")
@@ -0,0 +1,528 @@
+# loadtest.py
+# load test ของ dashboard และ API: จำลองผู้ใช้ N คนเปิด dashboard พร้อมกัน (โหลด / กับ static แล้ว poll API ตามรอบของ dashboard.js)
+# Google Sheets และ edoclite ถูกแทนด้วย stub ในเครื่อง (มี latency จำลอง ไม่ออก network) และแอปรันใต้ gunicorn แบบ production
+# รายงาน throughput และ latency p50/p95/p99 ต่อ endpoint ทั้งช่วงว่าง และช่วงที่มีการซิงค์ทำงานอยู่ใน process เดียวกัน
+#
+# วิธีใช้: python loadtest.py [--clients 20] [--duration 30] [--rows 20000] [--workers 1] [--threads 1]
+#                             [--speed 1] [--no-sync] [--json result.json] [--max-p95-ms 1000]
+#         python loadtest.py --url http://host:port ...   # ยิงเซิร์ฟเวอร์ที่รันอยู่แล้ว (ไม่ใช้ stub และไม่เริ่มการซิงค์)
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# 🧪 Stubs (ทำงานใน process ของ gunicorn ผ่าน create_app())
+# ==============================================================================
+
+# คอลัมน์ข้อมูลของแท็บจำลอง (นอกจาก Job No.)
+STUB_DATA_HEADERS = ['เรื่อง', 'ผู้แจ้ง', 'หน่วยงาน', 'วันที่แจ้ง', 'รายละเอียด']
+# งานใหม่ที่พบในแต่ละรอบการซิงค์จำลอง
+STUB_NEW_PER_ROUND = 20
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class StubWorksheet:
+    """ชีตในหน่วยความจำที่มี method ของ gspread.Worksheet เท่าที่แอปใช้ ทุก API call หน่วงเท่า round trip ของ Sheets"""
+
+    def __init__(self, title: str, values: List[List[str]], latency: float):
+        self.title = title
+        self._values = values
+        self._latency = latency
+        self._lock = threading.Lock()
+
+    def _call(self):
+        time.sleep(self._latency)
+
+    @property
+    def row_count(self) -> int:
+        return max(len(self._values), 1)
+
+    @property
+    def col_count(self) -> int:
+        return max(len(self._values[0]) if self._values else 0, 1)
+
+    def _range(self, a1: str) -> Tuple[int, int, int, int]:
+        from gspread.utils import a1_to_rowcol
+        first, _, last = a1.partition(':')
+        r1, c1 = a1_to_rowcol(first)
+        r2, c2 = a1_to_rowcol(last or first)
+        return r1, c1, r2, c2
+
+    def row_values(self, row: int) -> List[str]:
+        self._call()
+        with self._lock:
+            return list(self._values[row - 1]) if row <= len(self._values) else []
+
+    def col_values(self, col: int) -> List[str]:
+        self._call()
+        with self._lock:
+            return [r[col - 1] if col <= len(r) else '' for r in self._values]
+
+    def get_all_values(self) -> List[List[str]]:
+        self._call()
+        with self._lock:
+            return [list(r) for r in self._values]
+
+    def get_all_records(self) -> List[Dict[str, str]]:
+        values = self.get_all_values()
+        if not values:
+            return []
+        headers = values[0]
+        return [dict(zip(headers, row + [''] * (len(headers) - len(row)))) for row in values[1:]]
+
+    def get(self, a1: str) -> List[List[str]]:
+        self._call()
+        r1, c1, r2, c2 = self._range(a1)
+        with self._lock:
+            return [list(r[c1 - 1:c2]) for r in self._values[r1 - 1:r2]]
+
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        self._call()
+        result = []
+        with self._lock:
+            for a1 in ranges:
+                r1, c1, r2, c2 = self._range(a1)
+                rows = [[v for v in r[c1 - 1:c2]] for r in self._values[r1 - 1:r2]]
+                while rows and not any(rows[-1]):
+                    rows.pop()
+                result.append(rows)
+        return result
+
+    def _write(self, row: int, col: int, rows: List[List[Any]]):
+        for i, values in enumerate(rows):
+            while len(self._values) < row + i:
+                self._values.append([])
+            target = self._values[row + i - 1]
+            for j, value in enumerate(values):
+                while len(target) < col + j:
+                    target.append('')
+                target[col + j - 1] = str(value)
+
+    def update(self, a1: str, rows: List[List[Any]], **kwargs):
+        self._call()
+        r1, c1, _, _ = self._range(a1)
+        with self._lock:
+            self._write(r1, c1, rows)
+
+    def update_cell(self, row: int, col: int, value: Any):
+        self.update(_a1(row, col), [[value]])
+
+    def batch_update(self, data: List[Dict[str, Any]], **kwargs):
+        self._call()
+        with self._lock:
+            for item in data:
+                r1, c1, _, _ = self._range(item['range'])
+                self._write(r1, c1, item['values'])
+
+    def append_rows(self, rows: List[List[Any]], **kwargs):
+        self._call()
+        with self._lock:
+            self._values.extend([str(v) for v in row] for row in rows)
+
+    def insert_row(self, values: List[Any], index: int = 1, **kwargs):
+        self._call()
+        with self._lock:
+            self._values.insert(index - 1, [str(v) for v in values])
+            # Sync_Logs โตไม่จำกัดระหว่าง load test: เก็บไว้แค่ 1000 แถวล่าสุด
+            del self._values[1000:]
+
+    def add_cols(self, cols: int):
+        self._call()
+
+    def freeze(self, **kwargs):
+        pass
+
+
+def _a1(row: int, col: int) -> str:
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(row, col)
+
+
+class StubSpreadsheet:
+    def __init__(self, latency: float):
+        self.title = 'loadtest'
+        self._latency = latency
+        self._sheets: Dict[str, StubWorksheet] = {}
+
+    def worksheet(self, title: str) -> StubWorksheet:
+        time.sleep(self._latency)  # metadata request
+        try:
+            return self._sheets[title]
+        except KeyError:
+            import gspread
+            raise gspread.exceptions.WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> StubWorksheet:
+        self._sheets[title] = StubWorksheet(title, [], self._latency)
+        return self._sheets[title]
+
+
+class StubClient:
+    def __init__(self, spreadsheet: StubSpreadsheet):
+        self._spreadsheet = spreadsheet
+
+    def open_by_key(self, key: str) -> StubSpreadsheet:
+        return self._spreadsheet
+
+
+def _tab_of(job: int, round_no: int, tabs: List[int], period: int) -> int:
+    """แท็บของงานในรอบที่ round_no: ทุกรอบงานราว 1/period ย้ายไปแท็บถัดไป"""
+    first = (-job) % period or period
+    moves = 0 if round_no < first else (round_no - first) // period + 1
+    return tabs[(job + moves) % len(tabs)]
+
+
+def _job_no(job: int) -> str:
+    return f"LT{job:07d}"
+
+
+def _data_values(job: int) -> List[str]:
+    return [f"เรื่องทดสอบ {job}", f"ผู้แจ้ง {job % 500}", f"หน่วยงาน {job % 40}",
+            f"{job % 28 + 1:02d}/01/2025", f"รายละเอียดงานจำลองหมายเลข {job}"]
+
+
+class StubScraper:
+    """แทน WebScraper: ไม่เปิด browser แต่ละแท็บใช้เวลา LOADTEST_TAB_SECONDS และคืนงานจากชุดข้อมูลจำลอง
+    แต่ละรอบการซิงค์ (หนึ่ง instance ต่อรอบ) มีงานย้ายแท็บตาม LOADTEST_CHURN และงานใหม่ STUB_NEW_PER_ROUND งาน"""
+    rounds = 0
+
+    def __init__(self, user: str = '', password: str = '', lean: bool = False):
+        from main_master_only import Config, BrowserWatchdog
+        StubScraper.rounds += 1
+        self.round_no = StubScraper.rounds
+        self.lean = lean
+        self.tab_metrics: Dict[int, Dict[str, Any]] = {}
+        self.session = None
+        self.watchdog = BrowserWatchdog()
+        self._tabs = Config.TABS_TO_SCRAPE
+        self._rows = int(_env_float('LOADTEST_ROWS', 20000))
+        self._period = max(int(round(1 / max(_env_float('LOADTEST_CHURN', 0.01), 1e-6))), 1)
+        self._tab_seconds = _env_float('LOADTEST_TAB_SECONDS', 5)
+
+    def create_driver(self):
+        return _StubDriver()
+
+    def login(self, driver) -> Tuple[bool, Any]:
+        return True, driver
+
+    def probe_tab(self, driver, tab: int) -> Optional[Dict[str, Any]]:
+        self.tab_metrics[tab] = {'scan_mode': 'probe'}
+        return None
+
+    def extract_data_from_tab(self, driver, tab: int, known_job_nos: Optional[set] = None):
+        import pandas as pd
+        started = time.time()
+        time.sleep(self._tab_seconds)
+        universe = self._rows + self.round_no * STUB_NEW_PER_ROUND
+        records = [[_job_no(job)] + _data_values(job) for job in range(universe)
+                   if _tab_of(job, self.round_no, self._tabs, self._period) == tab]
+        self.tab_metrics[tab] = {'scan_mode': 'full', 'load_ms': int((time.time() - started) * 1000)}
+        return pd.DataFrame(records, columns=['Job No.'] + STUB_DATA_HEADERS)
+
+
+class _StubDriver:
+    def quit(self):
+        pass
+
+
+def create_app():
+    """WSGI app ของ app.py ที่ Sheets/edoclite เป็น stub (gunicorn 'loadtest:create_app()')"""
+    import main_master_only
+    from schema_registry import canonical_header_order
+
+    latency = _env_float('LOADTEST_SHEETS_LATENCY_MS', 150) / 1000
+    rows = int(_env_float('LOADTEST_ROWS', 20000))
+    tabs = main_master_only.Config.TABS_TO_SCRAPE
+    headers = canonical_header_order(STUB_DATA_HEADERS)
+    stamp = time.strftime('%d/%m/%Y %H:%M:%S')
+    period = max(int(round(1 / max(_env_float('LOADTEST_CHURN', 0.01), 1e-6))), 1)
+    master = [headers]
+    for job in range(rows):
+        record = dict(zip(STUB_DATA_HEADERS, _data_values(job)), Job_No=_job_no(job), First_Seen=stamp,
+                      Last_Updated=stamp, Source_Tab=main_master_only.Config.TAB_NAMES[_tab_of(job, 0, tabs, period)])
+        master.append([record[h] for h in headers])
+
+    spreadsheet = StubSpreadsheet(latency)
+    spreadsheet._sheets['Master_Data'] = StubWorksheet('Master_Data', master, latency)
+    spreadsheet._sheets['Sync_Logs'] = StubWorksheet('Sync_Logs', [['Timestamp', 'Activity', 'Details', 'Status']], latency)
+    client = StubClient(spreadsheet)
+    main_master_only.GoogleSheetManager._get_gspread_client = lambda self, raw, b64: client
+    main_master_only.WebScraper = StubScraper
+
+    from app import app
+    return app
+
+
+# ==============================================================================
+# 👥 Simulated dashboard clients
+# ==============================================================================
+
+# โหลดครั้งแรกของ dashboard
+OPEN_REQUESTS = ['/', '/static/dashboard.js', '/static/dashboard.css', '/api/status']
+# poll ต่อเนื่อง (path, วินาที): /api/status ทุก 3 วินาทีขณะซิงค์ และ 30 วินาทีตอนว่าง ตาม dashboard.js
+POLLS = [('/api/status', 3.0), ('/api/data', 30.0), ('/api/stats', 30.0), ('/logs', 60.0), ('/', 120.0)]
+IDLE_STATUS_INTERVAL = 30.0
+# วินาทีที่ช่วง sync รอได้หลัง --duration จนกว่าการซิงค์รอบแรกจะจบ
+SYNC_PHASE_TIMEOUT = 600
+
+
+class Recorder:
+    """latency ของทุก request แยกตาม phase และ endpoint"""
+
+    def __init__(self):
+        self.phase = 'warmup'
+        self._lock = threading.Lock()
+        self.samples: Dict[Tuple[str, str], List[float]] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.phase_seconds: Dict[str, float] = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool):
+        key = (self.phase, endpoint)
+        with self._lock:
+            self.samples.setdefault(key, []).append(seconds)
+            if not ok:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def report(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (phase, endpoint), values in sorted(self.samples.items()):
+            if phase == 'warmup':
+                continue
+            ordered = sorted(values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+            result.setdefault(phase, {})[endpoint] = {
+                'requests': len(ordered),
+                'errors': self.errors.get((phase, endpoint), 0),
+                'rps': round(len(ordered) / self.phase_seconds[phase], 2),
+                'p50_ms': round(pick(0.50), 1), 'p95_ms': round(pick(0.95), 1),
+                'p99_ms': round(pick(0.99), 1), 'max_ms': round(ordered[-1] * 1000, 1),
+            }
+        return result
+
+
+class DashboardClient(threading.Thread):
+    """ผู้ใช้หนึ่งคนที่เปิด dashboard ค้างไว้ (ส่ง If-None-Match เหมือน browser)"""
+
+    def __init__(self, base_url: str, recorder: Recorder, stop: threading.Event, speed: float):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.speed = speed
+        self.session = requests.Session()
+        self.etags: Dict[str, str] = {}
+        self.sync_running = False
+
+    def request(self, path: str):
+        headers = {'If-None-Match': self.etags[path]} if path in self.etags else {}
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, headers=headers, timeout=60)
+            ok = response.status_code < 400
+            if 'ETag' in response.headers:
+                self.etags[path] = response.headers['ETag']
+            if path == '/api/status' and ok:
+                self.sync_running = bool(response.json().get('is_running'))
+        except requests.RequestException:
+            ok = False
+        self.recorder.add(path, time.perf_counter() - started, ok)
+
+    def run(self):
+        # เปิด dashboard ไม่พร้อมกันทุกคน (กระจายใน 3 วินาทีแรก)
+        if self.stop.wait(random.uniform(0, 3.0) / self.speed):
+            return
+        for path in OPEN_REQUESTS:
+            self.request(path)
+        now = time.monotonic()
+        due = {path: now + random.uniform(0, interval) / self.speed for path, interval in POLLS}
+        while not self.stop.is_set():
+            path = min(due, key=due.get)
+            if self.stop.wait(max(due[path] - time.monotonic(), 0)):
+                return
+            self.request(path)
+            interval = dict(POLLS)[path]
+            if path == '/api/status' and not self.sync_running:
+                interval = IDLE_STATUS_INTERVAL
+            due[path] = time.monotonic() + interval / self.speed
+
+
+class SyncDriver(threading.Thread):
+    """เริ่มการซิงค์ผ่าน /api/start-scraping และเริ่มใหม่ทันทีที่จบ ตลอดช่วง sync (request ของเธรดนี้ไม่นับในผล)"""
+
+    def __init__(self, base_url: str, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.stop = stop
+        self.durations: List[float] = []
+        self.results: List[str] = []
+
+    def run(self):
+        session = requests.Session()
+        while not self.stop.is_set():
+            started = time.monotonic()
+            if not session.post(self.base_url + '/api/start-scraping', timeout=60).json().get('success'):
+                self.stop.wait(1)
+                continue
+            while not self.stop.wait(1):
+                status = session.get(self.base_url + '/api/status', timeout=60).json()
+                if not status.get('is_running'):
+                    self.durations.append(time.monotonic() - started)
+                    self.results.append(status.get('last_result'))
+                    break
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(args, workdir: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ,
+               LOADTEST_ROWS=str(args.rows),
+               LOADTEST_SHEETS_LATENCY_MS=str(args.sheets_latency_ms),
+               LOADTEST_TAB_SECONDS=str(args.tab_seconds),
+               LOADTEST_CHURN=str(args.churn),
+               EDOCLITE_USER='loadtest', EDOCLITE_PASS='loadtest',
+               GOOGLE_SHEET_ID='loadtest', LINE_NOTIFY_TOKEN='',
+               JOURNAL_DRAIN_INTERVAL='0.5', SHARD_DB_PATH='')
+    command = [sys.executable, '-m', 'gunicorn', 'loadtest:create_app()',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--threads', str(args.threads),
+               '--timeout', '120', '--chdir', workdir, '--pythonpath', os.path.dirname(os.path.abspath(__file__)),
+               '--log-level', 'warning']
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    server = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode} (see {log.name})")
+        try:
+            if requests.get(base_url + '/health', timeout=2).ok:
+                return server, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not become healthy within 120 seconds")
+
+
+def _run_phase(name: str, base_url: str, recorder: Recorder, args, with_sync: bool) -> Optional[SyncDriver]:
+    stop = threading.Event()
+    sync = SyncDriver(base_url, stop) if with_sync else None
+    clients = [DashboardClient(base_url, recorder, stop, args.speed) for _ in range(args.clients)]
+    logger.info(f"⏱️ Phase '{name}': {args.clients} clients for {args.duration}s" + (" with a concurrent sync" if sync else ""))
+    recorder.phase = name
+    started = time.monotonic()
+    for thread in ([sync] if sync else []) + clients:
+        thread.start()
+    time.sleep(args.duration)
+    # ช่วง sync ต้องครอบการซิงค์ที่จบครบอย่างน้อยหนึ่งรอบ (รอได้ไม่เกิน SYNC_PHASE_TIMEOUT)
+    deadline = time.monotonic() + SYNC_PHASE_TIMEOUT
+    while sync and not sync.durations and sync.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.5)
+    stop.set()
+    for client in clients:
+        client.join(timeout=65)
+    recorder.phase_seconds[name] = time.monotonic() - started
+    return sync
+
+
+def _print_report(report: Dict[str, Any]):
+    phases = report['phases']
+    idle = phases.get('idle', {})
+    print(f"{'phase':<6} {'endpoint':<22} | {'req':>6} {'err':>4} {'rps':>7} | "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} | {'p95 vs idle':>11}")
+    for phase, endpoints in phases.items():
+        for endpoint, s in endpoints.items():
+            base = idle.get(endpoint, {}).get('p95_ms')
+            ratio = f"{s['p95_ms'] / base:10.1f}x" if phase != 'idle' and base else ''
+            print(f"{phase:<6} {endpoint:<22} | {s['requests']:>6} {s['errors']:>4} {s['rps']:>7.2f} | "
+                  f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f} | {ratio:>11}")
+        total = sum(s['requests'] for s in endpoints.values())
+        print(f"{phase:<6} {'(all)':<22} | {total:>6} {sum(s['errors'] for s in endpoints.values()):>4} "
+              f"{total / report['phase_seconds'][phase]:>7.2f} |")
+    if report.get('syncs'):
+        syncs = report['syncs']
+        print(f"syncs during load: {len(syncs['durations_s'])} finished, "
+              f"durations {syncs['durations_s']} s, results {syncs['results']}")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent-client load test for the dashboard and APIs")
+    parser.add_argument('--clients', type=int, default=20, help="simulated dashboard users")
+    parser.add_argument('--duration', type=float, default=30, help="seconds per phase")
+    parser.add_argument('--speed', type=float, default=1, help="polling speed-up factor (10 = poll 10x as often)")
+    parser.add_argument('--rows', type=int, default=20000, help="jobs in the stub Master_Data")
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn workers")
+    parser.add_argument('--threads', type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument('--sheets-latency-ms', type=float, default=150, help="simulated Sheets API round trip")
+    parser.add_argument('--tab-seconds', type=float, default=5, help="simulated edoclite load time per tab")
+    parser.add_argument('--churn', type=float, default=0.01, help="share of jobs that move tab per sync")
+    parser.add_argument('--no-sync', action='store_true', help="skip the phase with a concurrent sync")
+    parser.add_argument('--url', help="load an already running server instead (no stubs, no sync)")
+    parser.add_argument('--json', help="write the report to this file")
+    parser.add_argument('--max-p95-ms', type=float, help="exit 1 if any endpoint's p95 exceeds this")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    server, base_url = (None, args.url.rstrip('/')) if args.url else _start_server(args, workdir)
+    recorder = Recorder()
+    sync = None
+    try:
+        # warm-up: โหลด template/asset cache และ stub ของแต่ละ endpoint ก่อนเริ่มวัด
+        warm = DashboardClient(base_url, recorder, threading.Event(), args.speed)
+        for path in OPEN_REQUESTS + [path for path, _ in POLLS]:
+            warm.request(path)
+        _run_phase('idle', base_url, recorder, args, with_sync=False)
+        if not args.url and not args.no_sync:
+            sync = _run_phase('sync', base_url, recorder, args, with_sync=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k not in ('json', 'max_p95_ms')},
+        'phases': recorder.report(),
+        'phase_seconds': {k: round(v, 2) for k, v in recorder.phase_seconds.items()},
+        'syncs': {'durations_s': [round(d, 1) for d in sync.durations], 'results': sync.results} if sync else None,
+    }
+    _print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.max_p95_ms is not None:
+        over = [(phase, endpoint, s['p95_ms']) for phase, endpoints in report['phases'].items()
+                for endpoint, s in endpoints.items() if s['p95_ms'] > args.max_p95_ms]
+        if over:
+            print(f"❌ p95 budget of {args.max_p95_ms:.0f} ms exceeded: {over}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main(sys.argv[1:]))
@@ -3,14 +3,19 @@
 import os
 import json
 import base64
+import hashlib
 import pytz
 import sys
 import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import StringIO
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterable, Iterator, Callable
 from datetime import datetime, timezone
 
 import pandas as pd
+import re
 import requests
 import gspread
 from google.oauth2.service_account import Credentials
@@ -22,6 +27,22 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import logging
 
+from lean_browser import apply_lean_options, enable_request_blocking, collect_page_metrics, format_metrics
+from scrape_state import ScrapeState
+from snapshot_store import SnapshotStore
+from stats_store import StatsStore
+from search_index import SearchIndex
+from last_seen import LastSeenStore
+from job_index import JobIndex
+from sync_checkpoint import SyncCheckpoint
+from shard_coordinator import ShardCoordinator
+from sheet_journal import SheetJournal, JournalDrainer
+from sync_profiler import SyncProfiler, profiling_requested
+from session_store import SessionStore, session_reuse_enabled
+from browser_watchdog import BrowserWatchdog
+from sync_config import Config
+from schema_registry import SchemaRegistry, CompiledSchema, CANONICAL_HEADERS, JOB_NO, SOURCE_TAB, LAST_UPDATED, find_job_no_index, canonical_header_order
+
 # ==============================================================================
 # ⚙️ SECTION 1: CONFIGURATION
 # ==============================================================================
@@ -32,34 +53,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class Config:
-    """เก็บการตั้งค่าทั้งหมดของโปรแกรมไว้ในที่เดียว"""
-    # Target Website
-    BASE_URL = "https://jobm.edoclite.com/jobManagement"
-    LOGIN_URL = f"{BASE_URL}/pages/login"
-    INDEX_URL = f"{BASE_URL}/pages/index"
-    TABS_TO_SCRAPE: List[int] = [13, 14, 15, 8, 7, 11]
-    TAB_NAMES: Dict[int, str] = {
-        13: "งานใหม่_แจ้งศูนย์อื่น",
-        14: "อยู่ระหว่างดำเนินการ_แจ้งศูนย์อื่น", 
-        15: "รอตรวจสอบ_แจ้งศูนย์อื่น",
-        8: "งานใหม่_ภายในศูนย์",
-        7: "อยู่ระหว่างดำเนินการ_ภายในศูนย์",
-        11: "งานเสร็จ_ภายในศูนย์"
-    }
+# Config อยู่ใน sync_config.py (app.py/CLI อ่านค่าตั้งค่าได้โดยไม่ต้องโหลด pandas/gspread/selenium)
+
+# scan ที่ได้เฉพาะบางแถวของแท็บ (แถวที่ไม่ได้อ่านคงค่าเดิม): incremental = เฉพาะหน้าที่มีงานใหม่, unchanged = probe แล้วไม่เปลี่ยน
+PARTIAL_SCAN_MODES = ('incremental', 'unchanged')
 
-    # Credentials (from Environment Variables)
-    EDOCLITE_USER = os.getenv("EDOCLITE_USER", "").strip()
-    EDOCLITE_PASS = os.getenv("EDOCLITE_PASS", "").strip()
-    GOOGLE_SHEET_ID = os.getenv("GOOGLE_SHEET_ID", "").strip()
-    GOOGLE_SVC_JSON_RAW = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON", "").strip()
-    GOOGLE_SVC_JSON_B64 = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON_B64", "").strip()
-    LINE_NOTIFY_TOKEN = os.getenv("LINE_NOTIFY_TOKEN", "").strip()
 
-    # Google Sheets
-    GOOGLE_API_SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    MASTER_SHEET_NAME = "Master_Data"
-    LOG_SHEET_NAME = "Sync_Logs"
+class SyncCancelled(Exception):
+    """ผู้เรียกสั่งหยุดการซิงค์กลางทาง (เช่น web tier เสีย run lock ให้ worker อื่นแล้ว)"""
 
 # ==============================================================================
 # 📦 SECTION 2: HELPER SERVICES (CLASSES)
@@ -95,6 +96,9 @@ class GoogleSheetManager:
         self.sheet_id = sheet_id
         self.client = self._get_gspread_client(svc_json_raw, svc_json_b64)
         self.spreadsheet = self.client.open_by_key(self.sheet_id)
+        self.schema_registry = SchemaRegistry()
+        # CompiledSchema ของแต่ละชีตจากการอ่านครั้งล่าสุด
+        self.schemas: Dict[str, CompiledSchema] = {}
         logger.info(f"✅ Connected to Google Sheet: '{self.spreadsheet.title}'")
 
     def _get_gspread_client(self, svc_json_raw: str, svc_json_b64: str) -> gspread.Client:
@@ -138,58 +142,90 @@ class GoogleSheetManager:
             logger.error(f"❌ Could not fetch existing Job_Nos from '{worksheet_name}': {e}")
             return set()
             
-    def get_job_data_with_positions(self, worksheet_name: str) -> Dict[str, Dict]:
-        """ดึงข้อมูล Job_No พร้อมตำแหน่งแถวและคอลัมน์ Status"""
+    def get_job_data_with_positions(self, worksheet_name: str, strict: bool = False) -> JobIndex:
+        """ดึง index ของ Job_No พร้อมแถวและค่า Source_Tab (strict=True โยน exception แทนการคืน index ว่าง)
+        อ่านเฉพาะคอลัมน์ Job_No และ Source_Tab ทีละช่วง ไม่โหลดค่าทั้งชีต"""
         try:
             ws = self.get_or_create_worksheet(worksheet_name)
-            all_data = ws.get_all_records()
             headers = ws.row_values(1)
+            if not headers:
+                return JobIndex()
             
-            # ✅ หา index ของคอลัมน์ Job_No และ Source_Tab (ปรับปรุงการค้นหา)
-            job_no_col_idx = None
-            source_tab_col_idx = None
+            # ✅ resolve header ครั้งเดียว แล้วอ่านเฉพาะสองคอลัมน์ที่ต้องใช้
+            schema = self.schema_registry.resolve(f"sheet:{worksheet_name}", headers)
+            self.schemas[worksheet_name] = schema
+            job_no_col = schema.col(JOB_NO)
+            source_tab_col_idx = schema.col(SOURCE_TAB)  # gspread uses 1-based indexing
         
-        for idx, header in enumerate(headers):
-            header_str = str(header).strip()
-            
-            # หา Job_No column (ให้ความสำคัญกับ Job_No มากกว่า Job No.)
-            if header_str == 'Job_No':
-                job_no_col_idx = idx + 1  # gspread uses 1-based indexing
-            elif job_no_col_idx is None and ('job' in header_str.lower() and 'no' in header_str.lower()):
-                job_no_col_idx = idx + 1
-                
-            # หา Source_Tab column
-            elif header_str == 'Source_Tab':
-                source_tab_col_idx = idx + 1
-        
-        if job_no_col_idx is None:
-            logger.warning(f"⚠️ No Job_No column found in {worksheet_name}")
-            return {}
-        
-        job_positions = {}
-        for row_idx, row_data in enumerate(all_data, start=2):  # start=2 เพราะแถว 1 คือ header
-            # ✅ ใช้ชื่อคอลัมน์ที่พบจริง
-            job_no_key = None
-            for key in row_data.keys():
-                if key == 'Job_No' or ('job' in str(key).lower() and 'no' in str(key).lower()):
-                    job_no_key = key
-                    break
-            
-            if job_no_key:
-                job_no = str(row_data.get(job_no_key, '')).strip()
-                if job_no:
-                    job_positions[job_no] = {
-                        'row': row_idx,
-                        'source_tab_col': source_tab_col_idx,
-                        'current_status': row_data.get('Source_Tab', '')
-                    }
-        
-        logger.info(f"Found {len(job_positions)} existing jobs with positions in '{worksheet_name}'.")
-        return job_positions
-    except Exception as e:
-        logger.error(f"❌ Could not fetch job data with positions from '{worksheet_name}': {e}")
-        return {}
+            if job_no_col is None:
+                logger.warning(f"⚠️ No Job_No column found in {worksheet_name}")
+                return JobIndex()
+        
+            job_positions = JobIndex.from_rows(
+                ((row_idx, job_no, status) for row_idx, (job_no, status)
+                 in self.iter_columns(ws, [job_no_col, source_tab_col_idx])),
+                source_tab_col=source_tab_col_idx)
+        
+            logger.info(f"Found {len(job_positions)} existing jobs with positions in '{worksheet_name}'.")
+            return job_positions
+        except Exception as e:
+            logger.error(f"❌ Could not fetch job data with positions from '{worksheet_name}': {e}")
+            if strict:
+                raise
+            return JobIndex()
     
+    def iter_columns(self, ws: gspread.Worksheet, cols: List[Optional[int]],
+                     page_size: int = 20000) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+        """อ่านเฉพาะบางคอลัมน์ (1-based, None = ค่าว่าง) ของแถวข้อมูลทีละช่วง คืน (row, values)
+        แต่ละช่วงใช้ batch_get request เดียว และปล่อยหน้าก่อนหน้าก่อนอ่านหน้าถัดไป"""
+        letters = [gspread.utils.rowcol_to_a1(1, col).rstrip('0123456789') for col in cols if col]
+        start = 2
+        while start <= ws.row_count:
+            end = min(start + page_size - 1, ws.row_count)
+            fetched = iter(ws.batch_get([f"{letter}{start}:{letter}{end}" for letter in letters]))
+            # แถวว่างท้ายช่วงถูกตัดทิ้ง แถวว่างคั่นกลางได้ list ว่าง
+            columns = [[cell[0] if cell else '' for cell in next(fetched)] if col else [] for col in cols]
+            for offset in range(max(len(values) for values in columns)):
+                yield start + offset, tuple(values[offset] if offset < len(values) else '' for values in columns)
+            start = end + 1
+
+    def iter_rows(self, worksheet_name: str, page_size: int = 5000) -> Iterator[List[str]]:
+        """อ่านแถวข้อมูล (ไม่รวม header) ทีละช่วงเพื่อไม่ต้องโหลดทั้งชีตไว้ในหน่วยความจำ"""
+        ws = self.get_or_create_worksheet(worksheet_name)
+        last_col = gspread.utils.rowcol_to_a1(1, ws.col_count).rstrip('0123456789')
+        start = 2
+        while start <= ws.row_count:
+            end = min(start + page_size - 1, ws.row_count)
+            # ช่วงที่ว่างทั้งหมดจะได้ list ว่าง แต่ยังอ่านต่อจนถึง row_count เผื่อมีแถวว่างคั่น
+            for row in ws.get(f"A{start}:{last_col}{end}"):
+                yield row
+            start = end + 1
+
+    def update_cell(self, worksheet_name: str, row: int, col: int, value: Any):
+        """อัปเดตค่าใน cell เดียว"""
+        try:
+            ws = self.get_or_create_worksheet(worksheet_name)
+            ws.update_cell(row, col, value)
+        except Exception as e:
+            logger.error(f"❌ Failed to update cell ({row}, {col}) in '{worksheet_name}': {e}")
+
+    def batch_update_cells(self, worksheet_name: str, updates: List[List[Any]]):
+        """เขียนหลาย cell ([row, col, value]) ใน request เดียว (โยน exception ถ้าล้มเหลว)"""
+        if not updates:
+            return
+        ws = self.get_or_create_worksheet(worksheet_name)
+        ws.batch_update([{'range': gspread.utils.rowcol_to_a1(row, col), 'values': [[value]]}
+                         for row, col, value in updates], value_input_option='USER_ENTERED')
+
+    def batch_update_column_ranges(self, worksheet_name: str, col: int, ranges: List[Tuple[int, int, Any]]):
+        """เขียนค่าเดียวกันลงแถวติดกันของคอลัมน์เดียว ([start_row, end_row, value]) ใน request เดียว"""
+        if not ranges:
+            return
+        ws = self.get_or_create_worksheet(worksheet_name)
+        ws.batch_update([{'range': f"{gspread.utils.rowcol_to_a1(start, col)}:{gspread.utils.rowcol_to_a1(end, col)}",
+                          'values': [[value]] * (end - start + 1)}
+                         for start, end, value in ranges], value_input_option='USER_ENTERED')
+
     def update_job_status(self, worksheet_name: str, job_no: str, new_status: str, row: int, col: int):
         """อัปเดตสถานะของงานที่มีอยู่แล้ว"""
         try:
@@ -199,16 +235,18 @@ class GoogleSheetManager:
         except Exception as e:
             logger.error(f"❌ Failed to update status for {job_no}: {e}")
 
-    def append_rows(self, worksheet_name: str, data_rows: List[List[Any]]):
+    def append_rows(self, worksheet_name: str, data_rows: List[List[Any]]) -> bool:
         """เพิ่มแถวข้อมูลใหม่ต่อท้ายชีต"""
         if not data_rows:
-            return
+            return True
         try:
             ws = self.get_or_create_worksheet(worksheet_name)
             ws.append_rows(data_rows, value_input_option='USER_ENTERED')
             logger.info(f"✅ Appended {len(data_rows)} new rows to '{worksheet_name}'.")
+            return True
         except Exception as e:
             logger.error(f"❌ Failed to append rows to '{worksheet_name}': {e}")
+            return False
     
     def log_activity(self, activity: str, details: str = "", status: str = "Success"):
         try:
@@ -229,11 +267,18 @@ class GoogleSheetManager:
 
 class WebScraper:
     """จัดการกระบวนการ Scrape ข้อมูลจากเว็บไซต์ด้วย Selenium"""
-    def __init__(self, user: str, password: str):
+    def __init__(self, user: str, password: str, lean: bool = False):
         self.user = user
         self.password = password
+        self.lean = lean
+        # bytes/เวลาโหลด/RSS ของเบราว์เซอร์ต่อแท็บ จากการ scrape ครั้งล่าสุด
+        self.tab_metrics: Dict[int, Dict[str, Any]] = {}
         if not self.user or not self.password:
             raise ValueError("EDOCLITE_USER and EDOCLITE_PASS must be set.")
+        # cookie ของ session ที่ login แล้ว (ใช้ซ้ำข้ามรอบ ถ้ายังไม่หมดอายุไม่ต้อง login ด้วยฟอร์ม)
+        self.session = SessionStore(self.user, self.password, Config.INDEX_URL) if session_reuse_enabled() else None
+        # RSS/CPU ของ process tree ของ browser, งบสำหรับ recycle และการเก็บกวาด process ที่ค้าง
+        self.watchdog = BrowserWatchdog()
 
     def create_driver(self) -> webdriver.Chrome:
         """สร้าง Chrome WebDriver ด้วย options ที่เหมาะสม"""
@@ -242,13 +287,41 @@ class WebScraper:
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
         chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
+        if self.lean:
+            apply_lean_options(chrome_options)
+        else:
+            chrome_options.add_argument("--window-size=1920,1080")
         
-        return webdriver.Chrome(options=chrome_options)
+        driver = webdriver.Chrome(options=chrome_options)
+        self.watchdog.register(driver)
+        if self.lean:
+            enable_request_blocking(driver)
+            logger.info("🪶 Lean browser mode enabled (images/fonts/CSS/trackers blocked).")
+        return driver
+
+    def _navigate(self, driver: webdriver.Chrome, url: str):
+        driver.get(url)
+        self.watchdog.page_loaded(driver)
+
+    def _error_screenshot(self, driver: webdriver.Chrome, path: str):
+        """บันทึกภาพหน้าจอตอนเกิดข้อผิดพลาด (ข้ามถ้า browser ใช้หน่วยความจำเกินงบอยู่แล้ว)"""
+        try:
+            if self.watchdog.over_memory_budget(driver):
+                logger.warning(f"⚠️ Browser is over its memory budget; skipping screenshot {path}")
+                return
+            driver.save_screenshot(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save screenshot {path}: {e}")
 
     def login(self, driver: webdriver.Chrome) -> Tuple[bool, webdriver.Chrome]:
-        """เข้าสู่ระบบ"""
+        """เข้าสู่ระบบ (ใช้ session ที่บันทึกไว้ถ้ายังใช้ได้ ไม่เช่นนั้น login ด้วยฟอร์มแล้วบันทึก session ใหม่)"""
+        if self.session is not None:
+            try:
+                if self.session.restore(driver):
+                    return True, driver
+            except Exception as e:
+                logger.warning(f"⚠️ Could not reuse saved login session: {e}")
         try:
             logger.info(f"Navigating to login page: {Config.LOGIN_URL}")
             driver.get(Config.LOGIN_URL)
@@ -270,8 +343,11 @@ class WebScraper:
             login_button = driver.find_element(By.NAME, "login__username")
             login_button.click()
             
-            # รอให้เปลี่ยนหน้า
-            time.sleep(3)
+            # รอให้เปลี่ยนหน้า (ออกจากหน้า login ทันทีที่สำเร็จ ไม่ต้องรอครบเวลา)
+            try:
+                WebDriverWait(driver, 10).until(lambda d: "login" not in d.current_url.lower())
+            except TimeoutException:
+                pass
             
             # ตรวจสอบว่า login สำเร็จหรือไม่
             if "login" in driver.current_url.lower():
@@ -279,20 +355,31 @@ class WebScraper:
                 return False, driver
             
             logger.info("✅ Login successful.")
+            if self.session is not None:
+                self.session.save(driver.get_cookies())
             return True, driver
             
         except Exception as e:
             logger.error(f"❌ Exception during login: {e}")
-            driver.save_screenshot("login_error.png")
+            self._error_screenshot(driver, "login_error.png")
             return False, driver
 
-    def extract_data_from_tab(self, driver: webdriver.Chrome, tab_num: int) -> pd.DataFrame:
-        """ดึงข้อมูลจากแต่ละ tab"""
+    def extract_data_from_tab(self, driver: webdriver.Chrome, tab_num: int,
+                              known_job_nos: Optional[set] = None) -> pd.DataFrame:
+        """ดึงข้อมูลจากแต่ละ tab (ถ้าส่ง known_job_nos มาจะดึงแบบ incremental)"""
         url = f"{Config.INDEX_URL}?tab={tab_num}"
+        self.tab_metrics.pop(tab_num, None)
+        
+        if known_job_nos is not None:
+            df = self._extract_incremental(driver, tab_num, known_job_nos)
+            if df is not None:
+                return df
+            logger.warning(f"⚠️ Incremental scrape unavailable for tab {tab_num}, falling back to full scan.")
+        
         logger.info(f"Scraping tab {tab_num} at {url}")
         
         try:
-            driver.get(url)
+            self._navigate(driver, url)
             time.sleep(3)
             
             # พยายามเปลี่ยน page length เป็น show all
@@ -310,6 +397,11 @@ class WebScraper:
             # ดึง HTML content
             html_content = driver.page_source
             
+            metrics = collect_page_metrics(driver)
+            metrics['scan_mode'] = 'full'
+            self.tab_metrics[tab_num] = metrics
+            logger.info(f"📏 Tab {tab_num} [{'lean' if self.lean else 'full'}]: {format_metrics(metrics)}")
+            
             # แปลง HTML เป็น DataFrame
             dfs = pd.read_html(StringIO(html_content))
             job_df = next((df for df in dfs if not df.empty and any('job' in str(col).lower() for col in df.columns)), pd.DataFrame())
@@ -323,9 +415,135 @@ class WebScraper:
             
         except Exception as e:
             logger.error(f"❌ Failed to extract data from tab {tab_num}: {e}")
-            driver.save_screenshot(f"tab_{tab_num}_error.png")
+            self._error_screenshot(driver, f"tab_{tab_num}_error.png")
             return pd.DataFrame()
 
+    # JS อ่านบรรทัด info ("Showing 1 to 10 of N entries") และตารางหน้าแรกตามขนาดหน้าเริ่มต้น
+    _DT_PROBE_JS = """
+    const $ = window.jQuery;
+    const info = document.querySelector('.dataTables_info');
+    let table = document.querySelector('table.dataTable') || document.querySelector('table');
+    let total = null;
+    if ($ && $.fn && $.fn.dataTable && $.fn.dataTable.tables().length) {
+        table = $.fn.dataTable.tables()[0];
+        total = $(table).DataTable().page.info().recordsTotal;
+    }
+    return {info: info ? info.textContent.trim() : null, total: total, html: table ? table.outerHTML : null};
+    """
+    _INFO_NUMBER_RE = re.compile(r'\d[\d,]*')
+
+    def probe_tab(self, driver: webdriver.Chrome, tab_num: int) -> Optional[Dict[str, Any]]:
+        """เปิดแท็บตามขนาดหน้าเริ่มต้น (ไม่ตั้ง show all) อ่านจำนวนงานและ Job_No ของหน้าแรก
+        คืน {'count', 'head'} (head = hash ของ Job_No หน้าแรก) หรือ None ถ้าอ่านไม่ได้"""
+        url = f"{Config.INDEX_URL}?tab={tab_num}"
+        try:
+            self._navigate(driver, url)
+            WebDriverWait(driver, 10).until(lambda d: d.execute_script(
+                "const e = document.querySelector('.dataTables_info'); return !!e && /\\d/.test(e.textContent);"))
+            page = driver.execute_script(self._DT_PROBE_JS)
+            count = page.get('total')
+            if count is None:
+                # "แสดง 1 ถึง 10 จาก 1,234 แถว": ตัวเลขที่ 3 คือจำนวนทั้งหมด (ตารางว่างมีตัวเลขเดียว)
+                numbers = [int(n.replace(',', '')) for n in self._INFO_NUMBER_RE.findall(page.get('info') or '')]
+                count = numbers[2] if len(numbers) >= 3 else (numbers[-1] if numbers else None)
+            if count is None or not page.get('html'):
+                return None
+            job_nos = []
+            if count:
+                head_df = pd.read_html(StringIO(page['html']))[0]
+                job_no_idx = find_job_no_index(head_df.columns)
+                if job_no_idx is None:
+                    return None
+                job_nos = [str(v).strip() for v in head_df.iloc[:, job_no_idx]]
+            head = hashlib.sha1("\n".join(job_nos).encode('utf-8')).hexdigest()[:16]
+            metrics = collect_page_metrics(driver)
+            metrics['scan_mode'] = 'probe'
+            self.tab_metrics[tab_num] = metrics
+            return {'count': int(count), 'head': head}
+        except (TimeoutException, NoSuchElementException, ValueError) as e:
+            logger.warning(f"⚠️ Change probe of tab {tab_num} failed: {e}")
+            return None
+
+    # JS สำหรับควบคุม DataTables ของหน้า index ผ่าน jQuery API
+    _DT_SETUP_JS = """
+    const [sortColumn, pageSize] = arguments;
+    const $ = window.jQuery;
+    if (!$ || !$.fn || !$.fn.dataTable) { return null; }
+    const tables = $.fn.dataTable.tables();
+    for (const tbl of tables) {
+        const dt = $(tbl).DataTable();
+        const headers = dt.columns().header().toArray().map(h => h.textContent.trim());
+        const lower = headers.map(h => h.toLowerCase());
+        let col = sortColumn ? headers.indexOf(sortColumn)
+                             : lower.findIndex(h => h.includes('job') && h.includes('no'));
+        if (col < 0) { continue; }
+        window.__scrapeTable = tbl;
+        window.__scrapeDrawn = false;
+        $(tbl).one('draw.dt', () => { window.__scrapeDrawn = true; });
+        dt.order([[col, 'desc']]).page.len(pageSize).draw();
+        return {column: headers[col]};
+    }
+    return null;
+    """
+    _DT_NEXT_PAGE_JS = """
+    const $ = window.jQuery;
+    const dt = $(window.__scrapeTable).DataTable();
+    const info = dt.page.info();
+    if (info.page + 1 >= info.pages) { return false; }
+    window.__scrapeDrawn = false;
+    $(window.__scrapeTable).one('draw.dt', () => { window.__scrapeDrawn = true; });
+    dt.page('next').draw('page');
+    return true;
+    """
+
+    def _wait_for_draw(self, driver: webdriver.Chrome, timeout: int = 15):
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return window.__scrapeDrawn === true"))
+
+    def _extract_incremental(self, driver: webdriver.Chrome, tab_num: int, known_job_nos: set) -> Optional[pd.DataFrame]:
+        """เรียงตารางใหม่สุดก่อนแล้วไล่ทีละหน้า หยุดเมื่อเจอหน้าที่ Job_No เป็นงานที่รู้จักแล้วทั้งหมด
+        คืนค่า None ถ้าหน้าเว็บไม่รองรับ (ให้ผู้เรียก fallback เป็น full scan)"""
+        url = f"{Config.INDEX_URL}?tab={tab_num}"
+        logger.info(f"Scraping tab {tab_num} incrementally at {url} ({len(known_job_nos)} known jobs)")
+        try:
+            self._navigate(driver, url)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'select[name$="_length"]')))
+            setup = driver.execute_script(self._DT_SETUP_JS, Config.INCREMENTAL_SORT_COLUMN, Config.INCREMENTAL_PAGE_SIZE)
+            if not setup:
+                return None
+            self._wait_for_draw(driver)
+            records = driver.execute_script("return jQuery(window.__scrapeTable).DataTable().page.info().recordsDisplay")
+            
+            pages, frames = 0, []
+            while records:
+                pages += 1
+                table_html = driver.execute_script("return window.__scrapeTable.outerHTML")
+                page_df = pd.read_html(StringIO(table_html))[0]
+                job_no_idx = find_job_no_index(page_df.columns)
+                if job_no_idx is None:
+                    return None
+                
+                page_job_nos = {str(v).strip() for v in page_df.iloc[:, job_no_idx]}
+                new_job_nos = page_job_nos - known_job_nos
+                if not new_job_nos:
+                    break  # ทั้งหน้าเป็นงานที่รู้จักแล้ว
+                frames.append(page_df)
+                
+                if not driver.execute_script(self._DT_NEXT_PAGE_JS):
+                    break  # หน้าสุดท้าย
+                self._wait_for_draw(driver)
+            
+            metrics = collect_page_metrics(driver)
+            metrics.update(scan_mode='incremental', pages=pages)
+            self.tab_metrics[tab_num] = metrics
+            
+            job_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            logger.info(f"📊 Tab {tab_num}: read {pages} page(s) sorted by '{setup['column']}', {len(job_df)} rows up to the first fully-known page.")
+            return job_df
+        
+        except (TimeoutException, NoSuchElementException, ValueError) as e:
+            logger.warning(f"⚠️ Incremental scrape of tab {tab_num} failed: {e}")
+            return None
+
 # ==============================================================================
 # 🚀 SECTION 4: MAIN APPLICATION LOGIC
 # ==============================================================================
@@ -339,7 +557,36 @@ class JobSyncApplication:
             config.GOOGLE_SVC_JSON_RAW, 
             config.GOOGLE_SVC_JSON_B64
         )
-        self.scraper = WebScraper(config.EDOCLITE_USER, config.EDOCLITE_PASS)
+        self.scraper = WebScraper(config.EDOCLITE_USER, config.EDOCLITE_PASS, lean=config.LEAN_BROWSER)
+        self.scrape_state = ScrapeState()
+        self.snapshot_store = SnapshotStore()
+        self.stats_store = StatsStore(finished_tab=config.TAB_NAMES.get(config.FINISHED_TAB))
+        self.search_index = SearchIndex()
+        self.last_seen = LastSeenStore()
+        self.checkpoint = SyncCheckpoint()
+        self.journal = SheetJournal()
+        self.drainer = JournalDrainer(self.journal, self._drain_journal, config.JOURNAL_DRAIN_INTERVAL)
+        self.seen_jobs_count = 0  # งานที่บันทึก last seen ได้ในรอบนี้ (รายงานใน Sync Complete)
+        self._journal_run = None  # run key ของ idempotency key ใน journal (checkpoint run หรือ shard round)
+        self.shards = (ShardCoordinator(config.SHARD_DB_PATH, lease_ttl=config.SHARD_LEASE_TTL,
+                                        max_attempts=1 + max(config.TAB_RETRY_ATTEMPTS, 0))
+                       if config.SHARD_DB_PATH else None)
+        # ผู้เรียกตั้ง event นี้เพื่อหยุดรอบ: ตรวจก่อนแต่ละแท็บและก่อนเขียนลงชีต (checkpoint/journal คงอยู่ให้รอบถัดไป)
+        self.cancelled = threading.Event()
+
+    def _check_cancelled(self):
+        if self.cancelled.is_set():
+            raise SyncCancelled("Sync cancelled: the run lock is no longer held")
+
+    def _incremental_tabs_for_run(self) -> set:
+        """แท็บที่ scrape แบบ incremental ได้ในรอบนี้ (แท็บที่ครบกำหนด full scan จะถูกตัดออก)"""
+        now = time.time()
+        interval = self.config.FULL_SCAN_INTERVAL_HOURS * 3600
+        return {
+            tab for tab in self.config.INCREMENTAL_TABS
+            if tab in self.config.TABS_TO_SCRAPE
+            and now - self.scrape_state.get(tab).get('last_full_scan', 0) < interval
+        }
   
 # ในไฟล์ main_master_only.py
 # แก้ไขใน method _process_and_add_new_jobs
@@ -347,49 +594,72 @@ class JobSyncApplication:
 # ในไฟล์ main_master_only.py
 # แก้ไข method _process_and_add_new_jobs
 
-    def _process_and_add_new_jobs(self, all_tab_data: Dict[int, pd.DataFrame]) -> Tuple[int, int]:
-        """กรองเฉพาะ Job ใหม่และเพิ่มลงใน Master Sheet หรือ อัปเดตสถานะของงานเดิม"""
+    def _process_and_add_new_jobs(self, all_tab_data: Dict[int, pd.DataFrame],
+                                  existing_jobs: Optional[JobIndex] = None,
+                                  partial_tabs: Iterable[int] = ()) -> Tuple[int, int]:
+        """กรองเฉพาะ Job ใหม่และเพิ่มลงใน Master Sheet หรือ อัปเดตสถานะของงานเดิม
+        partial_tabs: แท็บที่ได้เฉพาะบางแถว (incremental/unchanged) งานที่รู้จักในแท็บนั้นถือว่ายังพบอยู่"""
+        # ดึงข้อมูล Job ที่มีอยู่แล้วพร้อมตำแหน่ง (ถ้ายังไม่ได้ดึงมาก่อน scrape)
+        if existing_jobs is None:
+            existing_jobs = self.sheet_manager.get_job_data_with_positions(self.config.MASTER_SHEET_NAME)
+        
+        changes = self._compute_changes(all_tab_data, existing_jobs)
+        # บันทึก change set ลง journal (fsync) ก่อน แล้วให้เธรด drain เขียนลงชีตเป็น batch
+        # การซิงค์ไปต่อได้ทันทีโดยไม่ต้องรอ Sheets และไม่สูญหายถ้า Sheets ล่มหรือ process ตาย
+        tabs = sorted(all_tab_data)
+        self.journal.record(self._journal_run, tabs, changes)
+        seen_jobs = set(changes['seen_jobs'])
+        for tab in partial_tabs:
+            # แถวที่ไม่ได้อ่าน (หน้าที่ข้ามหรือทั้งแท็บที่ probe ว่าไม่เปลี่ยน) ยังอยู่ในแท็บตาม index
+            seen_jobs.update(existing_jobs.jobs_in(self.config.TAB_NAMES.get(tab, f"Tab_{tab}")))
+        self._mark_seen(seen_jobs)
+        self.checkpoint.mark_processed(tabs)
+        self.drainer.notify()
+        return len(changes['new_records']), changes['updated_jobs']
+
+    def _compute_changes(self, all_tab_data: Dict[int, pd.DataFrame],
+                         existing_jobs: JobIndex) -> Dict[str, Any]:
+        """คำนวณ change set (cell ที่ต้องอัปเดต, งานใหม่, สถิติ, ข้อความแจ้งเตือน) โดยยังไม่เขียนลงชีต"""
         logger.info("Processing jobs: checking for new jobs and status updates...")
         
         # สร้าง Thailand timezone
         import pytz
         thailand_tz = pytz.timezone('Asia/Bangkok')
         
-        # ดึงข้อมูล Job ที่มีอยู่แล้วพร้อมตำแหน่ง
-        existing_jobs = self.sheet_manager.get_job_data_with_positions(self.config.MASTER_SHEET_NAME)
-        
+        cell_updates = []
         new_records_to_add = []
+        new_records_by_job: Dict[str, Dict[str, str]] = {}
+        notifications = []
         updated_jobs_count = 0
+        # change set ของรอบนี้สำหรับอัปเดต stats แบบ incremental
+        stats_new_jobs, stats_moves = [], []
+        # งานที่พบในรอบนี้ (บันทึก last seen ในเครื่อง ไม่เขียน Last_Updated ทีละงาน)
+        seen_jobs = []
         
-        # กำหนด headers ที่ต้องการ
-        all_headers = set(['Job_No', 'Source_Tab', 'First_Seen', 'Last_Updated'])
+        # headers ข้อมูลจากทุกแท็บ (ไม่รวมคอลัมน์ Job No. และ field มาตรฐาน)
+        data_headers = set()
+        registry = self.sheet_manager.schema_registry
+        master_schema = self.sheet_manager.schemas.get(self.config.MASTER_SHEET_NAME)
+        last_updated_col = master_schema.col(LAST_UPDATED) if master_schema else None
     
         for tab_num, df in all_tab_data.items():
             if df.empty:
                 continue
             
-            # เก็บ Headers จากข้อมูลต้นฉบับ (ยกเว้น Job No. ที่ซ้ำ)
-            for col in df.columns:
-                col_str = str(col)
-                if not (('job' in col_str.lower() and 'no' in col_str.lower()) or col_str.lower() == 'job no.'):
-                    all_headers.add(col_str)
-    
             tab_name = self.config.TAB_NAMES.get(tab_num, f"Tab_{tab_num}")
             
-            # หาคอลัมน์ที่มี Job No
-            job_no_col = None
-            for col in df.columns:
-                col_str = str(col).lower()
-                if 'job' in col_str and ('no' in col_str or 'number' in col_str):
-                    job_no_col = col
-                    break
-            
-            if not job_no_col:
+            # resolve คอลัมน์ของแท็บครั้งเดียว แล้วใช้ index ตามตำแหน่งใน loop
+            schema = registry.resolve(f"tab:{tab_num}", df.columns)
+            job_no_idx = schema.index(JOB_NO)
+            if job_no_idx is None:
                 logger.warning(f"⚠️ No 'Job No.' column found in tab {tab_num}. Skipping.")
                 continue
+            data_columns = [(idx, header) for idx, header in schema.data_columns
+                            if header not in CANONICAL_HEADERS.values()]
+            data_headers.update(header for _, header in data_columns)
     
-            for _, row in df.iterrows():
-                job_no = str(row[job_no_col]).strip()
+            for values in df.itertuples(index=False, name=None):
+                job_no = str(values[job_no_idx]).strip()
                 if not job_no:
                     continue  # ข้ามถ้าไม่มี Job No
                 
@@ -400,40 +670,38 @@ class JobSyncApplication:
                 # ตรวจสอบว่า Job No มีอยู่แล้วหรือไม่
                 if job_no in existing_jobs:
                     # ✅ งานเดิม - อัปเดต Last_Updated และตรวจสอบสถานะ
-                    current_status = existing_jobs[job_no]['current_status']
-                    job_row = existing_jobs[job_no]['row']
-                    source_tab_col = existing_jobs[job_no]['source_tab_col']
-                    
-                    # หาคอลัมน์ Last_Updated
-                    last_updated_col = self.sheet_manager.find_column_index(self.config.MASTER_SHEET_NAME, 'Last_Updated')
+                    current_status = existing_jobs.status(job_no)
+                    job_row = existing_jobs.row(job_no)
+                    source_tab_col = existing_jobs.source_tab_col
                     
-                    # ✅ อัปเดต Last_Updated ทุกครั้งที่พบงาน (ไม่ว่าสถานะจะเปลี่ยนหรือไม่)
-                    if last_updated_col:
-                        self.sheet_manager.update_cell(self.config.MASTER_SHEET_NAME, job_row, last_updated_col, last_updated_time)
-                        logger.info(f"🕒 Updated Last_Updated for {job_no}: {last_updated_time}")
+                    seen_jobs.append(job_no)
                     
                     # ตรวจสอบการเปลี่ยนแปลงสถานะ
                     if current_status != tab_name:
-                        # ✅ สถานะเปลี่ยน - อัปเดต Source_Tab
-                        if source_tab_col:
-                            self.sheet_manager.update_cell(self.config.MASTER_SHEET_NAME, job_row, source_tab_col, tab_name)
+                        # ✅ สถานะเปลี่ยน - อัปเดต Source_Tab และ Last_Updated ทันที (งานที่ไม่เปลี่ยนรอ materialize)
+                        pending_record = new_records_by_job.get(job_no)
+                        if pending_record is not None:
+                            # งานใหม่ใน change set เดียวกัน: แก้แถวที่จะ append เลย
+                            pending_record['Source_Tab'] = tab_name
+                            pending_record['Last_Updated'] = last_updated_time
+                        else:
+                            # row 0 = งานใหม่จาก change set ก่อนหน้าที่อาจยังไม่ append: drain รวมเข้ากับแถวที่ append
+                            # หรือหาแถวจริงด้วย Job_No
+                            if source_tab_col:
+                                cell_updates.append([job_row or 0, source_tab_col, tab_name, job_no])
+                            if last_updated_col:
+                                cell_updates.append([job_row or 0, last_updated_col, last_updated_time, job_no])
+                        existing_jobs.set_status(job_no, tab_name)
                         
                         updated_jobs_count += 1
+                        stats_moves.append((job_no, current_status, tab_name, current_time.timestamp()))
                         logger.info(f"🔄 Status changed for {job_no}: {current_status} → {tab_name}")
-                        self.notifier.send(f"🔄 อัปเดตสถานะงาน: {job_no}\n   จาก: {current_status}\n   เป็น: {tab_name}\n   เวลา: {last_updated_time}")
-                    else:
-                        # ✅ สถานะไม่เปลี่ยน - แต่ยัง stamp เวลาแล้ว
-                        logger.info(f"✅ Job {job_no} still active in {tab_name} (Last_Updated: {last_updated_time})")
+                        notifications.append(f"🔄 อัปเดตสถานะงาน: {job_no}\n   จาก: {current_status}\n   เป็น: {tab_name}\n   เวลา: {last_updated_time}")
                     
                 else:
                     # ✅ งานใหม่ - เพิ่มใหม่
-                    new_record = {}
-                    
                     # คัดลอกข้อมูลจากแถวต้นฉบับ
-                    for col, val in row.items():
-                        col_str = str(col)
-                        if not (('job' in col_str.lower() and 'no' in col_str.lower()) or col_str.lower() == 'job no.'):
-                            new_record[col_str] = str(val)
+                    new_record = {header: str(values[idx]) for idx, header in data_columns}
                     
                     # เพิ่มข้อมูลพิเศษ
                     new_record['Job_No'] = job_no
@@ -442,103 +710,692 @@ class JobSyncApplication:
                     new_record['Last_Updated'] = last_updated_time  # ✅ เพิ่ม Last_Updated
                     
                     new_records_to_add.append(new_record)
-                    existing_jobs[job_no] = {'current_status': tab_name}
+                    new_records_by_job[job_no] = new_record
+                    existing_jobs.add(job_no, 0, tab_name)
+                    seen_jobs.append(job_no)
+                    stats_new_jobs.append((job_no, tab_name, current_time.timestamp()))
                     
                     logger.info(f"🆕 New job found: {job_no} in {tab_name} (Time: {last_updated_time})")
-                    self.notifier.send(f"🆕 งานใหม่: {job_no} (จาก {tab_name})\n   เวลา: {last_updated_time}")
-    
+                    notifications.append(f"🆕 งานใหม่: {job_no} (จาก {tab_name})\n   เวลา: {last_updated_time}")
+        
+        logger.info(f"📊 Change set: {len(new_records_to_add)} new jobs, {updated_jobs_count} status updates, {len(cell_updates)} cell updates")
+        return {
+            'cell_updates': cell_updates,
+            'new_records': new_records_to_add,
+            'data_headers': sorted(data_headers),
+            'stats_new_jobs': stats_new_jobs,
+            'stats_moves': stats_moves,
+            'notifications': notifications,
+            'updated_jobs': updated_jobs_count,
+            'seen_jobs': seen_jobs,
+        }
+
+    def _drain_journal(self):
+        """เขียนรายการค้างใน journal ลงชีต: cell update ของทุก change set รวมเป็น batch ละ WRITE_BATCH_SIZE
+        และงานใหม่ทั้งหมดใน append เดียว แล้วจึงอัปเดต stats/ส่งแจ้งเตือนของ change set ที่เขียนครบ"""
+        self._check_cancelled()
+        if self.shards is not None and not self.shards.holds_writer():
+            raise RuntimeError(f"Node {self.shards.node_id} no longer holds the shard writer lease")
+        master = self.config.MASTER_SHEET_NAME
+        cells, appends, batches = self.journal.pending()
+        
+        landed = []  # งานใหม่ที่อยู่ในชีตแล้วจากรอบก่อน (ยังต้องเข้า index ค้นหา)
+        if self.journal.needs_verify:
+            # replay: บางรายการอาจเขียนไปแล้วก่อน process ตาย และแถวอาจเลื่อน -> ตรวจกับชีตจริงด้วย Job_No
+            index = self.sheet_manager.get_job_data_with_positions(master, strict=True)
+            appending_jobs = {a['job'] for a in appends}
+            missing = [c['seq'] for c in cells if c['job'] not in index and c['job'] not in appending_jobs]
+            cells = [dict(c, row=index.row(c['job'])) if c['job'] in index else c
+                     for c in cells if c['job'] in index or c['job'] in appending_jobs]
+            landed = [a for a in appends if a['job'] in index]
+            present = [a['seq'] for a in landed]
+            appends = [a for a in appends if a['job'] not in index]
+            if missing or present:
+                logger.info(f"♻️ Journal replay: skipping {len(present)} new jobs already in '{master}' "
+                            f"and {len(missing)} cell updates for jobs no longer in the sheet")
+            self.journal.mark_applied(missing + present)
+            self.journal.needs_verify = False
+        
+        # cell ของงานใหม่ที่ยังไม่รู้แถว (row 0): ถ้ายังรอ append อยู่ รวมเข้ากับแถวที่ append
+        # ถ้า append ไปแล้วใน drain ก่อนหน้า หาแถวจริงด้วย Job_No
+        appending = {a['job']: a for a in appends}
+        folded = [c for c in cells if not c['row'] and c['job'] in appending]
+        unresolved = [c for c in cells if not c['row'] and c['job'] not in appending]
+        cells = [c for c in cells if c['row']]
+        if unresolved:
+            index = self.sheet_manager.get_job_data_with_positions(master, strict=True)
+            cells += [dict(c, row=index.row(c['job'])) for c in unresolved if c['job'] in index]
+            self.journal.mark_applied([c['seq'] for c in unresolved if c['job'] not in index])
+        
+        batch_size = self.config.WRITE_BATCH_SIZE
+        for start in range(0, len(cells), batch_size):
+            chunk = cells[start:start + batch_size]
+            self.sheet_manager.batch_update_cells(master, [[c['row'], c['col'], c['value']] for c in chunk])
+            self.journal.mark_applied([c['seq'] for c in chunk])
+        if cells:
+            logger.info(f"🕒 Flushed {len(cells)} cell updates to '{master}'")
+        
         # เพิ่มงานใหม่ลง Sheet
-        if new_records_to_add:
-            master_ws = self.sheet_manager.get_or_create_worksheet(self.config.MASTER_SHEET_NAME)
+        if appends:
+            data_headers = set().union(*(batch['data_headers'] for batch in batches))
+            final_headers = self._ensure_master_headers(data_headers)
+            # จับคู่ตำแหน่งคอลัมน์ใน Master กับ key ของ record ครั้งเดียว
+            master_schema = self.sheet_manager.schema_registry.resolve(f"sheet:{master}", final_headers)
+            canonical_at = {idx: CANONICAL_HEADERS[field] for field, idx in master_schema.field_index.items()
+                            if field in CANONICAL_HEADERS}
+            keys = [canonical_at.get(idx, header) for idx, header in enumerate(final_headers)]
+            for c in folded:
+                if 0 < c['col'] <= len(keys):
+                    # แก้ค่าใน record ของ append ที่ค้าง (ใช้กับ index ค้นหาด้วย)
+                    appending[c['job']]['record'][keys[c['col'] - 1]] = c['value']
+            rows_to_append = [[a['record'].get(key, "") for key in keys] for a in appends]
             
-            # เรียงลำดับ headers ให้ Job_No อยู่คอลัมน์แรก
-            final_headers = ['Job_No', 'First_Seen', 'Last_Updated', 'Source_Tab'] + sorted([h for h in all_headers if h not in ['Job_No', 'First_Seen', 'Last_Updated', 'Source_Tab']])
-            
-            if master_ws.row_count == 1 and master_ws.col_count == 1 and master_ws.cell(1,1).value is None:
-                master_ws.update("A1", [final_headers])
-            else:
-                existing_headers = master_ws.row_values(1)
-                if set(existing_headers) != set(final_headers):
-                    logger.info("📋 Updating sheet headers...")
-                    master_ws.update("A1", [final_headers])
-    
-            # แปลง dicts เป็น list of lists
-            rows_to_append = []
-            for record in new_records_to_add:
-                row = [record.get(h, "") for h in final_headers]
-                rows_to_append.append(row)
-            
-            self.sheet_manager.append_rows(self.config.MASTER_SHEET_NAME, rows_to_append)
-    
-        logger.info(f"📊 Processing completed: {len(new_records_to_add)} new jobs, {updated_jobs_count} status updates")
-        return len(new_records_to_add), updated_jobs_count
-
-# ในไฟล์ main_master_only.py
-# ปรับปรุง method run ใน class JobSyncApplication
-
-    def run(self):
-        """ฟังก์ชันหลักสำหรับรันกระบวนการทั้งหมด"""
-        import time
+            if not self.sheet_manager.append_rows(master, rows_to_append):
+                # คำขออาจไปถึง Sheets แล้วแม้จะได้ error กลับมา: รอบถัดไปต้องตรวจก่อนเขียนซ้ำ
+                self.journal.needs_verify = True
+                raise RuntimeError(f"Failed to append {len(rows_to_append)} new jobs to '{master}'")
+            self.journal.mark_applied([a['seq'] for a in appends] + [c['seq'] for c in folded])
         
-        start_time = datetime.now()
-        self.sheet_manager.log_activity("Sync Start", "เริ่มต้นกระบวนการซิงค์งาน")
+        # index ค้นหาได้เฉพาะงานที่อยู่ในชีตแล้ว (อัปเดตซ้ำเมื่อ replay ได้ เพราะแทนที่ด้วย Job_No)
+        try:
+            self.search_index.apply_changes([a['record'] for a in landed + appends],
+                                            [move for batch in batches for move in batch['stats_moves']])
+        except Exception as e:
+            logger.error(f"❌ Failed to update search index: {e}")
         
-        all_tab_data = {}
-        successful_tabs, failed_tabs = [], []
+        # แจ้งเตือน/stats หลังเขียนสำเร็จ เพื่อไม่ให้ส่งซ้ำเมื่อ replay
+        for batch in batches:
+            try:
+                self.stats_store.apply_changes(batch['stats_new_jobs'], batch['stats_moves'])
+            except Exception as e:
+                logger.error(f"❌ Failed to update stats aggregates: {e}")
+            for message in batch['notifications']:
+                self.notifier.send(message)
+            self.journal.mark_done(batch['id'])
+            if self.shards is not None and batch['run'] == self.shards.round_id:
+                for tab in batch['tabs']:
+                    self.shards.mark_written(tab)
         
-        # สร้าง WebDriver
-        driver = self.scraper.create_driver()
+        logger.info(f"📊 Journal drained: {len(batches)} change sets, {len(appends)} new jobs, {len(cells)} cell updates")
+
+    def _mark_seen(self, job_nos: Iterable[str]) -> int:
+        """บันทึกว่างานเหล่านี้ถูกพบในรอบนี้ (run id + เวลาของรอบบันทึกครั้งเดียว) คืนจำนวนงานที่บันทึกได้"""
+        try:
+            stamp = datetime.now(pytz.timezone('Asia/Bangkok')).strftime('%d/%m/%Y %H:%M:%S')
+            marked = self.last_seen.mark_seen(self.last_seen.begin_run(self._journal_run, stamp), job_nos)
+        except Exception as e:
+            logger.error(f"❌ Failed to record last-seen times: {e}")
+            return 0
+        self.seen_jobs_count += marked
+        return marked
+
+    def materialize_last_seen(self, force: bool = False) -> int:
+        """เขียนเวลาที่พบล่าสุดลงคอลัมน์ Last_Updated เฉพาะงานที่ค่าเปลี่ยนตั้งแต่ครั้งก่อน
+        แถวติดกันที่มีเวลาเดียวกัน (พบในรอบเดียวกัน) รวมเป็น range เดียว คืนจำนวนงานที่เขียน"""
+        if not force and not self.last_seen.materialize_due(self.config.LAST_SEEN_MATERIALIZE_HOURS):
+            return 0
+        master = self.config.MASTER_SHEET_NAME
+        pending = self.last_seen.pending()
+        if pending:
+            index = self.sheet_manager.get_job_data_with_positions(master, strict=True)
+            master_schema = self.sheet_manager.schemas.get(master)
+            col = master_schema.col(LAST_UPDATED) if master_schema else None
+            if not col:
+                logger.warning(f"⚠️ No Last_Updated column in '{master}'; last-seen times stay local")
+                return 0
+            cells = sorted((index.row(job_no), stamp, job_no, run_id)
+                           for job_no, run_id, stamp in pending if job_no in index)
+            ranges: List[List[Any]] = []  # [start_row, end_row, stamp, [(job_no, run_id), ...]]
+            for row, stamp, job_no, run_id in cells:
+                if ranges and ranges[-1][1] + 1 == row and ranges[-1][2] == stamp:
+                    ranges[-1][1] = row
+                    ranges[-1][3].append((job_no, run_id))
+                else:
+                    ranges.append([row, row, stamp, [(job_no, run_id)]])
+            batch_size = self.config.WRITE_BATCH_SIZE
+            for start in range(0, len(ranges), batch_size):
+                chunk = ranges[start:start + batch_size]
+                self.sheet_manager.batch_update_column_ranges(master, col, [r[:3] for r in chunk])
+                self.last_seen.mark_written(item for r in chunk for item in r[3])
+            # งานที่ไม่อยู่ในชีตแล้วไม่ต้องเขียน
+            self.last_seen.mark_written((job_no, run_id) for job_no, run_id, _ in pending if job_no not in index)
+            logger.info(f"🕒 Materialized Last_Updated for {len(cells)} jobs in {len(ranges)} ranges")
+        self.last_seen.finish_materialize()
+        return len(pending)
+
+    def _ensure_master_headers(self, data_headers: set) -> List[str]:
+        """คืน header ของ Master ตามลำดับจริงในชีต ถ้าขาดคอลัมน์จะต่อท้ายแถวที่ 1 (ไม่เขียนทับ/เรียงใหม่)"""
+        master_ws = self.sheet_manager.get_or_create_worksheet(self.config.MASTER_SHEET_NAME)
+        existing_headers = [str(h).strip() for h in master_ws.row_values(1)]
+        wanted = canonical_header_order(data_headers)
+        
+        registry = self.sheet_manager.schema_registry
+        source = f"sheet:{self.config.MASTER_SHEET_NAME}"
+        if not any(existing_headers):
+            master_ws.update("A1", [wanted])
+            registry.accept(source, wanted)
+            return wanted
         
+        schema = registry.resolve(source, existing_headers)
+        present = {CANONICAL_HEADERS.get(field, field) for field in schema.field_index}
+        missing = [h for h in wanted if h not in present]
+        if missing:
+            logger.info(f"📋 Appending {len(missing)} new column(s) to '{self.config.MASTER_SHEET_NAME}': {missing}")
+            needed_cols = len(existing_headers) + len(missing)
+            if needed_cols > master_ws.col_count:
+                master_ws.add_cols(needed_cols - master_ws.col_count)
+            master_ws.update(gspread.utils.rowcol_to_a1(1, len(existing_headers) + 1), [missing])
+            # คอลัมน์ที่การซิงค์ต่อท้ายเองไม่ใช่ drift
+            registry.accept(source, existing_headers + missing)
+        return existing_headers + missing
+
+    def _report_schema_drift(self):
+        """รายงาน header ที่เปลี่ยนไปจากรอบก่อน แล้วบันทึก registry"""
+        registry = self.sheet_manager.schema_registry
+        drifts = registry.take_drifts()
+        if drifts:
+            details = "; ".join(d.describe() for d in drifts)
+            self.sheet_manager.log_activity("Schema Drift", details, "Warning")
+        registry.save()
+
+    def _record_snapshot(self, run_id: Optional[int], tab: int, df: pd.DataFrame, partial: bool,
+                         start_time: datetime) -> Optional[int]:
+        """บันทึก snapshot ของแท็บที่ scrape สำเร็จลงประวัติในเครื่อง (ไม่ทำให้การซิงค์ล้มถ้าบันทึกไม่ได้)
+        run_id เป็น None สำหรับแท็บแรกของรอบ คืนค่า run_id ที่ใช้กับแท็บถัดไป"""
         try:
+            if run_id is None:
+                run_id = self.snapshot_store.begin_run(start_time.timestamp())
+            self.snapshot_store.record_tab(run_id, tab, df, partial)
+        except Exception as e:
+            logger.error(f"❌ Failed to record snapshot history for tab {tab}: {e}")
+        return run_id
+
+    def _load_existing_jobs(self, incremental_tabs: set) -> Tuple[JobIndex, Dict[int, set]]:
+        """โหลด index งานที่มีอยู่แล้ว และ Job_No ที่รู้จักของแต่ละแท็บ incremental
+        (คำนวณในเธรดที่โหลด ก่อนที่ขั้นตอน diff จะเริ่มแก้ไข index)"""
+        existing_jobs = self.sheet_manager.get_job_data_with_positions(self.config.MASTER_SHEET_NAME)
+        known_by_tab = {}
+        for tab in incremental_tabs:
+            tab_name = self.config.TAB_NAMES.get(tab, f"Tab_{tab}")
+            # รู้จัก = อยู่ในแท็บนี้อยู่แล้ว งานที่ย้ายเข้ามาจากแท็บอื่นจึงยังถูกอ่าน
+            known_by_tab[tab] = existing_jobs.jobs_in(tab_name)
+        return existing_jobs, known_by_tab
+
+    def _extract_tab(self, driver: webdriver.Chrome, tab: int, incremental_tabs: set,
+                     existing_future: Future) -> Tuple[pd.DataFrame, Optional[str], Optional[Dict[str, Any]]]:
+        """scrape หนึ่งแท็บ: probe ก่อน ถ้าจำนวนงานและ Job_No หน้าแรกตรงกับรอบก่อนและยังไม่ถึงกำหนด scan เต็ม
+        จะไม่โหลดทั้งแท็บ (คืน frame ว่างกับ scan_mode 'unchanged') คืนค่า (df, scan_mode, ผล probe)
+        ผล probe บันทึกลง scrape_state หลังแท็บสำเร็จเท่านั้น (ถ้า scrape ล้มเหลว รอบถัดไปต้องโหลดใหม่)"""
+        probe = None
+        if self.config.CHANGE_PROBE:
+            state = self.scrape_state.get(tab)
+            probe = self.scraper.probe_tab(driver, tab)
+            deep_scan_due = time.time() - state.get('last_full_scan', 0) >= self.config.FULL_SCAN_INTERVAL_HOURS * 3600
+            if probe is not None and not deep_scan_due and probe == state.get('probe'):
+                self.scraper.tab_metrics[tab]['scan_mode'] = 'unchanged'
+                logger.info(f"💤 Tab {tab}: unchanged since the last scan ({probe['count']} jobs), skipping the full load", extra={'stage': 'scrape', 'tab': tab})
+                return pd.DataFrame(), 'unchanged', None
+        known_job_nos = existing_future.result()[1].get(tab) if tab in incremental_tabs else None
+        df = self.scraper.extract_data_from_tab(driver, tab, known_job_nos=known_job_nos)
+        return df, self.scraper.tab_metrics.get(tab, {}).get('scan_mode'), probe
+
+    def _record_scan(self, tab: int, scan_mode: Optional[str], probe: Optional[Dict[str, Any]]):
+        """จำสถานะของแท็บที่ scrape สำเร็จ (เวลา scan เต็มล่าสุดและผล probe ที่ใช้เทียบในรอบถัดไป)"""
+        if scan_mode == 'full':
+            self.scrape_state.update(tab, last_full_scan=time.time())
+        if probe is not None:
+            self.scrape_state.update(tab, probe=probe)
+
+# ในไฟล์ main_master_only.py
+# ปรับปรุง method run ใน class JobSyncApplication
+
+    def _scrape_tabs(self, tabs: List[int], incremental_tabs: set, existing_future: Future,
+                     on_tab: Callable[[int, pd.DataFrame, Optional[str]], None]) -> Tuple[int, List[int], Optional[str]]:
+        """เปิด browser, login แล้ว scrape แท็บที่ระบุ แต่ละแท็บที่สำเร็จถูกบันทึกลง checkpoint แล้วส่งต่อให้ on_tab ทันที
+        คืนค่า (จำนวนแท็บที่สำเร็จ, แท็บที่ล้มเหลว, ข้อผิดพลาดระดับ session เช่น login ไม่ผ่าน)"""
+        scraped, failed_tabs = 0, []
+        handled: set = set()  # แท็บที่ส่งให้ on_tab แล้ว ห้าม scrape/diff ซ้ำเมื่อ session ล้มกลางทาง
+        driver = None
+        try:
+            # สร้าง WebDriver (index งานเดิมโหลดคู่ขนานอยู่ในอีกเธรด)
+            driver = self.scraper.create_driver()
+            
             # Login
             logged_in, driver = self.scraper.login(driver)
             if not logged_in:
-                self.notifier.send("❌ ข้อผิดพลาดร้ายแรง: เข้าสู่ระบบ edoclite ไม่ได้ กรุณาตรวจสอบ username/password")
-                self.sheet_manager.log_activity("Login Failed", "ไม่สามารถเข้าสู่ระบบได้", "Failed")
-                raise Exception("Login failed to edoclite system")
+                return scraped, list(tabs), "login"
             
             logger.info("✅ Successfully logged into edoclite system")
             
             # Scrape แต่ละ tab
-            for tab in self.config.TABS_TO_SCRAPE:
+            for position, tab in enumerate(tabs):
+                self._check_cancelled()
+                try:
+                    driver = self._recycle_if_over_budget(driver)
+                except Exception as recycle_error:
+                    # browser เดิมถูกปิดไปแล้ว: แท็บที่ scrape เสร็จคงไว้ ล้มเหลวเฉพาะแท็บที่เหลือ
+                    driver = None
+                    logger.error(f"💥 Browser recycle failed before tab {tab}: {recycle_error}")
+                    return scraped, list(tabs[position:]) + failed_tabs, str(recycle_error)
                 try:
-                    logger.info(f"📊 Starting to scrape tab {tab}...")
-                    df = self.scraper.extract_data_from_tab(driver, tab)
-                    if not df.empty:
-                        all_tab_data[tab] = df
-                        successful_tabs.append(tab)
-                        logger.info(f"✅ Tab {tab}: Successfully scraped {len(df)} records")
+                    logger.info(f"📊 Starting to scrape tab {tab}...", extra={'stage': 'scrape', 'tab': tab})
+                    df, scan_mode, probe = self._extract_tab(driver, tab, incremental_tabs, existing_future)
+                    if not df.empty or scan_mode in PARTIAL_SCAN_MODES:
+                        self.checkpoint.save_tab(tab, df, scan_mode)
+                        self._record_scan(tab, scan_mode, probe)
+                        logger.info(f"✅ Tab {tab}: Successfully scraped {len(df)} records ({scan_mode} scan)", extra={'stage': 'scrape', 'tab': tab})
+                        scraped += 1
+                        handled.add(tab)
+                        on_tab(tab, df, scan_mode)
                     else:
                         failed_tabs.append(tab)
-                        logger.warning(f"⚠️ Tab {tab}: No data found")
+                        logger.warning(f"⚠️ Tab {tab}: No data found", extra={'stage': 'scrape', 'tab': tab})
                 except Exception as tab_error:
                     failed_tabs.append(tab)
-                    logger.error(f"❌ Tab {tab}: Error - {str(tab_error)}")
+                    logger.error(f"❌ Tab {tab}: Error - {str(tab_error)}", extra={'stage': 'scrape', 'tab': tab})
                 
                 time.sleep(2)  # เพิ่มระยะเวลารอระหว่าง tab
+            return scraped, failed_tabs, None
         
+        except SyncCancelled:
+            raise
         except Exception as main_error:
             logger.error(f"💥 Critical error during scraping: {str(main_error)}")
+            # แท็บที่ยังไม่ถึง + แท็บที่ล้มเหลวแล้ว (ไม่รวมแท็บที่ส่งต่อไปแล้ว)
+            unreached = [tab for tab in tabs if tab not in handled and tab not in failed_tabs]
+            return scraped, unreached + failed_tabs, str(main_error)
+        finally:
+            if driver:
+                self.scraper.watchdog.quit(driver)
+                logger.info("🌐 Browser closed successfully")
+
+    def _recycle_if_over_budget(self, driver: webdriver.Chrome) -> webdriver.Chrome:
+        """ปิดแล้วเปิด browser ใหม่ (login ด้วย session ที่บันทึกไว้) เมื่อเกินงบหน่วยความจำหรือจำนวนหน้า"""
+        reason = self.scraper.watchdog.recycle_reason(driver)
+        if not reason:
+            return driver
+        logger.info(f"♻️ Recycling the browser: {reason}")
+        self.scraper.watchdog.quit(driver)
+        self.scraper.watchdog.recycled(reason)
+        driver = self.scraper.create_driver()
+        try:
+            logged_in, driver = self.scraper.login(driver)
+        except Exception:
+            self.scraper.watchdog.quit(driver)
             raise
+        if not logged_in:
+            self.scraper.watchdog.quit(driver)
+            raise Exception("Login failed after recycling the browser")
+        return driver
+
+    def _scrape_with_retry(self, tabs: List[int], incremental_tabs: set, existing_future: Future,
+                           on_tab: Callable[[int, pd.DataFrame, Optional[str]], None]) -> List[int]:
+        """scrape แท็บที่ยังขาด แล้วลองใหม่เฉพาะแท็บที่ล้มเหลว (สูงสุด TAB_RETRY_ATTEMPTS ครั้ง ด้วย browser ใหม่)
+        คืนค่าแท็บที่ยังล้มเหลว"""
+        pending = list(tabs)
+        attempts = 1 + max(self.config.TAB_RETRY_ATTEMPTS, 0)
+        scraped_total, session_error = 0, None
+        for attempt in range(1, attempts + 1):
+            if attempt > 1:
+                delay = self.config.TAB_RETRY_BACKOFF * (attempt - 1)
+                logger.info(f"🔁 Retrying tabs {pending} (attempt {attempt}/{attempts}) in {delay:.0f}s...")
+                time.sleep(delay)
+            scraped, pending, session_error = self._scrape_tabs(pending, incremental_tabs, existing_future, on_tab)
+            scraped_total += scraped
+            if not pending:
+                break
+        
+        # ไม่ได้แท็บไหนเลยเพราะ session ใช้ไม่ได้ -> ถือเป็นข้อผิดพลาดร้ายแรงเหมือนเดิม
+        if session_error and not scraped_total:
+            if session_error == "login":
+                self.notifier.send("❌ ข้อผิดพลาดร้ายแรง: เข้าสู่ระบบ edoclite ไม่ได้ กรุณาตรวจสอบ username/password")
+                self.sheet_manager.log_activity("Login Failed", "ไม่สามารถเข้าสู่ระบบได้", "Failed")
+                raise Exception("Login failed to edoclite system")
+            raise Exception(session_error)
+        return pending
+
+    def _start_scrape_producer(self, tabs: List[int], incremental_tabs: set,
+                               existing_future: Future) -> Tuple[threading.Thread, queue.Queue, Dict[str, Any]]:
+        """รัน scraper ในเธรดแยก ส่ง (tab, df, scan_mode) เข้า queue ที่จำกัดขนาด
+        ปิดท้ายด้วย None; ผลลัพธ์ (แท็บที่ล้มเหลว/exception) อยู่ใน dict ที่คืนกลับ"""
+        tab_queue: queue.Queue = queue.Queue(maxsize=max(self.config.PIPELINE_QUEUE_SIZE, 1))
+        outcome: Dict[str, Any] = {'failed_tabs': list(tabs), 'error': None}
+
+        def produce():
+            try:
+                outcome['failed_tabs'] = self._scrape_with_retry(
+                    tabs, incremental_tabs, existing_future,
+                    lambda tab, df, scan_mode: tab_queue.put((tab, df, scan_mode)))
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                tab_queue.put(None)
+
+        producer = threading.Thread(target=produce, name="scrape-producer", daemon=True)
+        producer.start()
+        return producer, tab_queue, outcome
+
+    def _scrape_shards(self, incremental_tabs: set, existing_future: Future) -> int:
+        """producer ของโหมดหลาย node: จองแท็บจากตาราง lease ทีละแท็บ scrape แล้วส่ง frame ให้ writer
+        ทำงานจนรอบไม่มีแท็บที่ต้อง scrape เหลือ (รอ lease ของ node อื่นไว้ เผื่อต้องจองต่อถ้า node นั้นตาย)
+        คืนค่าจำนวนแท็บที่ node นี้ scrape สำเร็จ"""
+        shards = self.shards
+        driver, scraped, session_failures = None, 0, 0
+        try:
+            while True:
+                self._check_cancelled()
+                tab = shards.claim()
+                if tab is None:
+                    if shards.scraping_settled():
+                        return scraped
+                    time.sleep(self.config.SHARD_POLL_INTERVAL)
+                    continue
+                
+                if driver is not None:
+                    reason = self.scraper.watchdog.recycle_reason(driver)
+                    if reason:
+                        logger.info(f"♻️ Recycling the browser before tab {tab}: {reason}")
+                        self.scraper.watchdog.quit(driver)
+                        self.scraper.watchdog.recycled(reason)
+                        driver = None
+                
+                if driver is None:
+                    session_error = "login"
+                    try:
+                        driver = self.scraper.create_driver()
+                        logged_in, driver = self.scraper.login(driver)
+                    except Exception as e:
+                        logged_in, session_error = False, str(e)
+                        logger.error(f"💥 Critical error during scraping: {session_error}")
+                    if not logged_in:
+                        # คืนแท็บให้ node อื่น แล้วลอง session ใหม่ (จำกัดจำนวนครั้งเท่ากับการลองต่อแท็บ)
+                        shards.release(tab, session_error)
+                        if driver:
+                            self.scraper.watchdog.quit(driver)
+                        driver = None
+                        session_failures += 1
+                        if session_failures >= shards.max_attempts:
+                            if session_error == "login":
+                                self.notifier.send("❌ ข้อผิดพลาดร้ายแรง: เข้าสู่ระบบ edoclite ไม่ได้ กรุณาตรวจสอบ username/password")
+                                raise Exception("Login failed to edoclite system")
+                            raise Exception(session_error)
+                        time.sleep(self.config.TAB_RETRY_BACKOFF * session_failures)
+                        continue
+                    logger.info("✅ Successfully logged into edoclite system")
+                
+                try:
+                    logger.info(f"📊 Starting to scrape tab {tab} (shard leased by {shards.node_id})...", extra={'stage': 'scrape', 'tab': tab})
+                    df, scan_mode, probe = self._extract_tab(driver, tab, incremental_tabs, existing_future)
+                    if not df.empty or scan_mode in PARTIAL_SCAN_MODES:
+                        if shards.submit(tab, df, scan_mode):
+                            self._record_scan(tab, scan_mode, probe)
+                            logger.info(f"✅ Tab {tab}: Successfully scraped {len(df)} records ({scan_mode} scan)", extra={'stage': 'scrape', 'tab': tab})
+                            scraped += 1
+                    else:
+                        shards.release(tab, "no data")
+                        logger.warning(f"⚠️ Tab {tab}: No data found", extra={'stage': 'scrape', 'tab': tab})
+                except Exception as tab_error:
+                    shards.release(tab, str(tab_error))
+                    logger.error(f"❌ Tab {tab}: Error - {str(tab_error)}", extra={'stage': 'scrape', 'tab': tab})
+                
+                time.sleep(2)  # เพิ่มระยะเวลารอระหว่าง tab
         finally:
             if driver:
-                driver.quit()
+                self.scraper.watchdog.quit(driver)
                 logger.info("🌐 Browser closed successfully")
+
+    def _become_shard_writer(self):
+        """เริ่มบทบาท writer ของรอบ: checkpoint เดิมของเครื่องนี้ไม่ถูกใช้ต่อ
+        เพราะแท็บที่ยังไม่ written จะถูก diff ใหม่กับข้อมูลล่าสุดในชีตอยู่แล้ว"""
+        if self.checkpoint.open_run():
+            self.checkpoint.complete_run()
+            self.checkpoint.open_run()
+        self.sheet_manager.log_activity("Sync Start", f"รอบ {self.shards.round_id} จากหลาย node (writer: {self.shards.node_id})")
+        logger.info(f"✍️ Node {self.shards.node_id} is the writer for shard round {self.shards.round_id}")
+
+    def _run_sharded(self) -> Dict[str, Any]:
+        """โหมดหลาย node: ทุก node ช่วยกัน scrape แท็บของรอบผ่านตาราง lease
+        node ที่ถือ writer lease เป็นผู้เดียวที่ diff และเขียนลงชีต ถ้า writer ตาย node อื่นรับช่วงต่อ"""
+        start_time = datetime.now()
+        shards = self.shards
+        joined = shards.open_round(self.config.TABS_TO_SCRAPE)
+        logger.info(f"🧩 Node {shards.node_id} {'joined' if joined else 'started'} shard round {shards.round_id}")
+        self._journal_run = shards.round_id
+        new_jobs_count, updated_jobs_count, total_jobs_processed = 0, 0, 0
+        snapshot_run_id, existing_jobs = None, None
+        journaled: set = set()  # แท็บที่ diff ลง journal แล้ว (mark written เมื่อ drain เขียนลงชีตสำเร็จ)
+        
+        with shards.keeping_leases():
+            incremental_tabs = self._incremental_tabs_for_run()
+            loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="existing-jobs")
+            existing_future = loader.submit(self._load_existing_jobs, incremental_tabs)
+            loader.shutdown(wait=False)
+            
+            writer = shards.try_acquire_writer()
+            if writer:
+                self._become_shard_writer()
+            
+            outcome: Dict[str, Any] = {'scraped': 0, 'error': None}
+            
+            def produce():
+                try:
+                    outcome['scraped'] = self._scrape_shards(incremental_tabs, existing_future)
+                except BaseException as e:
+                    outcome['error'] = e
+            
+            producer = threading.Thread(target=produce, name="scrape-producer", daemon=True)
+            producer.start()
+            
+            # consumer: writer เขียนผลของทุก node ตามลำดับแท็บ, node อื่นรอจน scrape ส่วนของตัวเองเสร็จ
+            try:
+                while True:
+                    self._check_cancelled()
+                    if not writer and shards.try_acquire_writer():
+                        writer = True
+                        self._become_shard_writer()
+                        # writer เดิมอาจเขียนไปแล้วบางส่วน: โหลด index ใหม่จากชีต
+                        existing_jobs = self._load_existing_jobs(set())[0]
+                    if writer:
+                        if not shards.holds_writer():
+                            raise RuntimeError(f"Lost the writer lease for shard round {shards.round_id}")
+                        item = shards.next_result(exclude=journaled)
+                        if item is not None:
+                            tab, df, scan_mode = item
+                            if existing_jobs is None:
+                                existing_jobs = existing_future.result()[0]
+                            snapshot_run_id = self._record_snapshot(snapshot_run_id, tab, df, scan_mode in PARTIAL_SCAN_MODES, start_time)
+                            logger.info(f"🔄 Processing tab {tab} ({len(df)} records)...", extra={'stage': 'process', 'tab': tab})
+                            new_count, updated_count = self._process_and_add_new_jobs(
+                                {tab: df}, existing_jobs, [tab] if scan_mode in PARTIAL_SCAN_MODES else ())
+                            journaled.add(tab)
+                            new_jobs_count += new_count
+                            updated_jobs_count += updated_count
+                            total_jobs_processed += len(df)
+                            continue
+                        if shards.round_complete():
+                            break
+                        if not producer.is_alive() and not shards.counts().get('live'):
+                            # ไม่มี node ใดกำลัง scrape อยู่: แท็บที่เหลือรอรอบถัดไป
+                            break
+                    elif not producer.is_alive():
+                        break  # scrape ส่วนของ node นี้ครบแล้ว writer ของรอบจะเขียนต่อเอง
+                    time.sleep(self.config.SHARD_POLL_INTERVAL)
+            finally:
+                producer.join()
+        
+        self.scrape_state.save()
+        if isinstance(outcome['error'], SyncCancelled):
+            raise outcome['error']
+        if outcome['error'] is not None and not outcome['scraped'] and not total_jobs_processed:
+            raise outcome['error']
+        
+        if not writer:
+            duration = (datetime.now() - start_time).total_seconds()
+            logger.info(f"🧩 Node {shards.node_id} scraped {outcome['scraped']} tabs for shard round {shards.round_id} "
+                        f"in {duration:.2f} seconds; the round writer writes them to the sheet")
+            return {
+                'success': True,
+                'role': 'scraper',
+                'round_id': shards.round_id,
+                'successful_tabs': outcome['scraped'],
+                'duration': duration,
+                'tab_metrics': self.scraper.tab_metrics
+            }
+        
+        journal_pending = self.drainer.flush(self.config.JOURNAL_FLUSH_TIMEOUT)
+        failed_tabs = shards.unwritten_tabs()
+        if shards.round_complete():
+            self._after_writes()
+            shards.close_round()
+            self.checkpoint.complete_run()
+        else:
+            logger.warning(f"⚠️ Tabs {failed_tabs} not written; shard round {shards.round_id} kept open for the next run")
+        result = self._finish_run(start_time, new_jobs_count, updated_jobs_count, total_jobs_processed,
+                                  failed_tabs, joined, snapshot_run_id, journal_pending)
+        result.update(role='writer', round_id=shards.round_id)
+        return result
+
+    def run(self):
+        """ฟังก์ชันหลักสำหรับรันกระบวนการทั้งหมด
+        replay journal ที่ค้างจากรอบก่อน แล้วรันการซิงค์โดยมีเธรด drain เขียน journal ลงชีตอยู่เบื้องหลัง"""
+        try:
+            # chrome/chromedriver ที่ค้างจากรอบก่อน (process ตายกลางทาง) กินหน่วยความจำของ container
+            self.scraper.watchdog.cleanup_orphans()
+        except Exception as e:
+            logger.error(f"❌ Failed to clean up orphaned browser processes: {e}")
+        if self.shards is not None:
+            # โหมดหลาย node: แท็บที่ยังไม่ written ในรอบจะถูก writer ของรอบ diff ใหม่อยู่แล้ว
+            discarded = self.journal.discard()
+            if discarded:
+                logger.info(f"♻️ Discarded {discarded} journaled entries; unwritten shard tabs are re-diffed by the round writer")
+        elif self.journal.pending_count():
+            # ต้อง replay ให้เสร็จก่อนโหลด index งานเดิม ไม่เช่นนั้นงานใหม่ที่ยังไม่ append จะถูกนับเป็นงานใหม่ซ้ำ
+            logger.info(f"♻️ Replaying {self.journal.pending_count()} journaled entries from the previous run...")
+            self._drain_journal()
+        self.seen_jobs_count = 0
+        self.drainer.start()
+        try:
+            if self.shards is not None:
+                return self._run_sharded()
+            return self._run_pipeline()
+        finally:
+            self.drainer.stop()
+            # ปิดไฟล์ journal (web tier สร้าง JobSyncApplication ใหม่ทุกการซิงค์ใน process เดียวกัน)
+            self.journal.close()
+
+    def _run_pipeline(self) -> Dict[str, Any]:
+        """pipeline: โหลด index งานเดิมคู่กับ login -> แต่ละแท็บที่ scrape เสร็จเข้าสู่ขั้น diff ทันที
+        -> change set ลง journal แล้ว drain ลงชีตขณะที่ browser โหลดแท็บถัดไป (queue จำกัดจำนวนแท็บที่ค้างในหน่วยความจำ)"""
+        start_time = datetime.now()
+        resumed = self.checkpoint.open_run()
+        self._journal_run = self.checkpoint.run_key
+        self.sheet_manager.log_activity("Sync Start", "ทำต่อจาก checkpoint ของรอบก่อน" if resumed else "เริ่มต้นกระบวนการซิงค์งาน")
+        new_jobs_count, updated_jobs_count, total_jobs_processed = 0, 0, 0
+        
+        # 1) เฉพาะแท็บที่ยังไม่มีใน checkpoint ต้อง scrape, แท็บที่ scrape แล้วแต่ยังไม่ประมวลผลนำมาจาก checkpoint
+        done = self.checkpoint.scraped_tabs()
+        tabs_to_scrape = [tab for tab in self.config.TABS_TO_SCRAPE if tab not in done]
+        leftover_tabs = [tab for tab in self.config.TABS_TO_SCRAPE if tab in done and not done[tab]['processed']]
+        if done:
+            logger.info(f"♻️ Checkpoint already has tabs {sorted(done)}; scraping only {tabs_to_scrape}")
+        
+        # แท็บ incremental ต้องรู้ Job_No ที่มีอยู่แล้ว: โหลด index คู่ขนานกับการเปิด browser/login
+        incremental_tabs = self._incremental_tabs_for_run() & set(tabs_to_scrape)
+        if incremental_tabs:
+            logger.info(f"🔎 Incremental tabs this run: {sorted(incremental_tabs)}")
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="existing-jobs")
+        existing_future = loader.submit(self._load_existing_jobs, incremental_tabs)
+        loader.shutdown(wait=False)
+        
+        producer, outcome = None, {'failed_tabs': [], 'error': None}
+        if tabs_to_scrape:
+            producer, tab_queue, outcome = self._start_scrape_producer(tabs_to_scrape, incremental_tabs, existing_future)
+        
+        def tab_stream() -> Iterator[Tuple[int, pd.DataFrame, Optional[str]]]:
+            for tab in leftover_tabs:
+                yield tab, self.checkpoint.load_tab(tab), done[tab]['scan_mode']
+            if producer is not None:
+                for item in iter(tab_queue.get, None):
+                    yield item
+        
+        # 2) consumer: snapshot + diff + บันทึกลง journal ทีละแท็บตามลำดับที่ได้มา
+        snapshot_run_id = None
+        try:
+            for tab, df, scan_mode in tab_stream():
+                self._check_cancelled()
+                existing_jobs = existing_future.result()[0]
+                snapshot_run_id = self._record_snapshot(snapshot_run_id, tab, df, scan_mode in PARTIAL_SCAN_MODES, start_time)
+                logger.info(f"🔄 Processing tab {tab} ({len(df)} records)...", extra={'stage': 'process', 'tab': tab})
+                new_count, updated_count = self._process_and_add_new_jobs(
+                    {tab: df}, existing_jobs, [tab] if scan_mode in PARTIAL_SCAN_MODES else ())
+                new_jobs_count += new_count
+                updated_jobs_count += updated_count
+                total_jobs_processed += len(df)
+        finally:
+            if producer is not None:
+                # ถ้า consumer ล้ม ให้ producer ทำงานต่อจนจบได้ (แท็บถูกเก็บใน checkpoint แล้ว)
+                while producer.is_alive():
+                    try:
+                        tab_queue.get(timeout=1)
+                    except queue.Empty:
+                        pass
+                producer.join()
+        if outcome['error'] is not None:
+            raise outcome['error']
+        failed_tabs = outcome['failed_tabs']
+        self._check_cancelled()
         
-        # ประมวลผลและเพิ่มข้อมูลใหม่ หรือ อัปเดตสถานะ
-        logger.info("🔄 Processing scraped data...")
-        new_jobs_count, updated_jobs_count = self._process_and_add_new_jobs(all_tab_data)
+        # 3) รอ drain เขียน journal ลงชีต ถ้า Sheets ยังล่ม รายการคงอยู่ใน journal และ replay ในรอบถัดไป
+        journal_pending = self.drainer.flush(self.config.JOURNAL_FLUSH_TIMEOUT)
+        self.scrape_state.save()
+        self._after_writes()
+        
+        # ครบทุกแท็บแล้วจึงปิด checkpoint ถ้ายังขาดแท็บ รอบถัดไปจะ scrape เฉพาะแท็บนั้น
+        if not failed_tabs:
+            self.checkpoint.complete_run()
+        else:
+            logger.warning(f"⚠️ Tabs {failed_tabs} still failing after retries; checkpoint kept for the next run")
+        return self._finish_run(start_time, new_jobs_count, updated_jobs_count, total_jobs_processed,
+                                failed_tabs, resumed, snapshot_run_id, journal_pending)
+
+    def _after_writes(self):
+        """งานหลังเขียนครบทุกแท็บของรอบ (ทำเฉพาะ node ที่เขียนลงชีต)"""
+        try:
+            self.snapshot_store.prune()
+        except Exception as e:
+            logger.error(f"❌ Failed to prune snapshot history: {e}")
+        try:
+            self.search_index.snapshot()
+        except Exception as e:
+            logger.error(f"❌ Failed to save search index snapshot: {e}")
+        try:
+            self.materialize_last_seen()
+        except Exception as e:
+            logger.error(f"❌ Failed to materialize Last_Updated (kept for the next run): {e}")
+        self._report_schema_drift()
+
+    def _finish_run(self, start_time: datetime, new_jobs_count: int, updated_jobs_count: int,
+                    total_jobs_processed: int, failed_tabs: List[int], resumed: bool,
+                    snapshot_run_id: Optional[int], journal_pending: int = 0) -> Dict[str, Any]:
+        """บันทึก Sync Complete, ส่งสรุปทาง LINE และคืนผลลัพธ์ของรอบ"""
+        if journal_pending:
+            logger.warning(f"⚠️ {journal_pending} journal entries not yet written to Sheets; they are replayed on the next run")
+        successful_tabs = [tab for tab in self.config.TABS_TO_SCRAPE if tab not in failed_tabs]
+        unchanged_tabs = [tab for tab, m in self.scraper.tab_metrics.items() if m.get('scan_mode') == 'unchanged']
         
         # ✅ คำนวณสถิติเพิ่มเติม
-        total_jobs_processed = sum(len(df) for df in all_tab_data.values())
-        timestamp_jobs_updated = total_jobs_processed  # ทุกงานที่พบจะได้ timestamp
+        timestamp_jobs_updated = self.seen_jobs_count  # งานที่บันทึก last seen ได้จริง (Last_Updated ในชีตเขียนเป็นก้อนภายหลัง)
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
         
         # Log summary
-        summary_details = f"เพิ่มงานใหม่ {new_jobs_count} งาน, อัปเดตสถานะ {updated_jobs_count} งาน, อัปเดต timestamp {timestamp_jobs_updated} งาน. แท็บสำเร็จ: {len(successful_tabs)}. แท็บล้มเหลว: {len(failed_tabs)}."
-        status = "Success" if not failed_tabs else "Partial Success"
+        summary_details = f"เพิ่มงานใหม่ {new_jobs_count} งาน, อัปเดตสถานะ {updated_jobs_count} งาน, บันทึก last seen {timestamp_jobs_updated} งาน. แท็บสำเร็จ: {len(successful_tabs)}. แท็บล้มเหลว: {len(failed_tabs)}."
+        if unchanged_tabs:
+            summary_details += f" แท็บที่ไม่เปลี่ยน (ข้ามการโหลดทั้งแท็บ): {len(unchanged_tabs)}."
+        if journal_pending:
+            summary_details += f" รอเขียนลงชีต (journal): {journal_pending} รายการ."
+        status = "Success" if not failed_tabs and not journal_pending else "Partial Success"
         self.sheet_manager.log_activity("Sync Complete", summary_details, status)
         
         # Send enhanced final notification
@@ -546,18 +1403,25 @@ class JobSyncApplication:
     
     🆕 พบและเพิ่มงานใหม่: {new_jobs_count} งาน
     🔄 อัปเดตสถานะงาน: {updated_jobs_count} งาน  
-    🕒 อัปเดต timestamp: {timestamp_jobs_updated} งาน
+    🕒 บันทึกเวลาที่พบล่าสุด: {timestamp_jobs_updated} งาน
     📊 ประมวลผลทั้งหมด: {total_jobs_processed} งาน
     🗂️ แท็บที่ดึงข้อมูลได้: {len(successful_tabs)}/{len(self.config.TABS_TO_SCRAPE)}
     ⏱️ ใช้เวลา: {duration:.2f} วินาที
     
-    📋 สรุป: ทุกงานที่ยังอยู่ในระบบจะได้รับการ stamp เวลา Last_Updated ใหม่
+    📋 สรุป: เวลาที่พบล่าสุดของทุกงานบันทึกทุกรอบ คอลัมน์ Last_Updated อัปเดตเป็นก้อนทุก {self.config.LAST_SEEN_MATERIALIZE_HOURS:g} ชั่วโมง
     
     🔗 Master Sheet: https://docs.google.com/spreadsheets/d/{self.config.GOOGLE_SHEET_ID}"""
         
         self.notifier.send(summary_msg)
         logger.info(f"🎉 Job synchronization completed successfully in {duration:.2f} seconds")
         
+        peak_rss = max((m.get('rss_bytes') or 0 for m in self.scraper.tab_metrics.values()), default=0)
+        total_bytes = sum(m.get('bytes') or 0 for m in self.scraper.tab_metrics.values())
+        browser = self.scraper.watchdog.stats
+        peak_rss = max(peak_rss, browser['peak_rss_bytes'])
+        logger.info(f"📏 Browser [{'lean' if self.scraper.lean else 'full'}]: {total_bytes / 1024 / 1024:.1f}MB transferred, peak RSS {peak_rss / 1024 / 1024:.1f}MB, "
+                    f"CPU {browser['cpu_seconds']:.1f}s, {browser['launches']} launches ({browser['recycles']} recycled)")
+        
         return {
             'success': True,
             'new_jobs': new_jobs_count,
@@ -566,7 +1430,13 @@ class JobSyncApplication:
             'total_processed': total_jobs_processed,
             'successful_tabs': len(successful_tabs),
             'failed_tabs': len(failed_tabs),
-            'duration': duration
+            'unchanged_tabs': len(unchanged_tabs),
+            'resumed': resumed,
+            'duration': duration,
+            'snapshot_run_id': snapshot_run_id,
+            'journal_pending': journal_pending,
+            'tab_metrics': self.scraper.tab_metrics,
+            'browser': dict(browser)
         }
 
 
@@ -578,7 +1448,11 @@ if __name__ == "__main__":
     try:
         app_config = Config()
         app = JobSyncApplication(app_config)
-        app.run()
+        if profiling_requested():
+            with SyncProfiler():
+                app.run()
+        else:
+            app.run()
         sys.exit(0)
     except (ValueError, gspread.exceptions.GSpreadException) as e:
         logger.error(f"💥 ข้อผิดพลาดในการตั้งค่าหรือ Google Sheets: {e}")
@@ -0,0 +1,208 @@
+# schema_registry.py
+# จับคู่ header ของแต่ละแท็บ/ชีตกับ field มาตรฐานครั้งเดียว แล้วใช้ index ตามตำแหน่งใน loop
+# พร้อมตรวจจับการเปลี่ยนแปลงของ header (drift) แทนการเขียนทับแถวที่ 1 แบบเงียบๆ
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_PATH = "schema_registry.json"
+
+# field มาตรฐานที่โปรแกรมใช้ (คอลัมน์อื่นๆ ใช้ชื่อ header ตรงๆ)
+JOB_NO = 'job_no'
+SOURCE_TAB = 'source_tab'
+FIRST_SEEN = 'first_seen'
+LAST_UPDATED = 'last_updated'
+
+# ชื่อคอลัมน์ใน Master_Data สำหรับ field มาตรฐาน เรียงตามลำดับที่ต้องการในชีต
+CANONICAL_HEADERS: Dict[str, str] = {
+    JOB_NO: 'Job_No',
+    FIRST_SEEN: 'First_Seen',
+    LAST_UPDATED: 'Last_Updated',
+    SOURCE_TAB: 'Source_Tab',
+}
+_EXACT = {header: field for field, header in CANONICAL_HEADERS.items()}
+
+
+def classify_header(header: Any) -> Optional[str]:
+    """คืนค่า field มาตรฐานของ header หรือ None ถ้าเป็นคอลัมน์ข้อมูลทั่วไป"""
+    text = str(header).strip()
+    if text in _EXACT:
+        return _EXACT[text]
+    lower = text.lower()
+    if 'job' in lower and ('no' in lower or 'number' in lower):
+        return JOB_NO
+    return None
+
+
+def find_job_no_index(headers: Iterable[Any]) -> Optional[int]:
+    """ตำแหน่งคอลัมน์ Job No. (ให้ความสำคัญกับ 'Job_No' ก่อน)"""
+    return compile_schema(headers).index(JOB_NO)
+
+
+def canonical_header_order(data_headers: Iterable[str]) -> List[str]:
+    """ลำดับคอลัมน์มาตรฐานของ Master_Data: field มาตรฐานก่อน ตามด้วยคอลัมน์ข้อมูลเรียงตามชื่อ"""
+    return list(CANONICAL_HEADERS.values()) + sorted(
+        {h for h in data_headers if h and h not in _EXACT and classify_header(h) != JOB_NO})
+
+
+def headers_signature(headers: Iterable[Any]) -> str:
+    return hashlib.sha1('\x1f'.join(str(h).strip() for h in headers).encode('utf-8')).hexdigest()[:16]
+
+
+class CompiledSchema:
+    """ผลการ resolve header ชุดหนึ่ง: ตำแหน่งของแต่ละ field และคอลัมน์ข้อมูลที่ต้องคัดลอก"""
+
+    def __init__(self, headers: List[str], field_index: Dict[str, int], job_no_positions: List[int],
+                 data_columns: List[Tuple[int, str]]):
+        self.headers = headers
+        self.field_index = field_index
+        self.job_no_positions = job_no_positions
+        self.data_columns = data_columns
+        self.signature = headers_signature(headers)
+
+    def index(self, field: str) -> Optional[int]:
+        """ตำแหน่ง 0-based ของ field (field มาตรฐานหรือชื่อ header)"""
+        return self.field_index.get(field)
+
+    def col(self, field: str) -> Optional[int]:
+        """ตำแหน่ง 1-based สำหรับ gspread"""
+        idx = self.field_index.get(field)
+        return idx + 1 if idx is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'headers': self.headers, 'field_index': self.field_index,
+                'job_no_positions': self.job_no_positions, 'data_columns': self.data_columns}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompiledSchema':
+        return cls(data['headers'], data['field_index'], data['job_no_positions'],
+                   [tuple(c) for c in data['data_columns']])
+
+
+def compile_schema(headers: Iterable[Any]) -> CompiledSchema:
+    headers = [str(h).strip() for h in headers]
+    field_index: Dict[str, int] = {}
+    job_no_positions: List[int] = []
+    data_columns: List[Tuple[int, str]] = []
+    for idx, header in enumerate(headers):
+        field = classify_header(header)
+        if field == JOB_NO:
+            job_no_positions.append(idx)
+            # 'Job_No' ชนะคอลัมน์ที่คล้ายกัน (เช่น 'Job No.')
+            if JOB_NO not in field_index or header == CANONICAL_HEADERS[JOB_NO]:
+                field_index[JOB_NO] = idx
+            continue
+        if field is not None:
+            field_index.setdefault(field, idx)
+        else:
+            data_columns.append((idx, header))
+        field_index.setdefault(header, idx)
+    return CompiledSchema(headers, field_index, job_no_positions, data_columns)
+
+
+class SchemaDrift:
+    """header ของแหล่งข้อมูลหนึ่งเปลี่ยนไปจากรอบก่อน"""
+
+    def __init__(self, source: str, previous: List[str], current: List[str]):
+        self.source = source
+        self.added = [h for h in current if h not in previous]
+        self.removed = [h for h in previous if h not in current]
+        self.reordered = not self.added and not self.removed and previous != current
+
+    def describe(self) -> str:
+        parts = []
+        if self.added:
+            parts.append(f"added {self.added}")
+        if self.removed:
+            parts.append(f"removed {self.removed}")
+        if self.reordered:
+            parts.append("reordered")
+        return f"{self.source}: " + ", ".join(parts)
+
+
+class SchemaRegistry:
+    """แคช CompiledSchema ตาม signature ของ header (ข้ามรอบผ่านไฟล์ JSON) และจำ header ล่าสุดของแต่ละแหล่ง
+    ใช้ร่วมกันได้หลายเธรด (ขั้น diff และเธรด drain ของ journal)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SCHEMA_REGISTRY_PATH", DEFAULT_REGISTRY_PATH)
+        self._compiled: Dict[str, CompiledSchema] = {}
+        self._sources: Dict[str, str] = {}
+        self.drifts: List[SchemaDrift] = []
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._compiled = {sig: CompiledSchema.from_dict(d) for sig, d in data.get('schemas', {}).items()}
+            self._sources = dict(data.get('sources', {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Could not read schema registry '{self.path}', starting fresh: {e}")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            # เก็บเฉพาะ schema ที่ยังมีแหล่งข้อมูลอ้างถึง
+            live = set(self._sources.values())
+            data = {'sources': self._sources,
+                    'schemas': {sig: s.to_dict() for sig, s in self._compiled.items() if sig in live}}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".schema_registry.")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.error(f"❌ Failed to save schema registry '{self.path}': {e}")
+
+    def take_drifts(self) -> List[SchemaDrift]:
+        """drift ที่สะสมไว้ (แล้วล้างรายการ)"""
+        with self._lock:
+            drifts, self.drifts = self.drifts, []
+            return drifts
+
+    def resolve(self, source: str, headers: Iterable[Any]) -> CompiledSchema:
+        """คืน CompiledSchema ของ header ชุดนี้ และบันทึก drift ถ้าต่างจากครั้งก่อนของ source เดียวกัน"""
+        return self._resolve(source, headers, report_drift=True)
+
+    def accept(self, source: str, headers: Iterable[Any]) -> CompiledSchema:
+        """header ที่โปรแกรมเขียนลงชีตเอง (เช่นต่อท้ายคอลัมน์ใหม่): จำเป็น header ล่าสุดของ source โดยไม่นับเป็น drift"""
+        return self._resolve(source, headers, report_drift=False)
+
+    def _resolve(self, source: str, headers: Iterable[Any], report_drift: bool) -> CompiledSchema:
+        headers = [str(h).strip() for h in headers]
+        with self._lock:
+            return self._resolve_locked(source, headers, report_drift)
+
+    def _resolve_locked(self, source: str, headers: List[str], report_drift: bool) -> CompiledSchema:
+        signature = headers_signature(headers)
+        schema = self._compiled.get(signature)
+        if schema is None:
+            schema = compile_schema(headers)
+            self._compiled[signature] = schema
+            self._dirty = True
+
+        previous_sig = self._sources.get(source)
+        if previous_sig != signature:
+            previous = self._compiled.get(previous_sig)
+            if previous is not None and report_drift:
+                drift = SchemaDrift(source, previous.headers, headers)
+                self.drifts.append(drift)
+                logger.warning(f"⚠️ Header drift detected in {drift.describe()}")
+            self._sources[source] = signature
+            self._dirty = True
+        return schema
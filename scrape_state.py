@@ -0,0 +1,47 @@
+# scrape_state.py
+# สถานะต่อแท็บที่ต้องจำข้ามรอบการซิงค์ (เช่น เวลาที่ scan เต็มแท็บครั้งล่าสุด)
+
+import os
+import json
+import tempfile
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "scrape_state.json"
+
+
+class ScrapeState:
+    """เก็บสถานะต่อแท็บเป็นไฟล์ JSON เขียนแบบ atomic (tmp + rename)"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("SCRAPE_STATE_PATH", DEFAULT_STATE_PATH)
+        self._data: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read scrape state '{self.path}', starting fresh: {e}")
+            return {}
+
+    def get(self, tab: int) -> Dict[str, Any]:
+        return dict(self._data.get(str(tab), {}))
+
+    def update(self, tab: int, **fields: Any):
+        self._data.setdefault(str(tab), {}).update(fields)
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".scrape_state.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"❌ Failed to save scrape state '{self.path}': {e}")
@@ -0,0 +1,355 @@
+# search_index.py
+# ดัชนีค้นหาข้อความเต็มของ Master_Data (inverted index แบบ character trigram ใช้กับภาษาไทยที่ไม่เว้นวรรคได้)
+# ฝั่งซิงค์เขียนเฉพาะงานใหม่/งานที่ย้ายแท็บลงตาราง search_docs (seq เพิ่มทีละ 1)
+# ฝั่งเว็บโหลด snapshot ที่บีบอัดไว้ครั้งเดียว แล้วตามเก็บเฉพาะแถวที่ seq ใหม่กว่า index ในหน่วยความจำ
+#
+# วิธีใช้: python search_index.py rebuild        # สร้างใหม่ทั้งหมดจาก Master_Data
+#         python search_index.py search <คำค้น>
+
+import os
+import sys
+import json
+import time
+import zlib
+import heapq
+import struct
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "search.db"
+GRAM = 3
+# field ที่ไม่ใช้ค้นหา: Last_Updated เปลี่ยนทุกรอบ ถ้าเก็บไว้ทุกงานจะถูกเขียนใหม่ทุกครั้ง
+SKIP_FIELDS = ('Last_Updated',)
+# field ที่ไม่ทำ index (ยังคืนค่าในผลลัพธ์)
+UNINDEXED_FIELDS = ('First_Seen',)
+JOB_NO_WEIGHT = 4.0
+FIELD_SEP = "\x1f"
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+
+
+def normalize(text: Any) -> str:
+    """NFKC + casefold + ตัดอักขระความกว้างศูนย์ (พบบ่อยในข้อความไทยที่คัดลอกมา) + ยุบช่องว่าง"""
+    text = unicodedata.normalize('NFKC', str(text)).casefold().translate(_ZERO_WIDTH)
+    return " ".join(text.split())
+
+
+def trigrams(value: str) -> set:
+    return {value[i:i + GRAM] for i in range(len(value) - GRAM + 1)}
+
+
+def _doc_fields(record: Dict[str, Any]) -> Dict[str, str]:
+    return {str(k): str(v).strip() for k, v in record.items()
+            if k not in SKIP_FIELDS and str(v).strip()}
+
+
+def _doc_text(fields: Dict[str, str]) -> str:
+    """ค่าที่ normalize แล้วของ field ที่ทำ index ต่อกันด้วย FIELD_SEP โดย Job_No อยู่ก่อนเสมอ"""
+    names = sorted((name for name in fields if name not in UNINDEXED_FIELDS), key=lambda name: name != 'Job_No')
+    return FIELD_SEP.join(normalize(fields[name]) for name in names)
+
+
+class _Postings:
+    """เอกสาร + posting list ในหน่วยความจำ (doc id = ตำแหน่งใน list เพิ่มขึ้นเรื่อย ๆ posting จึงเรียงอยู่แล้ว)
+    เอกสารที่ถูกแทนที่จะเหลือเป็น None (tombstone) จนกว่าจะโหลดใหม่
+    field ของเอกสารเก็บเป็น JSON string และ decode เฉพาะผลลัพธ์ที่คืน เพื่อประหยัดหน่วยความจำ"""
+
+    def __init__(self):
+        self.job_nos: List[Optional[str]] = []
+        self.texts: List[Optional[str]] = []
+        self.raw: List[Optional[str]] = []
+        self.doc_of: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+        self.live = 0
+
+    def add(self, job_no: str, raw: Optional[str], text: Optional[str] = None, index_grams: bool = True):
+        old = self.doc_of.pop(job_no, None)
+        if old is not None:
+            self.job_nos[old] = self.texts[old] = self.raw[old] = None
+            self.live -= 1
+        if raw is None:
+            return
+        if text is None:
+            text = _doc_text(json.loads(raw))
+        doc = len(self.job_nos)
+        self.job_nos.append(job_no)
+        self.texts.append(text)
+        self.raw.append(raw)
+        self.doc_of[job_no] = doc
+        self.live += 1
+        if index_grams:
+            # gram ที่คร่อม FIELD_SEP ไม่มีทางตรงกับคำค้น (normalize ตัดอักขระควบคุมออกเป็นช่องว่าง) จึงไม่ต้องแยก field
+            for gram in trigrams(text):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array('I')
+                posting.append(doc)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self.job_nos) - self.live
+
+    def pack(self, seq: int, generation: int) -> bytes:
+        """snapshot: header JSON (เอกสาร + รายการ gram) ตามด้วย posting ทั้งหมดเป็น uint32 ต่อกัน บีบอัดด้วย zlib"""
+        grams = list(self.postings)
+        header = json.dumps({'seq': seq, 'generation': generation,
+                             'docs': list(zip(self.job_nos, self.raw, self.texts)),
+                             'grams': grams, 'sizes': [len(self.postings[g]) for g in grams]},
+                            ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        body = b"".join(self.postings[g].tobytes() for g in grams)
+        return zlib.compress(struct.pack('<I', len(header)) + header + body, 1)
+
+    @classmethod
+    def unpack(cls, blob: bytes) -> Tuple['_Postings', int, int]:
+        data = memoryview(zlib.decompress(blob))
+        (header_len,) = struct.unpack_from('<I', data)
+        header = json.loads(bytes(data[4:4 + header_len]).decode('utf-8'))
+        index = cls()
+        for job_no, raw, text in header['docs']:
+            index.add(job_no, raw, text, index_grams=False)
+        offset = 4 + header_len
+        for gram, size in zip(header['grams'], header['sizes']):
+            posting = array('I')
+            posting.frombytes(data[offset:offset + size * posting.itemsize])
+            index.postings[gram] = posting
+            offset += size * posting.itemsize
+        return index, header['seq'], header['generation']
+
+
+class SearchIndex:
+    """ดัชนีค้นหาที่เก็บใน SQLite ใช้ได้ทั้งฝั่งซิงค์ (apply_changes/snapshot) และฝั่งเว็บ (search)"""
+
+    def __init__(self, db_path: Optional[str] = None, snapshot_every: Optional[int] = None):
+        self.db_path = db_path or os.getenv("SEARCH_DB_PATH", DEFAULT_DB_PATH)
+        self.snapshot_every = (snapshot_every if snapshot_every is not None
+                               else int(os.getenv("SEARCH_SNAPSHOT_EVERY", "2000")))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._index: Optional[_Postings] = None
+        self._seq = 0
+        self._generation = 0
+        self._init_schema()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_docs (
+                job_no TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                fields TEXT NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_search_docs_seq ON search_docs(seq)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL DEFAULT 0,
+                generation INTEGER NOT NULL DEFAULT 0,
+                snapshot_seq INTEGER NOT NULL DEFAULT 0,
+                snapshot BLOB
+            )""")
+        self.conn.execute("INSERT OR IGNORE INTO search_meta (id) VALUES (1)")
+
+    # --------------------------------------------------------------------------
+    # Write side (sync)
+    # --------------------------------------------------------------------------
+
+    def apply_changes(self, new_records: Iterable[Dict[str, Any]], moves: Iterable[Tuple]) -> int:
+        """เพิ่มงานใหม่ (record เต็มของ Master_Data) และเปลี่ยน Source_Tab ของงานที่ย้ายแท็บ
+        (moves: (job_no, from_tab, to_tab, ts) แบบเดียวกับ stats) คืนจำนวนเอกสารที่เปลี่ยน"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT seq FROM search_meta WHERE id = 1").fetchone()[0]
+            changed = 0
+            for record in new_records:
+                fields = _doc_fields(record)
+                if not fields.get('Job_No'):
+                    continue
+                seq += 1
+                conn.execute("INSERT OR REPLACE INTO search_docs (job_no, seq, fields) VALUES (?, ?, ?)",
+                             (fields['Job_No'], seq, json.dumps(fields, ensure_ascii=False)))
+                changed += 1
+            for job_no, _, to_tab, *_ in moves:
+                row = conn.execute("SELECT fields FROM search_docs WHERE job_no = ?", (job_no,)).fetchone()
+                if row is None:
+                    continue  # งานที่ยังไม่เคยทำ index (ยังไม่ได้ rebuild)
+                fields = json.loads(row[0])
+                fields['Source_Tab'] = to_tab
+                seq += 1
+                conn.execute("UPDATE search_docs SET seq = ?, fields = ? WHERE job_no = ?",
+                             (seq, json.dumps(fields, ensure_ascii=False), job_no))
+                changed += 1
+            conn.execute("UPDATE search_meta SET seq = ? WHERE id = 1", (seq,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if changed:
+            logger.info(f"🔎 Search index: {changed} documents added/updated")
+        return changed
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> int:
+        """ทำ index ใหม่ทั้งหมดจากแถวของ Master_Data แล้วบันทึก snapshot (ฝั่งเว็บจะโหลดใหม่ทั้งชุด)"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM search_docs")
+            seq = conn.execute("SELECT seq FROM search_meta WHERE id = 1").fetchone()[0]
+            count = 0
+            for record in records:
+                fields = _doc_fields(record)
+                if not fields.get('Job_No'):
+                    continue
+                seq += 1
+                conn.execute("INSERT OR REPLACE INTO search_docs (job_no, seq, fields) VALUES (?, ?, ?)",
+                             (fields['Job_No'], seq, json.dumps(fields, ensure_ascii=False)))
+                count += 1
+            conn.execute("UPDATE search_meta SET seq = ?, generation = generation + 1, snapshot_seq = 0, "
+                         "snapshot = NULL WHERE id = 1", (seq,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"🔎 Rebuilt search index from {count} Master_Data rows")
+        self.snapshot(force=True)
+        return count
+
+    def snapshot(self, force: bool = False) -> bool:
+        """บันทึก snapshot ใหม่เมื่อมีเอกสารเปลี่ยนตั้งแต่ snapshot ล่าสุดเกิน snapshot_every (เรียกจากฝั่งซิงค์)
+        ฝั่งเว็บจะได้โหลด snapshot เดียวแทนการ tokenize เอกสารทั้งหมดใหม่"""
+        seq, generation, snapshot_seq = self.conn.execute(
+            "SELECT seq, generation, snapshot_seq FROM search_meta WHERE id = 1").fetchone()
+        if not force and seq - snapshot_seq < max(self.snapshot_every, 1):
+            return False
+        started = time.perf_counter()
+        index = _Postings()
+        for job_no, fields in self.conn.execute("SELECT job_no, fields FROM search_docs WHERE seq <= ? ORDER BY seq",
+                                                (seq,)):
+            index.add(job_no, fields)
+        blob = index.pack(seq, generation)
+        self.conn.execute("UPDATE search_meta SET snapshot_seq = ?, snapshot = ? "
+                          "WHERE id = 1 AND generation = ? AND snapshot_seq < ?",
+                          (seq, blob, generation, seq))
+        logger.info(f"🔎 Search index snapshot saved: {index.live} documents, {len(index.postings)} grams, "
+                    f"{len(blob) / 1024 / 1024:.1f}MB in {time.perf_counter() - started:.1f}s")
+        return True
+
+    # --------------------------------------------------------------------------
+    # Read side (web)
+    # --------------------------------------------------------------------------
+
+    def _load(self):
+        row = self.conn.execute("SELECT snapshot FROM search_meta WHERE id = 1").fetchone()
+        if row[0] is not None:
+            self._index, self._seq, self._generation = _Postings.unpack(row[0])
+        else:
+            self._index, self._seq = _Postings(), 0
+            self._generation = self.conn.execute("SELECT generation FROM search_meta WHERE id = 1").fetchone()[0]
+
+    def refresh(self):
+        """ตามเก็บเอกสารที่เปลี่ยนหลัง seq ที่โหลดไว้ (rebuild หรือ tombstone มากเกินไป = โหลดใหม่ทั้งชุด)"""
+        with self._lock:
+            seq, generation = self.conn.execute("SELECT seq, generation FROM search_meta WHERE id = 1").fetchone()
+            index = self._index
+            if index is None or generation != self._generation or index.tombstones > max(index.live, 1000):
+                self._load()
+            elif seq == self._seq:
+                return
+            for job_no, doc_seq, fields in self.conn.execute(
+                    "SELECT job_no, seq, fields FROM search_docs WHERE seq > ? ORDER BY seq", (self._seq,)):
+                self._index.add(job_no, fields)
+                self._seq = doc_seq
+
+    def search(self, query: str, limit: int = 20) -> Dict[str, Any]:
+        """ค้นหางานที่มีทุกคำใน query (คำคั่นด้วยช่องว่าง) เรียงตามคะแนน: field ที่ตรง, ตรงต้นคำ, งานใหม่กว่า"""
+        started = time.perf_counter()
+        self.refresh()
+        terms = list(dict.fromkeys(normalize(query).split()))
+        with self._lock:
+            index = self._index
+            matches = self._match(index, terms) if terms else []
+            top = heapq.nlargest(max(limit, 0), ((self._score(index, doc, terms), doc) for doc in matches))
+            results = [{'job_no': index.job_nos[doc], 'score': round(score, 2), 'fields': json.loads(index.raw[doc])}
+                       for score, doc in top]
+            indexed = index.live
+        return {'query': query, 'total': len(matches), 'indexed': indexed,
+                'took_ms': round((time.perf_counter() - started) * 1000, 2), 'results': results}
+
+    @staticmethod
+    def _match(index: _Postings, terms: List[str]) -> List[int]:
+        candidates: Optional[set] = None
+        for term in terms:
+            grams = trigrams(term)
+            if not grams:
+                continue  # คำสั้นกว่า 3 ตัวอักษร: ตรวจด้วย substring อย่างเดียว
+            for posting in sorted((index.postings.get(g, ()) for g in grams), key=len):
+                candidates = set(posting) if candidates is None else candidates.intersection(posting)
+                if not candidates:
+                    return []
+        docs = range(len(index.texts)) if candidates is None else candidates
+        texts = index.texts
+        # trigram ครบไม่ได้แปลว่ามีคำนั้นจริง (อาจอยู่คนละตำแหน่ง/คนละ field): ยืนยันด้วย substring
+        return [doc for doc in docs if texts[doc] is not None and all(term in texts[doc] for term in terms)]
+
+    @staticmethod
+    def _score(index: _Postings, doc: int, terms: List[str]) -> float:
+        """คะแนนจากตำแหน่งแรกที่พบแต่ละคำ: ตรงทั้ง field > ต้น field > ต้นคำ > กลางคำ (Job_No คูณ JOB_NO_WEIGHT)"""
+        text = index.texts[doc]
+        score = 0.0
+        for term in terms:
+            pos = text.find(term)
+            end = pos + len(term)
+            field_start = pos == 0 or text[pos - 1] == FIELD_SEP
+            if field_start and (end == len(text) or text[end] == FIELD_SEP):
+                hit = 3.0
+            elif field_start:
+                hit = 2.0
+            elif not text[pos - 1].isalnum():
+                hit = 1.5
+            else:
+                hit = 1.0
+            if FIELD_SEP not in text[:pos]:
+                hit *= JOB_NO_WEIGHT
+            score += hit
+        # คะแนนเท่ากัน: เอกสารที่เพิ่ม/เปลี่ยนล่าสุดมาก่อน
+        return score + doc * 1e-9
+
+    def close(self):
+        self.conn.close()
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def main(argv: List[str]) -> int:
+    command = argv[0] if argv else ''
+    index = SearchIndex()
+    if command == 'rebuild':
+        from main_master_only import Config, GoogleSheetManager
+        sheet_manager = GoogleSheetManager(Config.GOOGLE_SHEET_ID, Config.GOOGLE_SVC_JSON_RAW, Config.GOOGLE_SVC_JSON_B64)
+        ws = sheet_manager.get_or_create_worksheet(Config.MASTER_SHEET_NAME)
+        index.rebuild(ws.get_all_records())
+        return 0
+    if command == 'search' and len(argv) > 1:
+        print(json.dumps(index.search(" ".join(argv[1:])), ensure_ascii=False, indent=2))
+        return 0
+    print("usage: python search_index.py [rebuild|search <query>]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -14,14 +14,17 @@ import os
 import time
 import logging
 
+from lean_browser import apply_lean_options, enable_request_blocking
+
 logger = logging.getLogger(__name__)
 
 class SeleniumBrowser:
     """Selenium browser wrapper to mimic Playwright API"""
     
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, lean=False):
         self.driver = None
         self.headless = headless
+        self.lean = lean
         
     def __enter__(self):
         self.driver = self._create_driver()
@@ -43,8 +46,11 @@ class SeleniumBrowser:
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--disable-web-security')
-        chrome_options.add_argument('--disable-features=VizDisplayCompositor')
-        chrome_options.add_argument('--window-size=1920,1080')
+        if self.lean:
+            apply_lean_options(chrome_options)
+        else:
+            chrome_options.add_argument('--disable-features=VizDisplayCompositor')
+            chrome_options.add_argument('--window-size=1920,1080')
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -64,6 +70,9 @@ class SeleniumBrowser:
             # Remove automation indicators
             driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
+            if self.lean:
+                enable_request_blocking(driver)
+            
             # Set timeouts
             driver.set_page_load_timeout(30)
             driver.implicitly_wait(10)
@@ -195,6 +204,6 @@ def sync_selenium():
 class SeleniumBrowserLauncher:
     """Browser launcher similar to playwright.chromium"""
     
-    def launch(self, headless=True, **kwargs):
+    def launch(self, headless=True, lean=False, **kwargs):
         """Launch browser"""
-        return SeleniumBrowser(headless=headless)
+        return SeleniumBrowser(headless=headless, lean=lean)
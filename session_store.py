@@ -0,0 +1,194 @@
+# session_store.py
+# เก็บ cookie ของ session edoclite ที่ login แล้วแบบเข้ารหัสบนดิสก์ เพื่อใช้ซ้ำข้ามรอบการซิงค์
+# ก่อนใช้ตรวจว่ายังใช้ได้ด้วย request เดียว (ไม่เปิดหน้า login) ถ้าหมดอายุจึง login ด้วยฟอร์มใหม่
+# อายุ session ที่สังเกตได้ (จาก login ถึงครั้งสุดท้ายที่ยังใช้ได้) ถูกบันทึกไว้ด้วย
+#
+# วิธีใช้: python session_store.py status
+#         python session_store.py clear
+
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import requests
+import logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cryptography เป็น optional: ไม่มีก็ login ด้วยฟอร์มทุกรอบแบบเดิม
+    Fernet = InvalidToken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_PATH = "edoclite_session.bin"
+# salt คงที่ของการสร้าง key จาก username/password (เปลี่ยนรหัสผ่าน = session เดิมอ่านไม่ได้และ login ใหม่)
+KEY_SALT = b"edoclite-session-v1"
+KEY_ITERATIONS = 200_000
+
+
+def session_reuse_enabled() -> bool:
+    return os.getenv("SESSION_REUSE", "1").strip().lower() in ("1", "true", "yes")
+
+
+def _derive_key(user: str, password: str) -> bytes:
+    """key ของ Fernet จาก SESSION_KEY (ข้อความใดก็ได้) หรือจาก username/password ถ้าไม่ได้ตั้ง"""
+    secret = os.getenv("SESSION_KEY", "").strip() or f"{user}\0{password}"
+    raw = hashlib.pbkdf2_hmac('sha256', secret.encode('utf-8'), KEY_SALT, KEY_ITERATIONS)
+    return base64.urlsafe_b64encode(raw)
+
+
+class SessionStore:
+    """cookie ของ session หนึ่งชุด (ไฟล์เดียว เข้ารหัสด้วย Fernet สิทธิ์ 0600 เขียนแบบ atomic)"""
+
+    def __init__(self, user: str, password: str, check_url: str, path: Optional[str] = None):
+        self.path = path or os.getenv("SESSION_STORE_PATH", DEFAULT_SESSION_PATH)
+        self.check_url = check_url
+        self._fernet = Fernet(_derive_key(user, password)) if Fernet is not None else None
+        if self._fernet is None:
+            logger.warning("⚠️ 'cryptography' is not installed; login sessions are not persisted between runs.")
+
+    @property
+    def available(self) -> bool:
+        return self._fernet is not None
+
+    # --------------------------------------------------------------------------
+    # File
+    # --------------------------------------------------------------------------
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not self.available:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                return json.loads(self._fernet.decrypt(f.read()))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, OSError, ValueError) as e:
+            # key เปลี่ยน (รหัสผ่าน/SESSION_KEY ใหม่) หรือไฟล์เสีย: ทิ้งแล้ว login ใหม่
+            logger.warning(f"⚠️ Could not read saved session '{self.path}', logging in again: {e}")
+            self.clear()
+            return None
+
+    def _write(self, state: Dict[str, Any]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".session.")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._fernet.encrypt(json.dumps(state).encode('utf-8')))
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"❌ Failed to save login session '{self.path}': {e}")
+
+    def save(self, cookies: List[Dict[str, Any]]):
+        """เก็บ cookie หลัง login ด้วยฟอร์มสำเร็จ (อายุที่สังเกตได้ของ session ก่อนหน้ายังเก็บไว้)"""
+        if not self.available or not cookies:
+            return
+        previous = self.load() or {}
+        now = time.time()
+        self._write({'cookies': cookies, 'saved_at': now, 'last_valid_at': now,
+                     'observed_lifetime': previous.get('observed_lifetime')})
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    # --------------------------------------------------------------------------
+    # Validity
+    # --------------------------------------------------------------------------
+
+    @staticmethod
+    def _expired_by_cookie(cookies: List[Dict[str, Any]], now: float) -> bool:
+        """cookie ที่ server กำหนดวันหมดอายุไว้ หมดอายุแล้วทั้งหมด (ไม่ต้องเสีย request ตรวจ)"""
+        expiries = [c['expiry'] for c in cookies if c.get('expiry')]
+        return bool(expiries) and len(expiries) == len(cookies) and max(expiries) <= now
+
+    def requests_session(self, cookies: List[Dict[str, Any]]) -> requests.Session:
+        """HTTP session ที่มี cookie ของ edoclite (ใช้ตรวจ session หรือดึงข้อมูลโดยไม่ต้องเปิด browser)"""
+        session = requests.Session()
+        for c in cookies:
+            session.cookies.set(c['name'], c['value'], domain=c.get('domain'), path=c.get('path', '/'))
+        return session
+
+    def is_valid(self, cookies: List[Dict[str, Any]]) -> bool:
+        """GET หน้า index หนึ่งครั้ง (ไม่โหลด body): ถูก redirect ไปหน้า login = session หมดอายุ"""
+        try:
+            with self.requests_session(cookies) as session:
+                response = session.get(self.check_url, timeout=10, stream=True)
+                response.close()
+        except requests.RequestException as e:
+            logger.warning(f"⚠️ Could not check saved session: {e}")
+            return False
+        return response.status_code < 400 and 'login' not in response.url.lower()
+
+    def restore(self, driver) -> bool:
+        """ใส่ cookie ที่ยังใช้ได้ลงใน driver ใหม่ คืน False ถ้าไม่มี session ที่ใช้ได้ (ให้ login ด้วยฟอร์ม)"""
+        state = self.load()
+        if not state or not state['cookies']:
+            return False
+        now = time.time()
+        cookies = state['cookies']
+        if self._expired_by_cookie(cookies, now) or not self.is_valid(cookies):
+            lifetime = state['last_valid_at'] - state['saved_at']
+            logger.info(f"🔑 Saved login session expired (observed lifetime ≥ {lifetime / 60:.0f} min)")
+            self._write(dict(state, cookies=[], observed_lifetime=lifetime))
+            return False
+        # ใส่ cookie ผ่าน CDP: ไม่ต้องเปิดหน้าใน domain ก่อนเหมือน driver.add_cookie
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setCookies", {'cookies': [self._cdp_cookie(c) for c in cookies]})
+        self._write(dict(state, last_valid_at=now))
+        logger.info(f"🔑 Reusing saved login session (age {(now - state['saved_at']) / 60:.0f} min)")
+        return True
+
+    @staticmethod
+    def _cdp_cookie(cookie: Dict[str, Any]) -> Dict[str, Any]:
+        converted = {k: cookie[k] for k in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly') if k in cookie}
+        if cookie.get('expiry'):
+            converted['expires'] = cookie['expiry']
+        if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+            converted['sameSite'] = cookie['sameSite']
+        return converted
+
+    def status(self) -> Dict[str, Any]:
+        state = self.load()
+        if not state:
+            return {'saved': False}
+        now = time.time()
+        return {
+            'saved': bool(state['cookies']),
+            'age_minutes': round((now - state['saved_at']) / 60, 1),
+            'last_valid_minutes_ago': round((now - state['last_valid_at']) / 60, 1),
+            'observed_lifetime_minutes': (round(state['observed_lifetime'] / 60, 1)
+                                          if state.get('observed_lifetime') is not None else None),
+        }
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def main(argv: List[str]) -> int:
+    from sync_config import Config
+
+    command = argv[0] if argv else 'status'
+    store = SessionStore(Config.EDOCLITE_USER, Config.EDOCLITE_PASS, Config.INDEX_URL)
+    if command == 'clear':
+        store.clear()
+        print("🔑 Saved login session removed")
+        return 0
+    if command != 'status':
+        print("usage: python session_store.py [status|clear]")
+        return 2
+    print(json.dumps(store.status(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,297 @@
+# shard_coordinator.py
+# แบ่งแท็บของการซิงค์ให้หลาย scraper node ช่วยกัน ผ่านตาราง lease ใน SQLite ที่ทุก node เข้าถึงได้
+# แต่ละ node จองแท็บ (shard) พร้อม TTL และต่ออายุระหว่าง scrape แล้วส่ง frame ที่ได้ให้ writer
+# ซึ่งมีได้ทีละหนึ่ง node (writer lease) การเขียนลง Google Sheets จึงยังเป็นลำดับเดียว
+# lease ที่หมดอายุ (node ตายกลางทาง) ถูก node อื่นจองต่ออัตโนมัติ
+#
+# วิธีใช้: python shard_coordinator.py status
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import threading
+import contextlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import logging
+
+from sync_checkpoint import pack_frame, unpack_frame
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "shards.db"
+DEFAULT_LEASE_TTL = 120  # วินาที
+ACTIVE_STATES = ('pending', 'leased')  # แท็บที่ยังต้อง scrape
+# pending -> leased -> scraped -> written   (failed = ลองครบ max_attempts แล้ว)
+
+
+class ShardCoordinator:
+    """ตาราง lease ของแท็บในรอบการซิงค์ปัจจุบัน และ writer lease ของรอบนั้น"""
+
+    def __init__(self, db_path: Optional[str] = None, node_id: Optional[str] = None,
+                 lease_ttl: Optional[float] = None, max_attempts: int = 3,
+                 max_age_minutes: Optional[float] = None):
+        self.db_path = db_path or os.getenv("SHARD_DB_PATH", DEFAULT_DB_PATH)
+        self.node_id = node_id or os.getenv("SHARD_NODE_ID", "").strip() or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_ttl = lease_ttl or float(os.getenv("SHARD_LEASE_TTL", DEFAULT_LEASE_TTL))
+        # แต่ละครั้งที่จองแท็บ (รวมการจองต่อจาก node ที่ตาย) นับเป็นหนึ่งครั้ง
+        self.max_attempts = max(max_attempts, 1)
+        # รอบที่เปิดค้างนานกว่านี้ถูกทิ้งแล้วเริ่มรอบใหม่
+        self.max_age = (max_age_minutes if max_age_minutes is not None
+                        else float(os.getenv("SHARD_ROUND_MAX_AGE_MINUTES", "120"))) * 60
+        self.round_id: Optional[str] = None
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE: จอง write lock ก่อนอ่าน เพื่อไม่ให้สอง node จองแท็บเดียวกัน"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shard_round (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                round_id TEXT,
+                tabs TEXT NOT NULL DEFAULT '[]',
+                started_at REAL NOT NULL DEFAULT 0,
+                closed INTEGER NOT NULL DEFAULT 1,
+                writer TEXT,
+                writer_expires REAL NOT NULL DEFAULT 0
+            )""")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shard_tabs (
+                tab INTEGER PRIMARY KEY,
+                position INTEGER NOT NULL,
+                round_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                owner TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                scan_mode TEXT,
+                row_count INTEGER,
+                payload BLOB,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )""")
+        conn.execute("INSERT OR IGNORE INTO shard_round (id) VALUES (1)")
+
+    # --------------------------------------------------------------------------
+    # Round lifecycle
+    # --------------------------------------------------------------------------
+
+    def open_round(self, tabs: List[int]) -> bool:
+        """เข้าร่วมรอบที่ยังเปิดอยู่ หรือเริ่มรอบใหม่ถ้ารอบก่อนปิดแล้ว/เก่าเกิน/ชุดแท็บเปลี่ยน
+        คืน True ถ้าเป็นการเข้าร่วมรอบที่มีอยู่แล้ว"""
+        now = time.time()
+        with self._transaction() as conn:
+            round_id, round_tabs, started_at, closed = conn.execute(
+                "SELECT round_id, tabs, started_at, closed FROM shard_round WHERE id = 1").fetchone()
+            if not closed and started_at >= now - self.max_age and json.loads(round_tabs) == list(tabs):
+                self.round_id = round_id
+                return True
+            if not closed:
+                logger.warning(f"⚠️ Discarding unfinished shard round {round_id}")
+            self.round_id = f"{int(now * 1000):x}"
+            conn.execute("DELETE FROM shard_tabs")
+            conn.executemany(
+                "INSERT INTO shard_tabs (tab, position, round_id, state, updated_at) VALUES (?, ?, ?, 'pending', ?)",
+                [(tab, position, self.round_id, now) for position, tab in enumerate(tabs)])
+            conn.execute("UPDATE shard_round SET round_id = ?, tabs = ?, started_at = ?, closed = 0, "
+                         "writer = NULL, writer_expires = 0 WHERE id = 1",
+                         (self.round_id, json.dumps(list(tabs)), now))
+            return False
+
+    def close_round(self):
+        """writer เขียนครบทุกแท็บแล้ว: ปิดรอบและปล่อย writer lease"""
+        self._connect().execute(
+            "UPDATE shard_round SET closed = 1, writer = NULL, writer_expires = 0 WHERE id = 1 AND round_id = ?",
+            (self.round_id,))
+
+    def counts(self) -> Dict[str, int]:
+        """จำนวนแท็บในแต่ละ state ของรอบนี้ และ 'live' = lease ที่ยังไม่หมดอายุ"""
+        conn = self._connect()
+        counts = {state: count for state, count in conn.execute(
+            "SELECT state, COUNT(*) FROM shard_tabs WHERE round_id = ? GROUP BY state", (self.round_id,))}
+        counts['live'] = conn.execute(
+            "SELECT COUNT(*) FROM shard_tabs WHERE round_id = ? AND state = 'leased' AND lease_expires >= ?",
+            (self.round_id, time.time())).fetchone()[0]
+        return counts
+
+    def scraping_settled(self) -> bool:
+        """ไม่มีแท็บที่ยังต้อง scrape แล้ว (ทุกแท็บ scraped/written/failed)"""
+        counts = self.counts()
+        return not any(counts.get(state) for state in ACTIVE_STATES)
+
+    def round_complete(self) -> bool:
+        counts = self.counts()
+        return not any(counts.get(state) for state in ACTIVE_STATES + ('scraped',))
+
+    def unwritten_tabs(self) -> List[int]:
+        """แท็บของรอบที่ยังไม่ถูกเขียนลงชีต (เมื่อรอบเสร็จแล้วคือแท็บที่ failed)"""
+        return [tab for (tab,) in self._connect().execute(
+            "SELECT tab FROM shard_tabs WHERE round_id = ? AND state != 'written' ORDER BY position", (self.round_id,))]
+
+    # --------------------------------------------------------------------------
+    # Tab leases (scraper side)
+    # --------------------------------------------------------------------------
+
+    def claim(self) -> Optional[int]:
+        """จองแท็บถัดไปที่ยังไม่มีใคร scrape หรือ lease หมดอายุแล้ว คืน None ถ้าไม่มีแท็บให้จอง
+        แท็บที่ลองน้อยครั้งกว่ามาก่อน แท็บที่เพิ่งล้มเหลวจึงถูกลองใหม่หลังแท็บอื่น"""
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute("""
+                    SELECT tab, state, owner, attempts FROM shard_tabs
+                    WHERE round_id = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+                    ORDER BY attempts, position LIMIT 1""", (self.round_id, now)).fetchone()
+                if row is None:
+                    return None
+                tab, state, owner, attempts = row
+                if state == 'leased':
+                    logger.warning(f"♻️ Reclaiming tab {tab} from expired lease of {owner}", extra={'tab': tab})
+                if attempts >= self.max_attempts:
+                    conn.execute("UPDATE shard_tabs SET state = 'failed', owner = NULL, updated_at = ? WHERE tab = ?",
+                                 (now, tab))
+                    logger.error(f"❌ Tab {tab} failed after {attempts} attempts", extra={'tab': tab})
+                    continue
+                conn.execute("""
+                    UPDATE shard_tabs SET state = 'leased', owner = ?, lease_expires = ?,
+                        attempts = attempts + 1, updated_at = ?
+                    WHERE tab = ?""", (self.node_id, now + self.lease_ttl, now, tab))
+                return tab
+
+    def submit(self, tab: int, df: pd.DataFrame, scan_mode: Optional[str]) -> bool:
+        """ส่ง frame ของแท็บที่ scrape สำเร็จให้ writer คืน False ถ้า lease ถูก node อื่นจองไปแล้ว"""
+        cur = self._connect().execute("""
+            UPDATE shard_tabs SET state = 'scraped', scan_mode = ?, row_count = ?, payload = ?,
+                error = NULL, updated_at = ?
+            WHERE tab = ? AND round_id = ? AND state = 'leased' AND owner = ?""",
+            (scan_mode, len(df), pack_frame(df), time.time(), tab, self.round_id, self.node_id))
+        if cur.rowcount != 1:
+            logger.warning(f"⚠️ Lost lease on tab {tab} before submitting; result dropped", extra={'tab': tab})
+            return False
+        return True
+
+    def release(self, tab: int, error: str):
+        """scrape ไม่สำเร็จ: คืนแท็บให้ node ใดก็ได้จองใหม่ (นับ attempt ไปแล้วตอนจอง)"""
+        self._connect().execute("""
+            UPDATE shard_tabs SET state = 'pending', owner = NULL, lease_expires = 0, error = ?, updated_at = ?
+            WHERE tab = ? AND round_id = ? AND state = 'leased' AND owner = ?""",
+            (error, time.time(), tab, self.round_id, self.node_id))
+
+    def renew(self) -> bool:
+        """ต่ออายุ lease ทุกแท็บและ writer lease ของ node นี้ คืน False ถ้า writer lease หลุดไปแล้ว"""
+        expires = time.time() + self.lease_ttl
+        conn = self._connect()
+        conn.execute("UPDATE shard_tabs SET lease_expires = ? WHERE round_id = ? AND state = 'leased' AND owner = ?",
+                     (expires, self.round_id, self.node_id))
+        cur = conn.execute("UPDATE shard_round SET writer_expires = ? WHERE id = 1 AND writer = ?",
+                           (expires, self.node_id))
+        return cur.rowcount == 1
+
+    @contextlib.contextmanager
+    def keeping_leases(self) -> Iterator[None]:
+        """ต่ออายุ lease ในเธรดแยกทุก lease_ttl/3 วินาทีตลอดช่วงที่อยู่ใน block"""
+        stop = threading.Event()
+
+        def keep():
+            while not stop.wait(self.lease_ttl / 3):
+                try:
+                    self.renew()
+                except Exception as e:
+                    logger.error(f"❌ Failed to renew shard leases: {e}")
+
+        keeper = threading.Thread(target=keep, name="shard-lease", daemon=True)
+        keeper.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            keeper.join()
+
+    # --------------------------------------------------------------------------
+    # Writer lease (single writer per round)
+    # --------------------------------------------------------------------------
+
+    def try_acquire_writer(self) -> bool:
+        """เป็น writer ของรอบนี้ถ้ายังไม่มี หรือ writer เดิมหมดอายุ (node ตาย)"""
+        now = time.time()
+        cur = self._connect().execute("""
+            UPDATE shard_round SET writer = ?, writer_expires = ?
+            WHERE id = 1 AND round_id = ? AND closed = 0
+                AND (writer IS NULL OR writer = ? OR writer_expires < ?)""",
+            (self.node_id, now + self.lease_ttl, self.round_id, self.node_id, now))
+        return cur.rowcount == 1
+
+    def holds_writer(self) -> bool:
+        row = self._connect().execute("SELECT writer, writer_expires FROM shard_round WHERE id = 1").fetchone()
+        return row[0] == self.node_id and row[1] >= time.time()
+
+    def next_result(self, exclude: Iterable[int] = ()) -> Optional[Tuple[int, pd.DataFrame, Optional[str]]]:
+        """แท็บถัดไปที่ scrape แล้วแต่ยังไม่เขียน (ตามลำดับใน TABS_TO_SCRAPE) ยกเว้นแท็บใน exclude"""
+        exclude = list(exclude)
+        row = self._connect().execute(f"""
+            SELECT tab, payload, scan_mode FROM shard_tabs
+            WHERE round_id = ? AND state = 'scraped' AND tab NOT IN ({','.join('?' * len(exclude))})
+            ORDER BY position LIMIT 1""", [self.round_id] + exclude).fetchone()
+        if row is None:
+            return None
+        return row[0], unpack_frame(row[1]), row[2]
+
+    def mark_written(self, tab: int):
+        self._connect().execute(
+            "UPDATE shard_tabs SET state = 'written', payload = NULL, updated_at = ? "
+            "WHERE tab = ? AND round_id = ? AND state = 'scraped'",
+            (time.time(), tab, self.round_id))
+
+    # --------------------------------------------------------------------------
+    # Status (CLI)
+    # --------------------------------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        conn = self._connect()
+        round_id, started_at, closed, writer, writer_expires = conn.execute(
+            "SELECT round_id, started_at, closed, writer, writer_expires FROM shard_round WHERE id = 1").fetchone()
+        now = time.time()
+        tabs = [{'tab': tab, 'state': state, 'owner': owner, 'attempts': attempts, 'rows': rows, 'error': error,
+                 'lease_left_s': round(expires - now, 1) if state == 'leased' else None}
+                for tab, state, owner, attempts, rows, error, expires in conn.execute(
+                    "SELECT tab, state, owner, attempts, row_count, error, lease_expires FROM shard_tabs "
+                    "ORDER BY position")]
+        return {'round_id': round_id, 'started_at': started_at, 'closed': bool(closed),
+                'writer': writer if writer_expires >= now else None, 'tabs': tabs}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ['status']:
+        print("usage: python shard_coordinator.py status")
+        sys.exit(2)
+    info = ShardCoordinator().status()
+    print(f"🧩 Round {info['round_id']} ({'closed' if info['closed'] else 'open'}), writer: {info['writer'] or '-'}")
+    for t in info['tabs']:
+        lease = f" lease {t['lease_left_s']}s" if t['lease_left_s'] is not None else ""
+        print(f"  tab {t['tab']:>3}  {t['state']:<8} attempts={t['attempts']} owner={t['owner'] or '-'}{lease}"
+              f"{'  error: ' + t['error'] if t['error'] else ''}")
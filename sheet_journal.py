@@ -0,0 +1,212 @@
+# sheet_journal.py
+# write-ahead journal ของการแก้ไข Google Sheets: change set ทุกชุดถูกต่อท้ายไฟล์ JSONL และ fsync ก่อน
+# แล้วเธรด drain ทยอยเขียนลงชีตเป็น batch ใหญ่ (รวมหลายแท็บ) การซิงค์จึงไม่ต้องรอ Sheets ทีละแท็บ
+# ถ้า Sheets ล่มหรือ process ตาย รายการที่ยังไม่ applied จะถูก replay ในรอบถัดไป
+#
+# บรรทัดใน journal:
+#   {"op": "batch", ...}    change set หนึ่งชุด: cells/appends พร้อม seq และ idempotency key (run/Job_No)
+#   {"op": "applied", ...}  seq ที่เขียนลงชีตแล้ว
+#   {"op": "done", ...}     batch ที่เขียนครบและอัปเดต stats/ส่งแจ้งเตือนแล้ว
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = "sheet_journal.jsonl"
+
+
+def cell_key(run: str, job_no: str, col: int) -> str:
+    return f"{run}/{job_no}/cell:{col}"
+
+
+def append_key(run: str, job_no: str) -> str:
+    return f"{run}/{job_no}/append"
+
+
+class SheetJournal:
+    """journal แบบ append-only บนดิสก์ + สถานะในหน่วยความจำของรายการที่ยังไม่ applied
+
+    cell ที่มี key เดียวกัน (run, Job_No, คอลัมน์) และยังไม่ถูกเขียน จะถูกรวมเหลือค่าล่าสุด
+    append ที่มี key ซ้ำ (run, Job_No) ถูกข้าม"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("JOURNAL_PATH", DEFAULT_JOURNAL_PATH)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.cells: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.appends: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.batches: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._load()
+        # รายการที่ค้างจาก process ก่อนอาจเขียนลงชีตไปแล้ว (ตายก่อนบันทึก applied)
+        # และแถวในชีตอาจเลื่อนไป: ต้องตรวจกับชีตจริงก่อน replay
+        self.needs_verify = bool(self.cells or self.appends)
+        if self.pending_count():
+            logger.info(f"♻️ Journal has {len(self.cells)} cell updates and {len(self.appends)} new jobs to replay")
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # บรรทัดสุดท้ายเขียนไม่ครบตอนเครื่องดับ (ยังไม่เคย fsync สำเร็จ): ตัดทิ้งก่อนต่อท้ายรายการใหม่
+            logger.warning(f"⚠️ Dropping torn journal tail ({len(data) - end} bytes)")
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        for line in data[:end].decode('utf-8').splitlines():
+            if line:
+                self._apply(json.loads(line))
+
+    def _apply(self, entry: Dict[str, Any]):
+        op = entry['op']
+        if op == 'batch':
+            self._seq = max(self._seq, entry['seq'])
+            for seq, key, job_no, row, col, value in entry['cells']:
+                self.cells.pop(key, None)  # ค่าใหม่แทนค่าเดิมที่ยังไม่ได้เขียน
+                self.cells[key] = {'seq': seq, 'job': job_no, 'row': row, 'col': col, 'value': value}
+            for seq, key, job_no, record in entry['appends']:
+                if key not in self.appends:
+                    self.appends[key] = {'seq': seq, 'job': job_no, 'record': record}
+            self.batches[entry['id']] = {k: entry[k] for k in ('id', 'run', 'tabs', 'data_headers', 'stats_new_jobs',
+                                                               'stats_moves', 'notifications')}
+        elif op == 'applied':
+            seqs = set(entry['seqs'])
+            for pending in (self.cells, self.appends):
+                for key in [k for k, v in pending.items() if v['seq'] in seqs]:
+                    del pending[key]
+        elif op == 'done':
+            self.batches.pop(entry['batch'], None)
+
+    def _write(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(entry)
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def record(self, run: str, tabs: List[int], changes: Dict[str, Any]) -> str:
+        """ต่อท้าย change set ลง journal แล้ว fsync ก่อนคืนค่า (เขียนลงชีตภายหลังโดย drain) คืน batch id"""
+        with self._lock:
+            cells = [[self._next_seq(), cell_key(run, job_no, col), job_no, row, col, value]
+                     for row, col, value, job_no in changes['cell_updates']]
+            appends = [[self._next_seq(), append_key(run, record['Job_No']), record['Job_No'], record]
+                       for record in changes['new_records']]
+            seq = self._next_seq()
+            entry = {'op': 'batch', 'id': f"{run}:{seq}", 'seq': seq, 'run': run, 'tabs': list(tabs),
+                     'cells': cells, 'appends': appends, 'data_headers': changes['data_headers'],
+                     'stats_new_jobs': changes['stats_new_jobs'], 'stats_moves': changes['stats_moves'],
+                     'notifications': changes['notifications']}
+            self._write(entry)
+            return entry['id']
+
+    def pending(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """snapshot ของ (cell updates, งานใหม่, batch ที่ยังไม่ done) ตามลำดับที่บันทึก"""
+        with self._lock:
+            return list(self.cells.values()), list(self.appends.values()), list(self.batches.values())
+
+    def pending_count(self) -> int:
+        return len(self.cells) + len(self.appends) + len(self.batches)
+
+    def mark_applied(self, seqs: List[int]):
+        if not seqs:
+            return
+        with self._lock:
+            self._write({'op': 'applied', 'seqs': list(seqs)})
+
+    def mark_done(self, batch_id: str):
+        with self._lock:
+            self._write({'op': 'done', 'batch': batch_id})
+            self._compact()
+
+    def discard(self) -> int:
+        """ทิ้งรายการที่ค้างทั้งหมด (ใช้เมื่อมีแหล่งอื่นรับผิดชอบเขียนข้อมูลชุดนี้แทน) คืนจำนวนที่ทิ้ง"""
+        with self._lock:
+            count = self.pending_count()
+            self.cells.clear()
+            self.appends.clear()
+            self.batches.clear()
+            self.needs_verify = False
+            self._compact()
+            return count
+
+    def _compact(self):
+        """ไม่มีรายการค้างแล้ว: ตัดไฟล์ให้ว่าง journal จึงไม่โตไปเรื่อย ๆ"""
+        if self.pending_count():
+            return
+        self._file.truncate(0)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class JournalDrainer:
+    """เธรดที่เรียก drain() เมื่อมีรายการใหม่ในรอบ (notify) หรือทุก interval วินาที
+    ถ้า drain ล้มเหลว (เช่น Sheets ล่ม) จะรอนานขึ้นทีละเท่าแล้วลองใหม่ รายการยังอยู่ใน journal"""
+
+    MAX_BACKOFF = 60
+
+    def __init__(self, journal: SheetJournal, drain: Callable[[], None], interval: float = 2.0):
+        self.journal = journal
+        self.drain = drain
+        self.interval = interval
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._idle = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="journal-drain", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            delay = self.interval if not self.failures else min(self.interval * 2 ** self.failures, self.MAX_BACKOFF)
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self.journal.pending_count():
+                try:
+                    self.drain()
+                    self.failures = 0
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"❌ Journal drain failed ({self.journal.pending_count()} entries kept for retry): {e}")
+            with self._idle:
+                self._idle.notify_all()
+
+    def flush(self, timeout: float) -> int:
+        """รอจน journal ว่างหรือหมดเวลา คืนจำนวนรายการที่ยังค้าง"""
+        deadline = time.monotonic() + timeout
+        self.notify()
+        while self.journal.pending_count() and self._thread is not None and self._thread.is_alive():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._idle:
+                self._idle.wait(min(remaining, max(self.interval, 1)))
+        return self.journal.pending_count()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
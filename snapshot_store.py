@@ -0,0 +1,357 @@
+# snapshot_store.py
+# ประวัติ snapshot ของทุกแท็บในทุกรอบการซิงค์ (append-only, บีบอัด, เก็บแบบ delta)
+# ใช้ตอบคำถามแบบ "แท็บ 14 มีงานอะไรบ้างเมื่อวาน 10:00"
+#
+# วิธีใช้: python snapshot_store.py runs
+#         python snapshot_store.py tab 14 --at "18/10/2026 10:00"
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any, Iterable
+
+import pandas as pd
+import pytz
+import logging
+
+from schema_registry import find_job_no_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "snapshots.db"
+THAILAND_TZ = pytz.timezone('Asia/Bangkok')
+
+# row ที่ normalize แล้ว: Job_No -> tuple ของค่าในแต่ละคอลัมน์
+TabRows = Dict[str, Tuple[str, ...]]
+
+
+def normalize_tab_frame(df: pd.DataFrame) -> Tuple[List[str], TabRows]:
+    """แปลง DataFrame ของแท็บเป็น (columns, {Job_No: values}) โดยค่าทั้งหมดเป็น string"""
+    columns = [str(c) for c in df.columns]
+    job_idx = find_job_no_index(columns)
+    if job_idx is None:
+        return columns, {}
+    rows: TabRows = {}
+    for values in df.fillna('').astype(str).itertuples(index=False, name=None):
+        job_no = values[job_idx].strip()
+        if job_no:
+            rows[job_no] = tuple(values)
+    return columns, rows
+
+
+class SnapshotStore:
+    """เก็บ snapshot ต่อแท็บใน SQLite: string ถูก dictionary-encode, แต่ละแท็บเก็บเป็น keyframe + delta"""
+
+    def __init__(self, db_path: Optional[str] = None, keyframe_every: Optional[int] = None,
+                 retention_days: Optional[float] = None):
+        self.db_path = db_path or os.getenv("SNAPSHOT_DB_PATH", DEFAULT_DB_PATH)
+        self.keyframe_every = keyframe_every or int(os.getenv("SNAPSHOT_KEYFRAME_EVERY", "24"))
+        self.retention_days = retention_days if retention_days is not None else float(os.getenv("SNAPSHOT_RETENTION_DAYS", "30"))
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._init_schema()
+        self._string_ids: Dict[str, int] = dict(self.conn.execute("SELECT value, id FROM strings"))
+        self._strings: Dict[int, str] = {v: k for k, v in self._string_ids.items()}
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS strings (
+                    id INTEGER PRIMARY KEY,
+                    value TEXT NOT NULL UNIQUE
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tab_snapshots (
+                    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+                    tab INTEGER NOT NULL,
+                    kind TEXT NOT NULL CHECK (kind IN ('full', 'delta')),
+                    row_count INTEGER NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (tab, run_id)
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at)")
+
+    # --------------------------------------------------------------------------
+    # Encoding
+    # --------------------------------------------------------------------------
+
+    def _encode(self, value: str) -> int:
+        sid = self._string_ids.get(value)
+        if sid is None:
+            sid = self.conn.execute("INSERT INTO strings (value) VALUES (?)", (value,)).lastrowid
+            self._string_ids[value] = sid
+            self._strings[sid] = value
+        return sid
+
+    def _pack(self, obj: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(obj, separators=(',', ':')).encode('utf-8'), 6)
+
+    @staticmethod
+    def _unpack(blob: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def _encode_rows(self, rows: Iterable[Tuple[str, ...]]) -> List[List[int]]:
+        return [[self._encode(v) for v in row] for row in rows]
+
+    def _decode_rows(self, rows: List[List[int]]) -> Iterable[Tuple[str, ...]]:
+        strings = self._strings
+        return (tuple(strings[i] for i in row) for row in rows)
+
+    # --------------------------------------------------------------------------
+    # Write
+    # --------------------------------------------------------------------------
+
+    def record_run(self, tab_frames: Dict[int, pd.DataFrame], partial_tabs: Iterable[int] = (),
+                   started_at: Optional[float] = None) -> Tuple[int, Dict[int, Dict[str, List[str]]]]:
+        """บันทึก snapshot ของรอบนี้ แท็บใน partial_tabs (scrape แบบ incremental)
+        ถือว่าเห็นเพียงบางส่วน จึงไม่นับงานที่หายไปเป็นการลบ
+        คืนค่า (run_id, {tab: {'added': [...], 'changed': [...], 'removed': [...]}})"""
+        partial_tabs = set(partial_tabs)
+        run_id = self.begin_run(started_at)
+        changes = {tab: self.record_tab(run_id, tab, df, tab in partial_tabs) for tab, df in tab_frames.items()}
+        logger.info(f"🗄️ Snapshot run {run_id} recorded for tabs {sorted(tab_frames)}")
+        return run_id, changes
+
+    def begin_run(self, started_at: Optional[float] = None) -> int:
+        """สร้าง run ใหม่ แล้วเพิ่มแท็บทีละแท็บด้วย record_tab (ใช้กับการซิงค์แบบ pipeline)"""
+        with self.conn:
+            return self.conn.execute("INSERT INTO runs (started_at) VALUES (?)",
+                                     (started_at or time.time(),)).lastrowid
+
+    def record_tab(self, run_id: int, tab: int, df: pd.DataFrame, partial: bool = False) -> Dict[str, List[str]]:
+        """บันทึก snapshot ของแท็บเดียวลงใน run_id"""
+        columns, rows = normalize_tab_frame(df)
+        with self.conn:
+            return self._write_tab(run_id, tab, columns, rows, partial)
+
+    def _write_tab(self, run_id: int, tab: int, columns: List[str], rows: TabRows,
+                   partial: bool) -> Dict[str, List[str]]:
+        prev = self.conn.execute(
+            "SELECT run_id FROM tab_snapshots WHERE tab = ? ORDER BY run_id DESC LIMIT 1", (tab,)
+        ).fetchone()
+        deltas_since_key = self.conn.execute(
+            "SELECT COUNT(*) FROM tab_snapshots WHERE tab = ? AND kind = 'delta' AND run_id > "
+            "COALESCE((SELECT MAX(run_id) FROM tab_snapshots WHERE tab = ? AND kind = 'full'), 0)",
+            (tab, tab)
+        ).fetchone()[0]
+
+        prev_columns, prev_rows = self.reconstruct(tab, prev[0]) if prev else (columns, {})
+        if partial and prev_rows:
+            # แถวที่ไม่เห็นในรอบนี้คงค่าเดิม และจัดคอลัมน์ให้ตรงกับ snapshot ก่อนหน้า
+            if columns != prev_columns:
+                rows = {j: tuple(dict(zip(columns, r)).get(c, '') for c in prev_columns) for j, r in rows.items()}
+                columns = prev_columns
+            rows = {**prev_rows, **rows}
+
+        added = [j for j in rows if j not in prev_rows]
+        changed = [j for j in rows if j in prev_rows and rows[j] != prev_rows[j]]
+        removed = [j for j in prev_rows if j not in rows]
+
+        if prev is None or columns != prev_columns or deltas_since_key + 1 >= self.keyframe_every:
+            kind = 'full'
+            payload = {'columns': [self._encode(c) for c in columns],
+                       'rows': self._encode_rows(rows.values())}
+        else:
+            kind = 'delta'
+            payload = {'upsert': self._encode_rows(rows[j] for j in added + changed),
+                       'removed': [self._encode(j) for j in removed]}
+        self.conn.execute(
+            "INSERT INTO tab_snapshots (run_id, tab, kind, row_count, payload) VALUES (?, ?, ?, ?, ?)",
+            (run_id, tab, kind, len(rows), self._pack(payload))
+        )
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+    # --------------------------------------------------------------------------
+    # Read
+    # --------------------------------------------------------------------------
+
+    def reconstruct(self, tab: int, run_id: int) -> Tuple[List[str], TabRows]:
+        """สร้างสถานะของแท็บ ณ run_id จาก keyframe ล่าสุดบวก delta ที่ตามมา"""
+        key = self.conn.execute(
+            "SELECT run_id FROM tab_snapshots WHERE tab = ? AND kind = 'full' AND run_id <= ? "
+            "ORDER BY run_id DESC LIMIT 1", (tab, run_id)
+        ).fetchone()
+        if key is None:
+            return [], {}
+        cursor = self.conn.execute(
+            "SELECT kind, payload FROM tab_snapshots WHERE tab = ? AND run_id BETWEEN ? AND ? ORDER BY run_id",
+            (tab, key[0], run_id)
+        )
+        columns: List[str] = []
+        rows: TabRows = {}
+        job_idx = 0
+        for kind, blob in cursor:
+            payload = self._unpack(blob)
+            if kind == 'full':
+                columns = [self._strings[i] for i in payload['columns']]
+                job_idx = find_job_no_index(columns) or 0
+                rows = {row[job_idx].strip(): row for row in self._decode_rows(payload['rows'])}
+            else:
+                for row in self._decode_rows(payload['upsert']):
+                    rows[row[job_idx].strip()] = row
+                for sid in payload['removed']:
+                    rows.pop(self._strings[sid].strip(), None)
+        return columns, rows
+
+    def run_at(self, when: datetime, tab: Optional[int] = None) -> Optional[int]:
+        """run_id ล่าสุดที่เริ่มก่อนหรือเท่ากับเวลา when (และมีข้อมูลของแท็บนั้น)"""
+        ts = when.timestamp()
+        if tab is None:
+            row = self.conn.execute(
+                "SELECT MAX(run_id) FROM runs WHERE started_at <= ?", (ts,)).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT MAX(s.run_id) FROM tab_snapshots s JOIN runs r USING (run_id) "
+                "WHERE s.tab = ? AND r.started_at <= ?", (tab, ts)).fetchone()
+        return row[0] if row else None
+
+    def tab_at(self, tab: int, when: datetime) -> pd.DataFrame:
+        """ข้อมูลของแท็บ ณ เวลาที่กำหนดเป็น DataFrame"""
+        run_id = self.run_at(when, tab)
+        if run_id is None:
+            return pd.DataFrame()
+        columns, rows = self.reconstruct(tab, run_id)
+        return pd.DataFrame(list(rows.values()), columns=columns)
+
+    def list_runs(self, limit: int = 20) -> List[Tuple[int, float, int]]:
+        return self.conn.execute(
+            "SELECT r.run_id, r.started_at, COUNT(s.tab) FROM runs r LEFT JOIN tab_snapshots s USING (run_id) "
+            "GROUP BY r.run_id ORDER BY r.run_id DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    def tab_entry_times(self) -> Dict[Tuple[int, str], Optional[float]]:
+        """(tab, Job_No) -> เวลาเริ่มของรอบที่งานเข้ามาอยู่ในแท็บ สำหรับงานที่อยู่ในแท็บนั้นใน snapshot ล่าสุด
+        งานที่อยู่ตั้งแต่ snapshot แรกที่ยังเก็บไว้ไม่รู้เวลาเข้าจริง (ค่าเป็น None)"""
+        started = dict(self.conn.execute("SELECT run_id, started_at FROM runs"))
+        strings = self._strings
+        entries: Dict[Tuple[int, str], Optional[float]] = {}
+        tabs = [t for (t,) in self.conn.execute("SELECT DISTINCT tab FROM tab_snapshots")]
+        for tab in tabs:
+            members: Dict[str, Optional[float]] = {}
+            job_idx, first = 0, True
+            for run_id, kind, blob in self.conn.execute(
+                    "SELECT run_id, kind, payload FROM tab_snapshots WHERE tab = ? ORDER BY run_id", (tab,)).fetchall():
+                payload = self._unpack(blob)
+                entered = None if first else started.get(run_id)
+                if kind == 'full':
+                    job_idx = find_job_no_index([strings[i] for i in payload['columns']]) or 0
+                    present = [strings[row[job_idx]].strip() for row in payload['rows']]
+                    members = {j: members[j] if j in members else entered for j in present}
+                else:
+                    for row in payload['upsert']:
+                        members.setdefault(strings[row[job_idx]].strip(), entered)
+                    for sid in payload['removed']:
+                        members.pop(strings[sid].strip(), None)
+                first = False
+            entries.update(((tab, job_no), entered) for job_no, entered in members.items())
+        return entries
+
+    # --------------------------------------------------------------------------
+    # Retention
+    # --------------------------------------------------------------------------
+
+    def prune(self, retention_days: Optional[float] = None) -> int:
+        """ลบ run ที่เก่ากว่า retention โดยแปลง snapshot แรกที่เหลือของแต่ละแท็บให้เป็น keyframe ก่อน"""
+        days = self.retention_days if retention_days is None else retention_days
+        if days <= 0:
+            return 0
+        cutoff_row = self.conn.execute(
+            "SELECT MIN(run_id) FROM runs WHERE started_at >= ?", (time.time() - days * 86400,)
+        ).fetchone()
+        first_kept = cutoff_row[0] if cutoff_row and cutoff_row[0] else None
+        if first_kept is None:
+            first_kept = (self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()[0] or 0) + 1
+
+        with self.conn:
+            tabs = [t for (t,) in self.conn.execute("SELECT DISTINCT tab FROM tab_snapshots")]
+            for tab in tabs:
+                first = self.conn.execute(
+                    "SELECT run_id, kind FROM tab_snapshots WHERE tab = ? AND run_id >= ? ORDER BY run_id LIMIT 1",
+                    (tab, first_kept)
+                ).fetchone()
+                if first and first[1] == 'delta':
+                    columns, rows = self.reconstruct(tab, first[0])
+                    payload = {'columns': [self._encode(c) for c in columns],
+                               'rows': self._encode_rows(rows.values())}
+                    self.conn.execute(
+                        "UPDATE tab_snapshots SET kind = 'full', payload = ? WHERE tab = ? AND run_id = ?",
+                        (self._pack(payload), tab, first[0])
+                    )
+            self.conn.execute("DELETE FROM tab_snapshots WHERE run_id < ?", (first_kept,))
+            removed = self.conn.execute("DELETE FROM runs WHERE run_id < ?", (first_kept,)).rowcount
+        if removed:
+            self._compact_strings()
+            logger.info(f"🧹 Pruned {removed} snapshot runs older than {days:g} days")
+        return removed
+
+    def _compact_strings(self):
+        """ลบ string ใน dictionary ที่ไม่มี snapshot ใดอ้างถึงแล้ว"""
+        used = set()
+        for (blob,) in self.conn.execute("SELECT payload FROM tab_snapshots"):
+            payload = self._unpack(blob)
+            used.update(payload.get('columns', ()))
+            used.update(payload.get('removed', ()))
+            for row in payload.get('rows', payload.get('upsert', ())):
+                used.update(row)
+        unused = [sid for sid in self._strings if sid not in used]
+        with self.conn:
+            self.conn.executemany("DELETE FROM strings WHERE id = ?", ((sid,) for sid in unused))
+        for sid in unused:
+            del self._string_ids[self._strings.pop(sid)]
+
+    def close(self):
+        self.conn.close()
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def _parse_when(value: Optional[str]) -> datetime:
+    if not value:
+        return datetime.now(THAILAND_TZ)
+    for fmt in ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return THAILAND_TZ.localize(datetime.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized time format: {value}")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Query sync snapshot history")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('runs', help='list recent runs')
+    tab_cmd = sub.add_parser('tab', help='show a tab as of a point in time')
+    tab_cmd.add_argument('tab', type=int)
+    tab_cmd.add_argument('--at', help='time in Asia/Bangkok, e.g. "18/10/2026 10:00" (default: now)')
+    tab_cmd.add_argument('--csv', action='store_true', help='print as CSV')
+    prune_cmd = sub.add_parser('prune', help='apply retention')
+    prune_cmd.add_argument('--days', type=float)
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore()
+    if args.command == 'runs':
+        for run_id, started_at, tabs in store.list_runs():
+            ts = datetime.fromtimestamp(started_at, THAILAND_TZ).strftime('%d/%m/%Y %H:%M:%S')
+            print(f"{run_id:>6}  {ts}  {tabs} tabs")
+    elif args.command == 'tab':
+        df = store.tab_at(args.tab, _parse_when(args.at))
+        print(df.to_csv(index=False) if args.csv else df.to_string(index=False))
+    elif args.command == 'prune':
+        print(f"Removed {store.prune(args.days)} runs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
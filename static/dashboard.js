@@ -0,0 +1,631 @@
+let statusInterval;
+let currentPage = 'dashboard';
+let currentData = [];
+let filteredData = [];
+let currentHeaders = [];
+let searchTimer = null;
+let searchRequest = 0;
+let currentPage_pagination = 1;
+let rowsPerPage = 10; // ตั้งค่าเริ่มต้นเป็น 10 รายการ
+
+// Google Sheets Configuration
+const GOOGLE_SHEET_ID = '1U98CRxBxFD2ucnC0Ncxgw0Dx0Rt8HvCEKQuUo8zmOCY';
+const SHEET_NAME = 'Master_Data';
+const RANGE = 'D:AC'; // Columns D to AC
+
+// Theme system
+function setTheme(theme) {
+    const body = document.body;
+    body.className = body.className.replace(/theme-\w+/g, '');
+    if (theme !== 'default') {
+        body.classList.add(`theme-${theme}`);
+    }
+    
+    // Update active theme button
+    document.querySelectorAll('.theme-option').forEach(btn => btn.classList.remove('active'));
+    document.querySelector(`[data-theme="${theme}"]`).classList.add('active');
+    
+    localStorage.setItem('theme', theme);
+}
+
+// Initialize theme
+document.querySelectorAll('.theme-option').forEach(btn => {
+    btn.addEventListener('click', () => setTheme(btn.dataset.theme));
+});
+
+const savedTheme = localStorage.getItem('theme') || 'default';
+setTheme(savedTheme);
+
+// Dark mode toggle
+function toggleDarkMode() {
+    document.documentElement.classList.toggle('dark');
+    localStorage.setItem('darkMode', document.documentElement.classList.contains('dark'));
+}
+
+// Initialize dark mode from localStorage
+if (localStorage.getItem('darkMode') === 'true') {
+    document.documentElement.classList.add('dark');
+}
+
+// Navigation
+function navigateTo(page) {
+    // Hide all pages
+    document.querySelectorAll('.page-content').forEach(p => p.classList.add('hidden'));
+    // Show target page
+    document.getElementById(page + '-page').classList.remove('hidden');
+    
+    // Update nav buttons
+    document.querySelectorAll('.nav-btn').forEach(btn => btn.classList.remove('active'));
+    event.target.closest('.nav-btn').classList.add('active');
+    
+    currentPage = page;
+    
+    // Load page-specific content
+    switch(page) {
+        case 'data':
+            loadDataPage();
+            break;
+        case 'settings':
+            loadSettingsPage();
+            break;
+        case 'logs':
+            loadLogsPage();
+            break;
+    }
+}
+
+function showToast(message, type = 'info') {
+    const toast = document.getElementById('toast');
+    const icon = document.getElementById('toast-icon');
+    const messageEl = document.getElementById('toast-message');
+    
+    messageEl.textContent = message;
+    
+    const icons = {
+        'success': 'fa-check-circle text-emerald-500',
+        'error': 'fa-exclamation-circle text-red-500',
+        'info': 'fa-info-circle text-blue-500',
+        'warning': 'fa-exclamation-triangle text-amber-500'
+    };
+    
+    icon.className = `fas ${icons[type] || icons.info}`;
+    
+    // Show toast
+    toast.classList.remove('opacity-0', 'translate-y-2');
+    toast.classList.add('opacity-100', 'translate-y-0');
+    
+    setTimeout(() => {
+        toast.classList.add('opacity-0', 'translate-y-2');
+        toast.classList.remove('opacity-100', 'translate-y-0');
+    }, 4000);
+}
+
+// Google Sheets Data Loading
+async function loadGoogleSheetData() {
+    try {
+        const url = `https://docs.google.com/spreadsheets/d/${GOOGLE_SHEET_ID}/gviz/tq?tqx=out:csv&sheet=${SHEET_NAME}&range=${RANGE}`;
+        
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error('Failed to fetch data from Google Sheets');
+        }
+        
+        const csvText = await response.text();
+        const rows = csvText.split('\n').map(row => {
+            // Simple CSV parsing - handle quoted fields
+            const fields = [];
+            let current = '';
+            let inQuotes = false;
+            
+            for (let i = 0; i < row.length; i++) {
+                const char = row[i];
+                if (char === '"') {
+                    inQuotes = !inQuotes;
+                } else if (char === ',' && !inQuotes) {
+                    fields.push(current.trim().replace(/^"|"$/g, ''));
+                    current = '';
+                } else {
+                    current += char;
+                }
+            }
+            fields.push(current.trim().replace(/^"|"$/g, ''));
+            return fields;
+        }).filter(row => row.length > 1 && row.some(cell => cell.trim()));
+
+        return rows;
+    } catch (error) {
+        console.error('Error loading Google Sheets data:', error);
+        throw error;
+    }
+}
+
+function createDataTable(data) {
+    if (!data || data.length === 0) {
+        return '<div class="text-center py-16"><i class="fas fa-exclamation-triangle text-6xl text-amber-500 mb-6"></i><p class="text-xl text-slate-600 dark:text-slate-400">ไม่พบข้อมูล</p></div>';
+    }
+
+    const headers = ['NO.', ...data[0]]; // เพิ่มคอลัมน์ NO. ที่หัวตาราง
+    currentHeaders = data[0];
+    currentData = data.slice(1); // เก็บข้อมูลต้นฉบับ (ไม่รวม headers)
+    
+    // เรียงข้อมูลจากใหม่ไปเก่า (10 รายการล่าสุด)
+    currentData.reverse();
+    
+    filteredData = [...currentData]; // คัดลอกข้อมูลสำหรับการกรอง
+    currentPage_pagination = 1; // รีเซ็ตหน้า
+
+    let html = `
+        <div class="mb-6 flex items-center justify-between">
+            <div class="text-sm text-slate-600 dark:text-slate-400">
+                พบข้อมูล ${currentData.length} รายการ จาก Google Sheets (แสดง ${rowsPerPage} รายการล่าสุด)
+            </div>
+            <div class="flex space-x-2">
+                <input type="text" id="search-input" placeholder="ค้นหาข้อมูล..." 
+                       class="px-4 py-2 rounded-xl border border-slate-300 dark:border-slate-600 bg-white/50 dark:bg-slate-800/50 backdrop-blur-sm focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all">
+                <select id="rows-per-page" class="px-4 py-2 rounded-xl border border-slate-300 dark:border-slate-600 bg-white/50 dark:bg-slate-800/50 backdrop-blur-sm">
+                    <option value="10" selected>10 รายการ</option>
+                    <option value="25">25 รายการ</option>
+                    <option value="50">50 รายการ</option>
+                    <option value="100">100 รายการ</option>
+                </select>
+            </div>
+        </div>
+        <div class="overflow-x-auto rounded-xl shadow-lg">
+            <table class="data-table w-full">
+                <thead>
+                    <tr>
+    `;
+
+    headers.forEach((header, index) => {
+        if (index === 0) {
+            html += `<th class="whitespace-nowrap text-center w-16">${header}</th>`;
+        } else {
+            html += `<th class="whitespace-nowrap">${header || 'ไม่ระบุ'}</th>`;
+        }
+    });
+
+    html += `
+                    </tr>
+                </thead>
+                <tbody id="table-body">
+                </tbody>
+            </table>
+        </div>
+        <div class="mt-6 flex items-center justify-between">
+            <div id="pagination-info" class="text-sm text-slate-600 dark:text-slate-400"></div>
+            <div id="pagination-controls" class="flex space-x-2"></div>
+        </div>
+    `;
+
+    return html;
+}
+
+function renderTableData() {
+    const tableBody = document.getElementById('table-body');
+    if (!tableBody) return;
+
+    // คำนวณข้อมูลสำหรับหน้าปัจจุบัน
+    const startIndex = (currentPage_pagination - 1) * rowsPerPage;
+    const endIndex = Math.min(startIndex + rowsPerPage, filteredData.length);
+    const pageData = filteredData.slice(startIndex, endIndex);
+
+    // สร้างแถวในตาราง
+    let html = '';
+    pageData.forEach((row, index) => {
+        const globalIndex = startIndex + index + 1; // เลขลำดับทั้งหมด
+        html += '<tr>';
+        html += `<td class="text-center text-sm font-medium text-slate-800 dark:text-slate-200">${globalIndex}</td>`;
+        row.forEach(cell => {
+            const cellValue = cell || '';
+            html += `<td class="whitespace-nowrap text-sm text-slate-800 dark:text-slate-200">${cellValue}</td>`;
+        });
+        html += '</tr>';
+    });
+
+    tableBody.innerHTML = html;
+    updatePaginationInfo();
+    updatePaginationControls();
+}
+
+function updatePaginationInfo() {
+    const paginationInfo = document.getElementById('pagination-info');
+    if (!paginationInfo) return;
+
+    const startIndex = (currentPage_pagination - 1) * rowsPerPage + 1;
+    const endIndex = Math.min(currentPage_pagination * rowsPerPage, filteredData.length);
+    
+    paginationInfo.textContent = `แสดง ${startIndex}-${endIndex} จากทั้งหมด ${filteredData.length} รายการ`;
+}
+
+function updatePaginationControls() {
+    const paginationControls = document.getElementById('pagination-controls');
+    if (!paginationControls) return;
+
+    const totalPages = Math.ceil(filteredData.length / rowsPerPage);
+    
+    if (totalPages <= 1) {
+        paginationControls.innerHTML = '';
+        return;
+    }
+
+    let html = '';
+    
+    // Previous button
+    html += `<button onclick="changePage(${currentPage_pagination - 1})" 
+             class="pagination-btn px-3 py-2 rounded-lg text-sm font-medium text-slate-700 dark:text-slate-200 bg-white/50 dark:bg-slate-800/50 backdrop-blur-sm border border-slate-300 dark:border-slate-600 
+             ${currentPage_pagination === 1 ? 'opacity-50 cursor-not-allowed' : 'hover:bg-blue-500 hover:text-white'}"
+             ${currentPage_pagination === 1 ? 'disabled' : ''}>
+             <i class="fas fa-chevron-left"></i>
+             </button>`;
+
+    // Page numbers
+    const maxVisiblePages = 5;
+    let startPage = Math.max(1, currentPage_pagination - Math.floor(maxVisiblePages / 2));
+    let endPage = Math.min(totalPages, startPage + maxVisiblePages - 1);
+    
+    if (endPage - startPage < maxVisiblePages - 1) {
+        startPage = Math.max(1, endPage - maxVisiblePages + 1);
+    }
+
+    for (let i = startPage; i <= endPage; i++) {
+        html += `<button onclick="changePage(${i})" 
+                 class="pagination-btn px-4 py-2 rounded-lg text-sm font-medium 
+                 ${i === currentPage_pagination 
+                   ? 'active text-white' 
+                   : 'text-slate-700 dark:text-slate-200 bg-white/50 dark:bg-slate-800/50 backdrop-blur-sm border border-slate-300 dark:border-slate-600 hover:bg-blue-500 hover:text-white'}">${i}</button>`;
+    }
+
+    // Next button
+    html += `<button onclick="changePage(${currentPage_pagination + 1})" 
+             class="pagination-btn px-3 py-2 rounded-lg text-sm font-medium text-slate-700 dark:text-slate-200 bg-white/50 dark:bg-slate-800/50 backdrop-blur-sm border border-slate-300 dark:border-slate-600 
+             ${currentPage_pagination === totalPages ? 'opacity-50 cursor-not-allowed' : 'hover:bg-blue-500 hover:text-white'}"
+             ${currentPage_pagination === totalPages ? 'disabled' : ''}>
+             <i class="fas fa-chevron-right"></i>
+             </button>`;
+
+    paginationControls.innerHTML = html;
+}
+
+function changePage(page) {
+    const totalPages = Math.ceil(filteredData.length / rowsPerPage);
+    if (page < 1 || page > totalPages) return;
+    
+    currentPage_pagination = page;
+    renderTableData();
+}
+
+function initializeTableFeatures() {
+    const searchInput = document.getElementById('search-input');
+    const rowsPerPageSelect = document.getElementById('rows-per-page');
+    
+    if (searchInput) {
+        searchInput.addEventListener('input', handleSearch);
+    }
+    
+    if (rowsPerPageSelect) {
+        // ตั้งค่าเริ่มต้นเป็น 10 รายการ
+        rowsPerPageSelect.value = '10';
+        rowsPerPageSelect.addEventListener('change', handleRowsPerPageChange);
+    }
+
+    // เรนเดอร์ข้อมูลครั้งแรก
+    renderTableData();
+}
+
+function handleSearch() {
+    const searchTerm = document.getElementById('search-input').value.toLowerCase().trim();
+    
+    clearTimeout(searchTimer);
+    searchRequest++; // ผลค้นหาของคำก่อนหน้าที่ยังไม่กลับมาจะถูกทิ้ง
+    if (searchTerm === '') {
+        filteredData = [...currentData];
+    } else {
+        filteredData = currentData.filter(row => 
+            row.some(cell => cell && cell.toString().toLowerCase().includes(searchTerm))
+        );
+        // ค้นหาทุกงานใน Master_Data จาก index ฝั่งเซิร์ฟเวอร์ (ผลในหน้าที่โหลดไว้แสดงไปก่อน)
+        searchTimer = setTimeout(() => searchAllJobs(searchTerm), 250);
+    }
+    
+    currentPage_pagination = 1; // รีเซ็ตไปหน้าแรก
+    renderTableData();
+}
+
+async function searchAllJobs(searchTerm) {
+    const requestId = ++searchRequest;
+    try {
+        const response = await fetch(`/api/search?q=${encodeURIComponent(searchTerm)}&limit=200`);
+        const result = await response.json();
+        // ข้ามผลที่มาช้ากว่าคำค้นล่าสุด และใช้ผลในหน้าต่อไปถ้า index ยังว่าง (ยังไม่เคย rebuild)
+        if (requestId !== searchRequest || !result.success || !result.indexed) return;
+        filteredData = result.results.map(item => currentHeaders.map(header => item.fields[header] || ''));
+        currentPage_pagination = 1;
+        renderTableData();
+    } catch (error) {
+        console.error('Error searching jobs:', error);
+    }
+}
+
+function handleRowsPerPageChange() {
+    const newRowsPerPage = parseInt(document.getElementById('rows-per-page').value);
+    rowsPerPage = newRowsPerPage;
+    currentPage_pagination = 1; // รีเซ็ตไปหน้าแรก
+    renderTableData();
+    
+    // อัพเดทข้อความแสดงจำนวนรายการ
+    const summaryElement = document.querySelector('.mb-6 .text-sm');
+    if (summaryElement) {
+        summaryElement.textContent = `พบข้อมูล ${currentData.length} รายการ จาก Google Sheets (แสดง ${rowsPerPage} รายการต่อหน้า)`;
+    }
+}
+
+function exportData() {
+    showToast('กำลังเตรียมไฟล์สำหรับดาวน์โหลด...', 'info');
+    
+    // Server streams the full Master_Data (not just the rows loaded in the table)
+    const link = document.createElement('a');
+    link.setAttribute('href', '/api/export?format=csv');
+    link.style.visibility = 'hidden';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+}
+
+function startScraping() {
+    const btn = document.getElementById('start-btn');
+    const originalContent = btn.innerHTML;
+    
+    btn.disabled = true;
+    btn.innerHTML = '<i class="fas fa-spinner fa-spin mr-3 text-xl"></i><span>Initializing Neural Network...</span>';
+
+    fetch('/api/start-scraping', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showToast('AI Neural Network Successfully Activated!', 'success');
+            startStatusPolling();
+        } else {
+            showToast('Neural Network Activation Failed: ' + data.message, 'error');
+            btn.disabled = false;
+            btn.innerHTML = originalContent;
+        }
+    })
+    .catch(error => {
+        showToast('System Error: ' + error.message, 'error');
+        btn.disabled = false;
+        btn.innerHTML = originalContent;
+    });
+}
+
+function testConnections() {
+    showToast('Running neural network diagnostics...', 'info');
+    
+    fetch('/api/test-connection', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            let successCount = 0;
+            let totalCount = 0;
+            Object.entries(data.results).forEach(([service, result]) => {
+                totalCount++;
+                if (result.status === 'success') successCount++;
+            });
+            showToast(`Neural diagnostics complete: ${successCount}/${totalCount} systems operational`, successCount === totalCount ? 'success' : 'warning');
+        } else {
+            showToast('Diagnostic failure: ' + data.message, 'error');
+        }
+    })
+    .catch(error => {
+        showToast('Diagnostic error: ' + error.message, 'error');
+    });
+}
+
+function refreshStatus() {
+    updateStatus();
+    showToast('Neural network status refreshed', 'success');
+}
+
+function startStatusPolling() {
+    if (statusInterval) clearInterval(statusInterval);
+    statusInterval = setInterval(updateStatus, 3000);
+    document.getElementById('progress-container').classList.remove('hidden');
+    
+    // Add running class to status card
+    document.getElementById('status-card').classList.add('running');
+}
+
+function stopStatusPolling() {
+    if (statusInterval) {
+        clearInterval(statusInterval);
+        statusInterval = null;
+    }
+    document.getElementById('progress-container').classList.add('hidden');
+    
+    // Remove running class
+    document.getElementById('status-card').classList.remove('running');
+    
+    const btn = document.getElementById('start-btn');
+    btn.disabled = false;
+    btn.innerHTML = '<i class="fas fa-rocket group-hover:animate-bounce text-xl"></i><span>Launch AI Scraper</span>';
+}
+
+function updateStatus() {
+    fetch('/api/status')
+        .then(response => response.json())
+        .then(data => {
+            // Update status
+            const statusText = document.getElementById('status-text');
+            const statusDot = document.getElementById('status-dot');
+            const statusProgress = document.getElementById('status-progress');
+            const aiStatus = document.getElementById('ai-status');
+            
+            if (data.is_running) {
+                statusText.textContent = 'Processing';
+                aiStatus.textContent = 'Neural Network Active';
+                statusDot.classList.add('pulse-glow');
+                statusProgress.style.width = '100%';
+            } else {
+                statusText.textContent = 'Ready';
+                aiStatus.textContent = 'Neural Network Standby';
+                statusDot.classList.remove('pulse-glow');
+                statusProgress.style.width = '0%';
+            }
+            
+            // Update last run
+            document.getElementById('last-run').textContent = data.last_run || 'Never executed';
+            
+            // Update last result
+            const resultEl = document.getElementById('last-result');
+            const resultIcon = document.getElementById('result-icon');
+            
+            if (data.last_result) {
+                resultEl.textContent = data.last_result;
+                if (data.last_result.includes('success') || data.last_result.includes('สำเร็จ')) {
+                    resultIcon.className = 'fas fa-check-circle text-white';
+                } else {
+                    resultIcon.className = 'fas fa-exclamation-circle text-white';
+                }
+            }
+            
+            // Update progress
+            const progressText = document.getElementById('progress-text');
+            if (data.progress) {
+                progressText.textContent = data.progress;
+            }
+            
+            // Update logs
+            updateDashboardLogs(data.logs);
+            
+            // Stop polling if not running
+            if (!data.is_running && statusInterval) {
+                stopStatusPolling();
+            }
+        })
+        .catch(error => {
+            console.error('Neural network status update error:', error);
+        });
+}
+
+function updateDashboardLogs(logs) {
+    const container = document.getElementById('logs-container');
+    if (logs && logs.length > 0) {
+        const recentLogs = logs.slice(-5); // Show last 5 logs
+        container.innerHTML = recentLogs.map((log, index) => 
+            `<div class="log-entry text-sm text-slate-600 dark:text-slate-300 mono p-4 bg-white/50 dark:bg-slate-700/50 rounded-xl backdrop-blur-sm" style="animation-delay: ${index * 0.1}s">${log}</div>`
+        ).join('');
+        container.scrollTop = container.scrollHeight;
+    }
+}
+
+function loadDataPage() {
+    document.getElementById('data-content').innerHTML = `
+        <div class="text-center py-16">
+            <div class="loading-spinner mx-auto mb-6"></div>
+            <p class="text-xl text-slate-600 dark:text-slate-400">กำลังโหลดข้อมูลจาก Google Sheets...</p>
+        </div>`;
+    
+    loadGoogleSheetData()
+        .then(data => {
+            const tableHtml = createDataTable(data);
+            document.getElementById('data-content').innerHTML = tableHtml;
+            document.getElementById('data-summary').textContent = `พบข้อมูล ${data.length - 1} รายการจาก Google Sheets (${SHEET_NAME}) - แสดง 10 รายการล่าสุด`;
+            
+            // Initialize table features after content is loaded
+            setTimeout(initializeTableFeatures, 100);
+            
+            showToast('โหลดข้อมูลจาก Google Sheets สำเร็จ!', 'success');
+        })
+        .catch(error => {
+            document.getElementById('data-content').innerHTML = `
+                <div class="text-center py-16">
+                    <i class="fas fa-exclamation-triangle text-6xl text-red-500 mb-6"></i>
+                    <p class="text-xl text-slate-600 dark:text-slate-400 mb-4">ไม่สามารถโหลดข้อมูลได้</p>
+                    <p class="text-sm text-slate-500 dark:text-slate-400">${error.message}</p>
+                    <button onclick="loadDataPage()" class="mt-4 btn-primary text-white px-6 py-2 rounded-xl">
+                        <i class="fas fa-redo mr-2"></i>ลองใหม่
+                    </button>
+                </div>`;
+            document.getElementById('data-summary').textContent = 'เกิดข้อผิดพลาดในการโหลดข้อมูล';
+            showToast('ไม่สามารถโหลดข้อมูลจาก Google Sheets ได้: ' + error.message, 'error');
+        });
+}
+
+function loadSettingsPage() {
+    document.getElementById('settings-content').innerHTML = `
+        <div class="text-center py-16">
+            <i class="fas fa-cogs text-6xl text-purple-500 mb-6 loading-brain"></i>
+            <p class="text-xl text-slate-600 dark:text-slate-400">Loading neural parameters...</p>
+        </div>`;
+    
+    fetch('/settings')
+        .then(response => response.text())
+        .then(html => {
+            const parser = new DOMParser();
+            const doc = parser.parseFromString(html, 'text/html');
+            const content = doc.querySelector('.max-w-4xl')?.innerHTML || 'Settings unavailable';
+            document.getElementById('settings-content').innerHTML = content;
+        })
+        .catch(error => {
+            document.getElementById('settings-content').innerHTML = `
+                <div class="text-center py-16">
+                    <i class="fas fa-exclamation-triangle text-6xl text-amber-500 mb-6"></i>
+                    <p class="text-xl text-slate-600 dark:text-slate-400">Neural configuration unavailable</p>
+                </div>`;
+        });
+}
+
+function loadLogsPage() {
+    document.getElementById('logs-content').innerHTML = `
+        <div class="text-center py-16">
+            <i class="fas fa-file-code text-6xl text-orange-500 mb-6 loading-brain"></i>
+            <p class="text-xl text-slate-600 dark:text-slate-400">Compiling neural log data...</p>
+        </div>`;
+    
+    fetch('/logs')
+        .then(response => response.text())
+        .then(html => {
+            const parser = new DOMParser();
+            const doc = parser.parseFromString(html, 'text/html');
+            const content = doc.querySelector('.max-w-6xl')?.innerHTML || 'Logs unavailable';
+            document.getElementById('logs-content').innerHTML = content;
+        })
+        .catch(error => {
+            document.getElementById('logs-content').innerHTML = `
+                <div class="text-center py-16">
+                    <i class="fas fa-exclamation-triangle text-6xl text-amber-500 mb-6"></i>
+                    <p class="text-xl text-slate-600 dark:text-slate-400">Neural log system unavailable</p>
+                </div>`;
+        });
+}
+
+function refreshData() {
+    if (currentPage === 'data') {
+        loadDataPage();
+    }
+}
+
+// Initialize
+updateStatus();
+
+// Auto-refresh every 30 seconds when not actively scraping
+setInterval(() => {
+    if (!statusInterval) {
+        updateStatus();
+    }
+}, 30000);
+
+// Add some initial animation on load
+setTimeout(() => {
+    document.querySelectorAll('.floating-card').forEach((card, index) => {
+        setTimeout(() => {
+            card.style.opacity = '1';
+            card.style.transform = 'translateY(0)';
+        }, index * 100);
+    });
+}, 500);
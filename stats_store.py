@@ -0,0 +1,274 @@
+# stats_store.py
+# สถิติสำหรับ dashboard ที่อัปเดตแบบ incremental จาก change set ของแต่ละรอบการซิงค์
+# (จำนวนงานต่อแท็บ, งานใหม่ต่อวัน, เวลาจาก First_Seen ถึงแท็บงานเสร็จ, งานค้างต่อแท็บ)
+#
+# วิธีใช้: python stats_store.py rebuild   # คำนวณใหม่ทั้งหมดจาก Master_Data
+#         python stats_store.py show
+
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "stats.db"
+THAILAND_TZ = pytz.timezone('Asia/Bangkok')
+SHEET_TIME_FORMAT = '%d/%m/%Y %H:%M:%S'
+
+# histogram แบบ log scale: bucket = floor(log2(ชั่วโมง + 1) * BUCKETS_PER_DOUBLING)
+BUCKETS_PER_DOUBLING = 8
+PERCENTILES = (50, 90, 95)
+
+
+def _bucket(hours: float) -> int:
+    return int(math.log2(max(hours, 0) + 1) * BUCKETS_PER_DOUBLING)
+
+
+def _bucket_upper_hours(bucket: int) -> float:
+    return 2 ** ((bucket + 1) / BUCKETS_PER_DOUBLING) - 1
+
+
+def parse_sheet_time(value: str) -> Optional[float]:
+    try:
+        return THAILAND_TZ.localize(datetime.strptime(str(value).strip(), SHEET_TIME_FORMAT)).timestamp()
+    except ValueError:
+        return None
+
+
+class StatsStore:
+    """Aggregate ที่ materialize ไว้ใน SQLite, /api/stats อ่านแค่แถว summary แถวเดียว"""
+
+    def __init__(self, db_path: Optional[str] = None, finished_tab: Optional[str] = None,
+                 stale_days: Optional[float] = None):
+        self.db_path = db_path or os.getenv("STATS_DB_PATH", DEFAULT_DB_PATH)
+        self.finished_tab = finished_tab
+        self.stale_days = stale_days if stale_days is not None else float(os.getenv("STALE_JOB_DAYS", "7"))
+        self._local = threading.local()
+        self._init_schema()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_state (
+                    job_no TEXT PRIMARY KEY,
+                    tab TEXT NOT NULL,
+                    first_seen REAL,
+                    tab_since REAL,
+                    finished_at REAL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_job_state_tab_since ON job_state(tab, tab_since)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS tab_counts (tab TEXT PRIMARY KEY, jobs INTEGER NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS daily_new (day TEXT PRIMARY KEY, jobs INTEGER NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS finish_hist (bucket INTEGER PRIMARY KEY, jobs INTEGER NOT NULL)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS summary (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    finish_jobs INTEGER NOT NULL DEFAULT 0,
+                    finish_hours_sum REAL NOT NULL DEFAULT 0,
+                    payload TEXT
+                )""")
+            self.conn.execute("INSERT OR IGNORE INTO summary (id) VALUES (1)")
+
+    # --------------------------------------------------------------------------
+    # Incremental updates
+    # --------------------------------------------------------------------------
+
+    def _bump(self, table: str, key_col: str, key: Any, delta: int = 1):
+        self.conn.execute(
+            f"INSERT INTO {table} ({key_col}, jobs) VALUES (?, ?) "
+            f"ON CONFLICT({key_col}) DO UPDATE SET jobs = jobs + excluded.jobs",
+            (key, delta)
+        )
+
+    def _record_finish(self, first_seen: Optional[float], finished_at: float):
+        if first_seen is None:
+            return
+        hours = max(finished_at - first_seen, 0) / 3600
+        self._bump('finish_hist', 'bucket', _bucket(hours))
+        self.conn.execute(
+            "UPDATE summary SET finish_jobs = finish_jobs + 1, finish_hours_sum = finish_hours_sum + ? WHERE id = 1",
+            (hours,)
+        )
+
+    def _add_job(self, job_no: str, tab: str, first_seen: float):
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO job_state (job_no, tab, first_seen, tab_since, finished_at) VALUES (?, ?, ?, ?, ?)",
+            (job_no, tab, first_seen, first_seen, first_seen if tab == self.finished_tab else None)
+        )
+        if cur.rowcount == 0:
+            return
+        self._bump('tab_counts', 'tab', tab)
+        self._bump('daily_new', 'day', datetime.fromtimestamp(first_seen, THAILAND_TZ).strftime('%Y-%m-%d'))
+        # งานที่เห็นครั้งแรกในแท็บงานเสร็จไม่รู้เวลาเริ่ม จึงไม่นับใน histogram
+
+    def _move_job(self, job_no: str, old_tab: str, new_tab: str, ts: float):
+        row = self.conn.execute(
+            "SELECT tab, first_seen, finished_at FROM job_state WHERE job_no = ?", (job_no,)
+        ).fetchone()
+        if row is None:
+            # งานเก่าที่ยังไม่เคยอยู่ใน stats (ก่อน backfill) นับเฉพาะจำนวนต่อแท็บ
+            self.conn.execute(
+                "INSERT INTO job_state (job_no, tab, first_seen, tab_since) VALUES (?, ?, NULL, ?)",
+                (job_no, new_tab, ts)
+            )
+            self._bump('tab_counts', 'tab', new_tab)
+            return
+        current_tab, first_seen, finished_at = row
+        if current_tab == new_tab:
+            return
+        self._bump('tab_counts', 'tab', current_tab, -1)
+        self._bump('tab_counts', 'tab', new_tab)
+        if new_tab == self.finished_tab and finished_at is None:
+            finished_at = ts
+            self._record_finish(first_seen, ts)
+        self.conn.execute(
+            "UPDATE job_state SET tab = ?, tab_since = ?, finished_at = ? WHERE job_no = ?",
+            (new_tab, ts, finished_at, job_no)
+        )
+
+    def apply_changes(self, new_jobs: Iterable[Tuple[str, str, float]],
+                      moves: Iterable[Tuple[str, str, str, float]]):
+        """new_jobs: (job_no, tab, first_seen)  moves: (job_no, old_tab, new_tab, ts)"""
+        with self.conn:
+            for job_no, tab, first_seen in new_jobs:
+                self._add_job(job_no, tab, first_seen)
+            for job_no, old_tab, new_tab, ts in moves:
+                self._move_job(job_no, old_tab, new_tab, ts)
+            self._materialize()
+
+    # --------------------------------------------------------------------------
+    # Summary
+    # --------------------------------------------------------------------------
+
+    def _percentiles(self, total: int) -> Dict[str, Optional[float]]:
+        result: Dict[str, Optional[float]] = {f"p{p}": None for p in PERCENTILES}
+        if not total:
+            return result
+        targets = [(p, math.ceil(total * p / 100)) for p in PERCENTILES]
+        seen = 0
+        for bucket, jobs in self.conn.execute("SELECT bucket, jobs FROM finish_hist ORDER BY bucket"):
+            seen += jobs
+            for p, rank in targets:
+                if result[f"p{p}"] is None and seen >= rank:
+                    result[f"p{p}"] = round(_bucket_upper_hours(bucket), 2)
+        return result
+
+    def _materialize(self, now: Optional[float] = None):
+        now = now or time.time()
+        finish_jobs, hours_sum = self.conn.execute(
+            "SELECT finish_jobs, finish_hours_sum FROM summary WHERE id = 1").fetchone()
+        stale_before = now - self.stale_days * 86400
+        stale = dict(self.conn.execute(
+            "SELECT tab, COUNT(*) FROM job_state WHERE tab_since < ? AND tab IS NOT ? GROUP BY tab",
+            (stale_before, self.finished_tab)
+        ).fetchall())
+        payload = {
+            'computed_at': datetime.fromtimestamp(now, THAILAND_TZ).strftime(SHEET_TIME_FORMAT),
+            'jobs_per_tab': dict(self.conn.execute("SELECT tab, jobs FROM tab_counts WHERE jobs > 0 ORDER BY tab")),
+            'new_jobs_per_day': dict(self.conn.execute(
+                "SELECT day, jobs FROM daily_new ORDER BY day DESC LIMIT 60").fetchall()[::-1]),
+            'time_to_finish_hours': {
+                'finished_tab': self.finished_tab,
+                'jobs': finish_jobs,
+                'mean': round(hours_sum / finish_jobs, 2) if finish_jobs else None,
+                **self._percentiles(finish_jobs),
+            },
+            'stale_jobs_per_tab': stale,
+            'stale_after_days': self.stale_days,
+        }
+        self.conn.execute("UPDATE summary SET payload = ? WHERE id = 1",
+                          (json.dumps(payload, ensure_ascii=False),))
+
+    def summary(self) -> Dict[str, Any]:
+        """อ่าน aggregate ที่คำนวณไว้แล้ว (O(1))"""
+        row = self.conn.execute("SELECT payload FROM summary WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    # --------------------------------------------------------------------------
+    # Full rebuild (backfill)
+    # --------------------------------------------------------------------------
+
+    def rebuild(self, records: Iterable[Dict[str, Any]],
+                tab_entries: Optional[Dict[Tuple[str, str], Optional[float]]] = None):
+        """คำนวณใหม่ทั้งหมดจากแถวของ Master_Data (Job_No, Source_Tab, First_Seen)
+        เวลาเข้าแท็บปัจจุบันและเวลาเสร็จมาจาก tab_entries: (ชื่อแท็บ, Job_No) -> เวลาที่เข้าแท็บตามประวัติ snapshot
+        (Last_Updated คือเวลาที่พบล่าสุดจึงใช้แทนไม่ได้) งานที่ไม่มีประวัติไม่ถูกนับใน percentile และงานค้าง"""
+        tab_entries = tab_entries or {}
+        with self.conn:
+            for table in ('job_state', 'tab_counts', 'daily_new', 'finish_hist'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("UPDATE summary SET finish_jobs = 0, finish_hours_sum = 0 WHERE id = 1")
+            count = 0
+            for record in records:
+                job_no = str(record.get('Job_No', '')).strip()
+                tab = str(record.get('Source_Tab', '')).strip()
+                if not job_no or not tab:
+                    continue
+                first_seen = parse_sheet_time(record.get('First_Seen', ''))
+                tab_since = tab_entries.get((tab, job_no))
+                finished_at = tab_since if tab == self.finished_tab else None
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO job_state (job_no, tab, first_seen, tab_since, finished_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (job_no, tab, first_seen, tab_since, finished_at)
+                )
+                if cur.rowcount == 0:
+                    continue
+                count += 1
+                self._bump('tab_counts', 'tab', tab)
+                if first_seen is not None:
+                    self._bump('daily_new', 'day', datetime.fromtimestamp(first_seen, THAILAND_TZ).strftime('%Y-%m-%d'))
+                if finished_at is not None and first_seen is not None and finished_at > first_seen:
+                    self._record_finish(first_seen, finished_at)
+            self._materialize()
+        logger.info(f"📈 Rebuilt stats from {count} Master_Data rows")
+        return count
+
+    def close(self):
+        self.conn.close()
+
+
+# ==============================================================================
+# ▶️ CLI
+# ==============================================================================
+
+def main(argv: List[str]) -> int:
+    from sync_config import Config
+
+    command = argv[0] if argv else 'show'
+    store = StatsStore(finished_tab=Config.TAB_NAMES.get(Config.FINISHED_TAB))
+    if command == 'rebuild':
+        from main_master_only import GoogleSheetManager
+        from snapshot_store import SnapshotStore
+        sheet_manager = GoogleSheetManager(Config.GOOGLE_SHEET_ID, Config.GOOGLE_SVC_JSON_RAW, Config.GOOGLE_SVC_JSON_B64)
+        ws = sheet_manager.get_or_create_worksheet(Config.MASTER_SHEET_NAME)
+        tab_entries = {(Config.TAB_NAMES.get(tab, f"Tab_{tab}"), job_no): entered
+                       for (tab, job_no), entered in SnapshotStore().tab_entry_times().items()}
+        store.rebuild(ws.get_all_records(), tab_entries)
+    elif command != 'show':
+        print("usage: python stats_store.py [show|rebuild]")
+        return 2
+    print(json.dumps(store.summary(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,295 @@
+# status_store.py
+# เก็บสถานะการซิงค์, progress, logs และ run lock ไว้ใน SQLite (WAL mode)
+# เพื่อให้ทุก gunicorn worker / thread เห็นสถานะเดียวกัน
+
+import os
+import json
+import sqlite3
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "scraper_status.db"
+DEFAULT_LOG_CAPACITY = 2000
+STATUS_LOG_TAIL = 20  # จำนวน log ล่าสุดที่แนบไปกับ /api/status (ที่เหลือ tail ผ่าน /api/logs)
+
+
+class StatusStore:
+    """สถานะการทำงานที่แชร์ระหว่าง process ผ่านไฟล์ SQLite"""
+
+    _STATUS_FIELDS = ('last_run', 'last_result', 'progress')
+
+    def __init__(self, db_path: Optional[str] = None, max_logs: Optional[int] = None, lock_ttl: int = 1800,
+                 spill_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("STATUS_DB_PATH", DEFAULT_DB_PATH)
+        # logs เก็บเป็น ring buffer ขนาดคงที่: seq ใหม่เขียนทับ slot (seq % max_logs)
+        self.max_logs = max_logs or int(os.getenv("LOG_CAPACITY", DEFAULT_LOG_CAPACITY))
+        # record ที่ถูกเขียนทับจะถูกต่อท้ายไฟล์ JSONL นี้ (ว่าง = ไม่เก็บ)
+        self.spill_path = spill_path if spill_path is not None else os.getenv("LOG_SPILL_PATH", "").strip()
+        # lock ที่ไม่ได้ต่ออายุเกิน lock_ttl วินาทีถือว่าค้าง (worker ตายกลางทาง)
+        self.lock_ttl = lock_ttl
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS run_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                is_running INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lock_expires REAL NOT NULL DEFAULT 0,
+                last_run TEXT,
+                last_result TEXT,
+                progress TEXT NOT NULL DEFAULT ''
+            )""")
+        conn.execute("DROP TABLE IF EXISTS logs")  # ตาราง log แบบเดิม (ข้อความล้วน)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS log_ring (
+                slot INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                ts REAL NOT NULL,
+                levelno INTEGER NOT NULL,
+                level TEXT NOT NULL,
+                stage TEXT,
+                tab INTEGER,
+                message TEXT NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_log_ring_seq ON log_ring(seq)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS log_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_seq INTEGER NOT NULL DEFAULT 0
+            )""")
+        conn.execute("INSERT OR IGNORE INTO run_state (id) VALUES (1)")
+        conn.execute("INSERT OR IGNORE INTO log_meta (id) VALUES (1)")
+
+    @staticmethod
+    def make_owner() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+    # --------------------------------------------------------------------------
+    # Run lock (single-flight)
+    # --------------------------------------------------------------------------
+
+    def try_acquire_run(self, owner: Optional[str] = None) -> Optional[str]:
+        """จอง lock สำหรับการซิงค์แบบ atomic คืนค่า owner ถ้าสำเร็จ หรือ None ถ้ามีงานรันอยู่แล้ว"""
+        owner = owner or self.make_owner()
+        now = time.time()
+        cur = self._connect().execute(
+            "UPDATE run_state SET is_running = 1, owner = ?, lock_expires = ? "
+            "WHERE id = 1 AND (is_running = 0 OR lock_expires < ?)",
+            (owner, now + self.lock_ttl, now)
+        )
+        if cur.rowcount == 1:
+            return owner
+        return None
+
+    def heartbeat(self, owner: str) -> bool:
+        """ต่ออายุ lock ระหว่างที่ซิงค์ยังทำงานอยู่"""
+        cur = self._connect().execute(
+            "UPDATE run_state SET lock_expires = ? WHERE id = 1 AND is_running = 1 AND owner = ?",
+            (time.time() + self.lock_ttl, owner)
+        )
+        return cur.rowcount == 1
+
+    def release_run(self, owner: str, **fields: Any) -> bool:
+        """ปล่อย lock พร้อมบันทึกสถานะสุดท้าย (last_run, last_result, progress)"""
+        assignments, params = self._assignments(fields)
+        cur = self._connect().execute(
+            "UPDATE run_state SET is_running = 0, owner = NULL, lock_expires = 0"
+            + "".join(f", {a}" for a in assignments)
+            + " WHERE id = 1 AND owner = ?",
+            params + [owner]
+        )
+        return cur.rowcount == 1
+
+    # --------------------------------------------------------------------------
+    # Status & logs
+    # --------------------------------------------------------------------------
+
+    def _assignments(self, fields: Dict[str, Any]):
+        unknown = set(fields) - set(self._STATUS_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown status fields: {sorted(unknown)}")
+        return [f"{k} = ?" for k in fields], list(fields.values())
+
+    def update(self, owner: Optional[str] = None, **fields: Any):
+        """อัปเดตสถานะ ถ้าระบุ owner จะต่ออายุ lock ไปพร้อมกัน"""
+        assignments, params = self._assignments(fields)
+        if owner:
+            assignments.append("lock_expires = CASE WHEN owner = ? THEN ? ELSE lock_expires END")
+            params += [owner, time.time() + self.lock_ttl]
+        if not assignments:
+            return
+        self._connect().execute(f"UPDATE run_state SET {', '.join(assignments)} WHERE id = 1", params)
+
+    def add_log(self, message: str, level: str = 'INFO', stage: Optional[str] = None,
+                tab: Optional[int] = None, ts: Optional[float] = None) -> int:
+        """เพิ่ม log record ลง ring buffer คืนค่า seq ของ record"""
+        ts = ts or time.time()
+        level = level.upper()
+        levelno = logging.getLevelName(level)
+        if not isinstance(levelno, int):
+            levelno = logging.INFO
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT last_seq FROM log_meta WHERE id = 1").fetchone()[0] + 1
+            slot = seq % self.max_logs
+            evicted = None
+            if self.spill_path:
+                evicted = conn.execute(
+                    "SELECT seq, ts, level, stage, tab, message FROM log_ring WHERE slot = ?", (slot,)
+                ).fetchone()
+            conn.execute("UPDATE log_meta SET last_seq = ? WHERE id = 1", (seq,))
+            conn.execute(
+                "INSERT OR REPLACE INTO log_ring (slot, seq, ts, levelno, level, stage, tab, message) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (slot, seq, ts, levelno, level, stage, tab, message)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            self._spill(dict(zip(('seq', 'ts', 'level', 'stage', 'tab', 'message'), evicted)))
+        return seq
+
+    def _spill(self, record: Dict[str, Any]):
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning(f"⚠️ Could not spill log record to '{self.spill_path}': {e}")
+
+    @staticmethod
+    def format_log(ts: float, message: str) -> str:
+        return f"[{datetime.fromtimestamp(ts).strftime('%H:%M:%S')}] {message}"
+
+    def get_logs(self, limit: Optional[int] = None) -> List[str]:
+        """log ในรูปแบบข้อความ '[HH:MM:SS] message' เรียงจากเก่าไปใหม่ (limit = เฉพาะ N รายการล่าสุด)"""
+        rows = self._connect().execute(
+            "SELECT ts, message FROM (SELECT seq, ts, message FROM log_ring ORDER BY seq DESC LIMIT ?) ORDER BY seq",
+            (limit or self.max_logs,)
+        ).fetchall()
+        return [self.format_log(ts, message) for ts, message in rows]
+
+    def last_log_seq(self) -> int:
+        return self._connect().execute("SELECT last_seq FROM log_meta WHERE id = 1").fetchone()[0]
+
+    def logs_after(self, after: int = 0, level: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+        """record ที่มี seq > after (และระดับ >= level) สำหรับ tail แบบ incremental
+        truncated = True ถ้ามี record ที่ถูกเขียนทับไปแล้วระหว่าง after กับ record แรกที่ยังอยู่"""
+        conn = self._connect()
+        min_levelno = logging.getLevelName(level.upper()) if level else logging.NOTSET
+        if not isinstance(min_levelno, int):
+            raise ValueError(f"Unknown log level: {level}")
+        # อ่าน last_seq ก่อน เพื่อไม่ให้ cursor ข้าม record ที่เขียนเข้ามาระหว่าง query
+        last_seq = self.last_log_seq()
+        rows = conn.execute(
+            "SELECT seq, ts, level, stage, tab, message FROM log_ring WHERE seq > ? AND seq <= ? AND levelno >= ? "
+            "ORDER BY seq LIMIT ?", (after, last_seq, min_levelno, limit)
+        ).fetchall()
+        oldest = conn.execute("SELECT MIN(seq) FROM log_ring").fetchone()[0]
+        records = [dict(zip(('seq', 'ts', 'level', 'stage', 'tab', 'message'), row)) for row in rows]
+        for record in records:
+            record['text'] = self.format_log(record['ts'], record['message'])
+        return {
+            'logs': records,
+            # client ใช้ค่า cursor นี้เป็น after ครั้งถัดไป (ถ้าถูกตัดด้วย limit จะเป็น seq สุดท้ายที่ได้)
+            'cursor': records[-1]['seq'] if records and len(records) == limit else last_seq,
+            'last_seq': last_seq,
+            'truncated': oldest is not None and after + 1 < oldest,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """คืนค่าสถานะในรูปแบบเดียวกับ scraping_status dict เดิม"""
+        row = self._connect().execute(
+            "SELECT is_running, lock_expires, last_run, last_result, progress FROM run_state WHERE id = 1"
+        ).fetchone()
+        is_running, lock_expires, last_run, last_result, progress = row
+        return {
+            'is_running': bool(is_running) and lock_expires >= time.time(),
+            'last_run': last_run,
+            'last_result': last_result,
+            'progress': progress,
+            'logs': self.get_logs(STATUS_LOG_TAIL),
+            'last_log_seq': self.last_log_seq()
+        }
+
+
+class RunHeartbeat:
+    """เธรดที่ต่ออายุ run lock ทุก lock_ttl/3 วินาทีตลอดการซิงค์ (ซิงค์ที่นานกว่า lock_ttl ไม่เสีย lock)
+    ถ้าต่ออายุไม่สำเร็จ (lock ถูก worker อื่นจองไปแล้ว) จะตั้ง event `lost` ให้การซิงค์หยุดกลางทาง"""
+
+    def __init__(self, store: StatusStore, owner: str, interval: Optional[float] = None):
+        self.store = store
+        self.owner = owner
+        self.interval = interval or store.lock_ttl / 3
+        self.lost = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'RunHeartbeat':
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="run-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                renewed = self.store.heartbeat(self.owner)
+            except Exception as e:
+                # เช่น database locked ชั่วคราว: lock ยังไม่หมดอายุ ลองใหม่รอบถัดไป
+                logger.warning(f"⚠️ Could not renew the run lock: {e}")
+                continue
+            if not renewed:
+                logger.error(f"❌ Run lock of {self.owner} was lost; aborting the sync")
+                self.lost.set()
+                return
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'RunHeartbeat':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StatusLogHandler(logging.Handler):
+    """ส่ง log ของ logger อื่น (เช่นการซิงค์) เข้า ring buffer ของ StatusStore
+    ใช้ extra={'stage': ..., 'tab': ...} เพื่อระบุขั้นตอนและแท็บ"""
+
+    def __init__(self, store: StatusStore, level: int = logging.INFO, default_stage: Optional[str] = None):
+        super().__init__(level)
+        self.store = store
+        self.default_stage = default_stage
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.store.add_log(record.getMessage(), level=record.levelname,
+                               stage=getattr(record, 'stage', self.default_stage),
+                               tab=getattr(record, 'tab', None), ts=record.created)
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,147 @@
+# sync_checkpoint.py
+# checkpoint ต่อขั้นตอนของการซิงค์ (แท็บที่ scrape แล้ว และแท็บที่ประมวลผลลง journal แล้ว)
+# ถ้ารอบก่อนล้มกลางทาง รอบถัดไปจะทำต่อเฉพาะส่วนที่ยังขาด แทนการเริ่มใหม่ทั้งหมด
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "sync_checkpoint.db"
+
+
+def pack_frame(df: pd.DataFrame) -> bytes:
+    """frame ของแท็บเป็น blob (ค่าเป็น string แบบเดียวกับที่ขั้นตอนประมวลผลใช้)"""
+    return SyncCheckpoint._pack({'columns': [str(c) for c in df.columns],
+                                 'rows': df.astype(str).values.tolist()})
+
+
+def unpack_frame(blob: bytes) -> pd.DataFrame:
+    data = SyncCheckpoint._unpack(blob)
+    return pd.DataFrame(data['rows'], columns=data['columns'])
+
+
+class SyncCheckpoint:
+    """เก็บ checkpoint ของการซิงค์ที่ยังไม่เสร็จใน SQLite
+
+    ขั้นตอนต่อแท็บ: scraped (เก็บ frame ไว้) -> processed (change set อยู่ใน journal แล้ว ดู sheet_journal.py)
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_age_minutes: Optional[float] = None):
+        self.db_path = db_path or os.getenv("CHECKPOINT_DB_PATH", DEFAULT_DB_PATH)
+        self.max_age = (max_age_minutes if max_age_minutes is not None
+                        else float(os.getenv("CHECKPOINT_MAX_AGE_MINUTES", "120"))) * 60
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self.run_key: Optional[str] = None
+        self._init_schema()
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_runs (
+                    run_key TEXT PRIMARY KEY,
+                    started_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_tabs (
+                    run_key TEXT NOT NULL REFERENCES checkpoint_runs(run_key) ON DELETE CASCADE,
+                    tab INTEGER NOT NULL,
+                    scan_mode TEXT,
+                    row_count INTEGER NOT NULL,
+                    payload BLOB NOT NULL,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (run_key, tab)
+                )""")
+            # change set ที่กำลังเขียนย้ายไปอยู่ใน write-ahead journal แล้ว
+            self.conn.execute("DROP TABLE IF EXISTS checkpoint_pending")
+
+    @staticmethod
+    def _pack(obj: Any) -> bytes:
+        return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+
+    @staticmethod
+    def _unpack(blob: bytes) -> Any:
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def _touch(self):
+        self.conn.execute("UPDATE checkpoint_runs SET updated_at = ? WHERE run_key = ?", (time.time(), self.run_key))
+
+    # --------------------------------------------------------------------------
+    # Run lifecycle
+    # --------------------------------------------------------------------------
+
+    def open_run(self) -> bool:
+        """ทำต่อจากรอบที่ยังไม่เสร็จ (ถ้ายังไม่เก่าเกิน max_age) หรือเริ่มรอบใหม่ คืน True ถ้าเป็นการ resume"""
+        now = time.time()
+        with self._lock, self.conn:
+            # checkpoint ที่เก่าเกินไปใช้ต่อไม่ได้แล้ว (ข้อมูลบนเว็บเปลี่ยนไปมาก)
+            stale = [r for (r,) in self.conn.execute(
+                "SELECT run_key FROM checkpoint_runs WHERE completed = 1 OR updated_at < ?", (now - self.max_age,))]
+            for run_key in stale:
+                self._delete(run_key)
+            row = self.conn.execute(
+                "SELECT run_key FROM checkpoint_runs WHERE completed = 0 ORDER BY started_at DESC LIMIT 1").fetchone()
+            if row:
+                self.run_key = row[0]
+                self._touch()
+                return True
+            self.run_key = f"{int(now * 1000):x}"
+            self.conn.execute("INSERT INTO checkpoint_runs (run_key, started_at, updated_at) VALUES (?, ?, ?)",
+                              (self.run_key, now, now))
+            return False
+
+    def complete_run(self):
+        """ทุกแท็บเขียนลงชีตครบแล้ว ลบ checkpoint ของรอบนี้"""
+        with self._lock, self.conn:
+            self._delete(self.run_key)
+        self.run_key = None
+
+    def _delete(self, run_key: str):
+        for table in ("checkpoint_tabs", "checkpoint_runs"):
+            self.conn.execute(f"DELETE FROM {table} WHERE run_key = ?", (run_key,))
+
+    # --------------------------------------------------------------------------
+    # Stage 1: scraped tabs
+    # --------------------------------------------------------------------------
+
+    def save_tab(self, tab: int, df: pd.DataFrame, scan_mode: Optional[str] = None):
+        """เก็บ frame ของแท็บที่ scrape สำเร็จ"""
+        payload = pack_frame(df)
+        with self._lock, self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO checkpoint_tabs (run_key, tab, scan_mode, row_count, payload, processed)
+                VALUES (?, ?, ?, ?, ?, 0)""", (self.run_key, tab, scan_mode, len(df), payload))
+            self._touch()
+
+    def scraped_tabs(self) -> Dict[int, Dict[str, Any]]:
+        """{tab: {'scan_mode', 'row_count', 'processed'}} ของแท็บที่ scrape แล้วในรอบนี้"""
+        return {tab: {'scan_mode': mode, 'row_count': count, 'processed': bool(processed)}
+                for tab, mode, count, processed in self.conn.execute(
+                    "SELECT tab, scan_mode, row_count, processed FROM checkpoint_tabs WHERE run_key = ?",
+                    (self.run_key,))}
+
+    def load_tab(self, tab: int) -> pd.DataFrame:
+        row = self.conn.execute("SELECT payload FROM checkpoint_tabs WHERE run_key = ? AND tab = ?",
+                                (self.run_key, tab)).fetchone()
+        if row is None:
+            return pd.DataFrame()
+        return unpack_frame(row[0])
+
+    def mark_processed(self, tabs: List[int]):
+        """change set ของแท็บเหล่านี้ถูกบันทึกลง journal แล้ว (เขียนลงชีตต่อเองแม้ process ตาย)"""
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE checkpoint_tabs SET processed = 1 WHERE run_key = ? AND tab = ?",
+                                  [(self.run_key, tab) for tab in tabs])
+            self._touch()
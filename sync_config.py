@@ -0,0 +1,68 @@
+# sync_config.py
+# การตั้งค่าของการซิงค์ (ค่าคงที่ + ค่าจาก environment) แยกจาก main_master_only
+# เพื่อให้ app.py และ CLI ที่ต้องการแค่ค่าตั้งค่าไม่ต้อง import pandas/gspread/selenium ตอนเริ่มต้น
+
+import os
+from typing import Dict, List
+
+
+class Config:
+    """เก็บการตั้งค่าทั้งหมดของโปรแกรมไว้ในที่เดียว"""
+    # Target Website
+    BASE_URL = "https://jobm.edoclite.com/jobManagement"
+    LOGIN_URL = f"{BASE_URL}/pages/login"
+    INDEX_URL = f"{BASE_URL}/pages/index"
+    TABS_TO_SCRAPE: List[int] = [13, 14, 15, 8, 7, 11]
+    TAB_NAMES: Dict[int, str] = {
+        13: "งานใหม่_แจ้งศูนย์อื่น",
+        14: "อยู่ระหว่างดำเนินการ_แจ้งศูนย์อื่น", 
+        15: "รอตรวจสอบ_แจ้งศูนย์อื่น",
+        8: "งานใหม่_ภายในศูนย์",
+        7: "อยู่ระหว่างดำเนินการ_ภายในศูนย์",
+        11: "งานเสร็จ_ภายในศูนย์"
+    }
+
+    # Credentials (from Environment Variables)
+    EDOCLITE_USER = os.getenv("EDOCLITE_USER", "").strip()
+    EDOCLITE_PASS = os.getenv("EDOCLITE_PASS", "").strip()
+    GOOGLE_SHEET_ID = os.getenv("GOOGLE_SHEET_ID", "").strip()
+    GOOGLE_SVC_JSON_RAW = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON", "").strip()
+    GOOGLE_SVC_JSON_B64 = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON_B64", "").strip()
+    LINE_NOTIFY_TOKEN = os.getenv("LINE_NOTIFY_TOKEN", "").strip()
+
+    # Browser
+    # LEAN_BROWSER=1 บล็อกรูป/ฟอนต์/CSS/tracker และใช้ flags ประหยัดหน่วยความจำ
+    LEAN_BROWSER = os.getenv("LEAN_BROWSER", "").strip().lower() in ("1", "true", "yes")
+
+    # Incremental scraping (แท็บงานใหม่: เรียงใหม่สุดก่อน แล้วหยุดเมื่อเจอหน้าที่รู้จักทั้งหมด)
+    INCREMENTAL_TABS: List[int] = [int(t) for t in os.getenv("INCREMENTAL_TABS", "13,8").split(",") if t.strip()]
+    INCREMENTAL_PAGE_SIZE = int(os.getenv("INCREMENTAL_PAGE_SIZE", "50"))
+    INCREMENTAL_SORT_COLUMN = os.getenv("INCREMENTAL_SORT_COLUMN", "").strip()  # ว่าง = คอลัมน์ Job No.
+    FULL_SCAN_INTERVAL_HOURS = float(os.getenv("FULL_SCAN_INTERVAL_HOURS", "6"))
+    # Change probe: อ่านแค่บรรทัด info (จำนวนงาน) + Job_No หน้าแรกก่อน ถ้าตรงกับรอบก่อนจะไม่โหลดทั้งแท็บ
+    # (ยังบังคับ scan เต็มทุก FULL_SCAN_INTERVAL_HOURS เพื่อจับการแก้ไขข้อมูลในแถวเดิม)
+    CHANGE_PROBE = os.getenv("CHANGE_PROBE", "1").strip().lower() in ("1", "true", "yes")
+
+    # Checkpoint/retry: แท็บที่ล้มเหลวจะถูกลองใหม่ในรอบเดียวกันก่อนสรุปว่าเป็น Partial Success
+    TAB_RETRY_ATTEMPTS = int(os.getenv("TAB_RETRY_ATTEMPTS", "2"))
+    TAB_RETRY_BACKOFF = float(os.getenv("TAB_RETRY_BACKOFF", "10"))  # วินาที (เพิ่มขึ้นทีละเท่าในแต่ละครั้ง)
+    WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "200"))  # จำนวน cell ต่อ batch update
+    # Write-ahead journal: change set ถูก fsync ลงไฟล์ก่อน แล้วเธรด drain ทยอยเขียนลงชีต (ดู sheet_journal.py)
+    JOURNAL_DRAIN_INTERVAL = float(os.getenv("JOURNAL_DRAIN_INTERVAL", "2"))  # วินาทีระหว่างรอบ drain
+    JOURNAL_FLUSH_TIMEOUT = float(os.getenv("JOURNAL_FLUSH_TIMEOUT", "300"))  # วินาทีที่รอ drain ตอนจบรอบ
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "1"))  # แท็บที่ scrape แล้วรอเขียนได้สูงสุดกี่แท็บ
+    # Last seen: ทุกรอบบันทึกเวลาที่พบงานไว้ในเครื่อง (ดู last_seen.py) ส่วนคอลัมน์ Last_Updated เขียนเป็นก้อนทุกกี่ชั่วโมง (0 = ทุกรอบ)
+    LAST_SEEN_MATERIALIZE_HOURS = float(os.getenv("LAST_SEEN_MATERIALIZE_HOURS", "24"))
+
+    # Multi-node: ตั้ง SHARD_DB_PATH เป็นไฟล์ที่ทุก node เข้าถึงได้ เพื่อแบ่งแท็บให้หลาย node ช่วยกัน scrape
+    SHARD_DB_PATH = os.getenv("SHARD_DB_PATH", "").strip()  # ว่าง = node เดียว (แบบเดิม)
+    SHARD_LEASE_TTL = float(os.getenv("SHARD_LEASE_TTL", "120"))  # วินาทีที่ lease ไม่ต่ออายุแล้วถือว่า node ตาย
+    SHARD_POLL_INTERVAL = float(os.getenv("SHARD_POLL_INTERVAL", "5"))  # วินาทีระหว่างการรอแท็บ/ผลจาก node อื่น
+
+    # Analytics: แท็บที่ถือว่างานเสร็จแล้ว (ใช้คำนวณเวลาจาก First_Seen ถึงงานเสร็จ)
+    FINISHED_TAB = int(os.getenv("FINISHED_TAB", "11"))
+
+    # Google Sheets
+    GOOGLE_API_SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    MASTER_SHEET_NAME = "Master_Data"
+    LOG_SHEET_NAME = "Sync_Logs"
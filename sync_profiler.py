@@ -0,0 +1,276 @@
+# sync_profiler.py
+# โหมด profiling แบบเลือกเปิดต่อรอบ: sampling CPU/wall profile ของทุกเธรดของการซิงค์ + snapshot การจองหน่วยความจำ
+# ผลลัพธ์เก็บต่อ profile id ในโฟลเดอร์ PROFILE_DIR (ดูเป็นตาราง top-N หรือดาวน์โหลดไฟล์ดิบได้)
+#
+# วิธีใช้: python sync_profiler.py list
+#         python sync_profiler.py show <profile_id> --top 30
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import sysconfig
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = "profiles"
+# เธรดที่การซิงค์สร้างขึ้นเอง (producer ของ scraper และตัวโหลด index งานเดิม)
+SYNC_THREAD_PREFIXES = ('scrape-producer', 'existing-jobs')
+PROFILE_ID_RE = re.compile(r'^\d{8}-\d{6}(-\d+)?$')
+# ไฟล์ที่ดาวน์โหลดได้ของแต่ละ profile
+PROFILE_FILES = {
+    'json': '{id}.json',              # สรุป top-N
+    'folded': '{id}.folded',          # collapsed stacks (ใช้กับ flamegraph.pl / speedscope)
+    'tracemalloc': '{id}.tracemalloc',  # tracemalloc.Snapshot.load()
+}
+
+
+def profiling_requested(flag: Optional[str] = None) -> bool:
+    """เปิด profiling ถ้า flag (เช่น ?profile=1) หรือ env SYNC_PROFILE เป็นจริง"""
+    value = flag if flag is not None else os.getenv("SYNC_PROFILE", "")
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+_STDLIB_DIR = sysconfig.get_paths()['stdlib'] + os.sep
+
+
+def _short_path(filename: str) -> str:
+    for marker in ('site-packages' + os.sep, 'dist-packages' + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    if filename.startswith(_STDLIB_DIR):
+        return filename[len(_STDLIB_DIR):]
+    return os.path.relpath(filename) if os.path.isabs(filename) else filename
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """เก็บ stack ของเธรดเป้าหมายทุก interval วินาทีด้วย sys._current_frames()
+    นับเวลาตามนาฬิกาจริง (รวมเวลารอ network ของ Selenium/gspread) และไม่ต้อง instrument ทุก function call"""
+
+    def __init__(self, interval: float = 0.005, thread_prefixes: Iterable[str] = SYNC_THREAD_PREFIXES):
+        self.interval = interval
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._owner_ident: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _targets(self) -> set:
+        idents = {self._owner_ident}
+        for thread in threading.enumerate():
+            if thread.name.startswith(self.thread_prefixes):
+                idents.add(thread.ident)
+        return idents
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            targets = self._targets()
+            for ident, frame in sys._current_frames().items():
+                if ident not in targets:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._owner_ident = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sync-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def top(self, n: int = 30) -> List[Dict[str, Any]]:
+        """function ที่ใช้เวลามากสุด: self = อยู่บนสุดของ stack, cumulative = อยู่ที่ใดก็ได้ใน stack"""
+        self_counts: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                cumulative[label] += count
+        total = max(self.samples, 1)
+        return [{'function': label,
+                 'self_s': round(self_counts[label] * self.interval, 3),
+                 'cumulative_s': round(count * self.interval, 3),
+                 'self_pct': round(100.0 * self_counts[label] / total, 1),
+                 'cumulative_pct': round(100.0 * count / total, 1)}
+                for label, count in cumulative.most_common(n)]
+
+    def folded(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class SyncProfiler:
+    """context manager ที่ครอบการซิงค์หนึ่งรอบ แล้วบันทึกผลลง PROFILE_DIR/<profile_id>.*"""
+
+    def __init__(self, profile_dir: Optional[str] = None, interval: Optional[float] = None,
+                 top_n: int = 50, trace_frames: int = 10):
+        self.profile_dir = profile_dir or os.getenv("PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        self.top_n = top_n
+        self.trace_frames = trace_frames
+        self.profile_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.sampler = SamplingProfiler(interval or float(os.getenv("PROFILE_INTERVAL", "0.005")))
+        self.meta: Dict[str, Any] = {}
+        self._started = 0.0
+        self._owns_tracemalloc = False
+
+    def __enter__(self) -> 'SyncProfiler':
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base, n = self.profile_id, 1
+        while os.path.exists(self.path('json')):
+            self.profile_id = f"{base}-{n}"
+            n += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        self.sampler.start()
+        logger.info(f"🔬 Profiling sync as {self.profile_id}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.sampler.stop()
+        duration = time.perf_counter() - self._started
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),  # label ของ stack ที่ sampler เก็บไว้เอง
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            self._save(snapshot, duration, current, peak, failed=exc_type is not None)
+        except Exception as e:
+            logger.error(f"❌ Failed to save profile {self.profile_id}: {e}")
+        finally:
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        return False
+
+    def path(self, kind: str) -> str:
+        return os.path.join(self.profile_dir, PROFILE_FILES[kind].format(id=self.profile_id))
+
+    def _save(self, snapshot: tracemalloc.Snapshot, duration: float, current: int, peak: int, failed: bool):
+        allocations = [{'location': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                        'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                       for stat in snapshot.statistics('lineno')[:self.top_n]]
+        summary = {
+            'profile_id': self.profile_id,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'duration_s': round(duration, 2),
+            'failed': failed,
+            'samples': self.sampler.samples,
+            'interval_s': self.sampler.interval,
+            'traced_current_mb': round(current / 1024 / 1024, 2),
+            'traced_peak_mb': round(peak / 1024 / 1024, 2),
+            'meta': self.meta,
+            'cpu': self.sampler.top(self.top_n),
+            'memory': allocations,
+        }
+        with open(self.path('folded'), 'w', encoding='utf-8') as f:
+            f.write(self.sampler.folded())
+        snapshot.dump(self.path('tracemalloc'))
+        # เขียน json เป็นไฟล์สุดท้าย: มี json = profile ครบแล้ว
+        with open(self.path('json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        logger.info(f"🔬 Profile {self.profile_id} saved: {self.sampler.samples} samples, "
+                    f"peak traced memory {summary['traced_peak_mb']}MB")
+
+
+# ------------------------------------------------------------------------------
+# Read side (API / CLI)
+# ------------------------------------------------------------------------------
+
+def _profile_dir(profile_dir: Optional[str] = None) -> str:
+    return profile_dir or os.getenv("PROFILE_DIR", DEFAULT_PROFILE_DIR)
+
+
+def profile_file(profile_id: str, kind: str, profile_dir: Optional[str] = None) -> Optional[str]:
+    """path ของไฟล์ profile หรือ None ถ้า id/kind ไม่ถูกต้องหรือไม่มีไฟล์"""
+    if kind not in PROFILE_FILES or not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(_profile_dir(profile_dir), PROFILE_FILES[kind].format(id=profile_id))
+    return path if os.path.exists(path) else None
+
+
+def load_profile(profile_id: str, top: Optional[int] = None, profile_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    path = profile_file(profile_id, 'json', profile_dir)
+    if path is None:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    if top:
+        summary['cpu'] = summary['cpu'][:top]
+        summary['memory'] = summary['memory'][:top]
+    return summary
+
+
+def list_profiles(profile_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """profile ทั้งหมด ใหม่สุดก่อน (เฉพาะข้อมูลสรุป ไม่รวมตาราง)"""
+    directory = _profile_dir(profile_dir)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        profile_id, ext = os.path.splitext(name)
+        if ext != '.json' or not PROFILE_ID_RE.match(profile_id):
+            continue
+        summary = load_profile(profile_id, profile_dir=directory)
+        if summary:
+            profiles.append({k: v for k, v in summary.items() if k not in ('cpu', 'memory')})
+    return profiles
+
+
+def _print_table(rows: List[Dict[str, Any]], columns: List[Tuple[str, str]]):
+    print("  ".join(title for _, title in columns))
+    for row in rows:
+        print("  ".join(str(row[key]) for key, _ in columns))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Sync profiles")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='list stored profiles')
+    show = sub.add_parser('show', help='show the top-N CPU and memory tables of one profile')
+    show.add_argument('profile_id')
+    show.add_argument('--top', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for p in list_profiles():
+            print(f"{p['profile_id']}  {p['duration_s']:>8.1f}s  samples={p['samples']}  "
+                  f"peak={p['traced_peak_mb']}MB{'  (failed)' if p['failed'] else ''}")
+        return
+    summary = load_profile(args.profile_id, args.top)
+    if summary is None:
+        print(f"❌ Profile not found: {args.profile_id}")
+        sys.exit(1)
+    print(f"🔬 {summary['profile_id']}: {summary['duration_s']}s, {summary['samples']} samples\n")
+    _print_table(summary['cpu'], [('cumulative_s', 'cum_s'), ('self_s', 'self_s'), ('function', 'function')])
+    print()
+    _print_table(summary['memory'], [('size_kb', 'KB'), ('count', 'blocks'), ('location', 'location')])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+
+from asset_cache import AssetCache
+
+
+def test_template_rerenders_when_referenced_asset_changes(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    script = static / "dashboard.js"
+    script.write_text("console.log('v1');")
+    template = tmp_path / "page.html"
+    template.write_text("<script src='dashboard.js?v={v}'></script>")
+
+    cache = AssetCache(str(static))
+    renders = []
+
+    def render():
+        renders.append(1)
+        return template.read_text().format(v=cache.version('dashboard.js'))
+
+    first = cache.template('page.html', str(template), render)
+    assert cache.template('page.html', str(template), render) is first
+    assert len(renders) == 1
+
+    script.write_text("console.log('v2');")
+    stat = os.stat(script)
+    os.utime(script, (stat.st_atime, stat.st_mtime + 10))
+
+    second = cache.template('page.html', str(template), render)
+    assert len(renders) == 2
+    assert second.etag != first.etag
+    assert cache.version('dashboard.js').encode() in second.encoded['identity']
@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip("gspread")
+pytest.importorskip("pytz")
+
+from cleanup_sheets import build_repair_plan, build_job_column_plan, apply_plan
+
+HEADERS = ['Source_Tab', 'Job No.', 'Job_No', 'First_Seen', 'Last_Updated', 'Detail']
+
+
+def test_duplicate_jobs_keep_latest_row_and_earliest_first_seen():
+    values = [HEADERS,
+              ['Open', '', 'A', '05/01/2026 08:00:00', '06/01/2026 08:00:00', 'old'],
+              ['', '', '', '', '', ''],
+              ['Done', 'B', '', '02/01/2026 08:00:00', '03/01/2026 08:00:00', 'b'],
+              ['Done', '', 'A', '04/01/2026 08:00:00', '09/01/2026 08:00:00', 'new'],
+              ['Open', '', 'A', '01/01/2026 08:00:00', '07/01/2026 08:00:00', 'older']]
+
+    plan = build_repair_plan(values)
+
+    assert plan.values == [
+        ['Job_No', 'First_Seen', 'Last_Updated', 'Source_Tab', 'Detail'],
+        ['A', '01/01/2026 08:00:00', '09/01/2026 08:00:00', 'Done', 'new'],
+        ['B', '02/01/2026 08:00:00', '03/01/2026 08:00:00', 'Done', 'b'],
+    ]
+    assert plan.removed_job_columns == ['Job No.']
+    assert plan.empty_rows == [3]
+    assert plan.duplicate_rows == [('A', 5, [2, 6])]
+    assert plan.reordered
+    assert plan.has_changes
+
+
+def test_clean_sheet_has_no_changes():
+    values = [['Job_No', 'First_Seen', 'Last_Updated', 'Source_Tab', 'Detail'],
+              ['A', '01/01/2026 08:00:00', '02/01/2026 08:00:00', 'Open', 'a']]
+
+    plan = build_repair_plan(values)
+
+    assert not plan.has_changes
+    assert plan.duplicate_rows == [] and plan.empty_rows == []
+
+
+def test_job_column_plan_only_drops_duplicate_columns():
+    values = [HEADERS,
+              ['Open', '', 'A', '', '', 'a'],
+              ['Done', 'B', '', '', '', 'b'],
+              ['Open', '', 'A', '', '', 'again']]
+
+    plan = build_job_column_plan(values)
+
+    assert plan.values == [['Source_Tab', 'Job_No', 'First_Seen', 'Last_Updated', 'Detail'],
+                           ['Open', 'A', '', '', 'a'],
+                           ['Done', 'B', '', '', 'b'],
+                           ['Open', 'A', '', '', 'again']]
+    assert plan.removed_job_columns == ['Job No.']
+
+
+class FakeWorksheet:
+    def __init__(self, rows, cols):
+        self.row_count, self.col_count = rows, cols
+        self.calls = []
+
+    def add_cols(self, count):
+        self.col_count += count
+
+    def update(self, start, values, value_input_option=None):
+        self.calls.append(('update', start, values))
+
+    def resize(self, rows, cols):
+        self.calls.append(('resize', rows, cols))
+
+
+def test_apply_plan_blanks_old_area_before_shrinking():
+    headers = ['Job_No', 'First_Seen', 'Last_Updated', 'Source_Tab', 'Job No.']
+    plan = build_repair_plan([headers, ['A', '', '', 'Open', ''], ['A', '', '', 'Done', 'A']])
+    worksheet = FakeWorksheet(rows=5, cols=5)
+
+    apply_plan(worksheet, plan)
+
+    (op, start, values), resize = worksheet.calls
+    assert (op, start) == ('update', 'A1')
+    # one update covers the old 5x5 area: the dropped row and column are blanked
+    assert values == [headers[:4] + [''], ['A', '', '', 'Done', '']] + [[''] * 5] * 3
+    assert resize == ('resize', 2, 4)
@@ -0,0 +1,82 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("gspread")
+pytest.importorskip("selenium")
+
+from job_index import JobIndex
+from main_master_only import JobSyncApplication
+from schema_registry import SchemaRegistry
+from sheet_journal import SheetJournal
+
+MASTER = 'Master_Data'
+HEADERS = ['Job_No', 'First_Seen', 'Last_Updated', 'Source_Tab', 'Detail']
+SOURCE_TAB_COL = 4
+
+
+class FakeSheetManager:
+    def __init__(self, tmp_path, sheet_rows):
+        self.sheet_rows = sheet_rows  # [(row, job_no, source_tab)]
+        self.schema_registry = SchemaRegistry(path=str(tmp_path / "schemas.json"))
+        self.updates = []
+        self.appended = []
+
+    def get_job_data_with_positions(self, sheet_name, strict=False):
+        return JobIndex.from_rows(self.sheet_rows, source_tab_col=SOURCE_TAB_COL)
+
+    def batch_update_cells(self, sheet_name, cells):
+        self.updates.extend(cells)
+
+    def append_rows(self, sheet_name, rows):
+        self.appended.extend(rows)
+        return True
+
+
+def make_app(tmp_path, sheet_rows):
+    app = JobSyncApplication.__new__(JobSyncApplication)
+    app.config = SimpleNamespace(MASTER_SHEET_NAME=MASTER, WRITE_BATCH_SIZE=100)
+    app.cancelled = threading.Event()
+    app.shards = None
+    app.journal = SheetJournal(path=str(tmp_path / "journal.jsonl"))
+    app.sheet_manager = FakeSheetManager(tmp_path, sheet_rows)
+    app._ensure_master_headers = lambda data_headers: HEADERS
+    app.search_index = SimpleNamespace(apply_changes=lambda records, moves: None)
+    app.stats_store = SimpleNamespace(apply_changes=lambda new_jobs, moves: None)
+    app.notifier = SimpleNamespace(send=lambda message: None)
+    return app
+
+
+def changes(cells=(), records=()):
+    return {'cell_updates': list(cells), 'new_records': list(records), 'data_headers': ['Detail'],
+            'stats_new_jobs': [], 'stats_moves': [], 'notifications': []}
+
+
+def test_move_of_pending_append_is_folded_into_the_appended_row(tmp_path):
+    app = make_app(tmp_path, sheet_rows=[(2, 'A', 'Open')])
+    app.journal.record("run-1", [1], changes(records=[{'Job_No': 'N', 'Source_Tab': 'Open', 'Detail': 'x'}]))
+    # the job moved tabs before its append reached the sheet: row still unknown
+    app.journal.record("run-1", [5], changes(cells=[(0, SOURCE_TAB_COL, 'Done', 'N')]))
+
+    app._drain_journal()
+
+    assert app.sheet_manager.updates == []
+    assert app.sheet_manager.appended == [['N', '', '', 'Done', 'x']]
+    assert app.journal.pending_count() == 0
+    app.journal.close()
+
+
+def test_move_after_append_is_resolved_by_job_no(tmp_path):
+    app = make_app(tmp_path, sheet_rows=[(2, 'A', 'Open'), (7, 'N', 'Open')])
+    app.journal.record("run-1", [5], changes(cells=[(0, SOURCE_TAB_COL, 'Done', 'N'),
+                                                    (0, SOURCE_TAB_COL, 'Done', 'GONE')]))
+
+    app._drain_journal()
+
+    # N was appended by an earlier drain; GONE was removed from the sheet since
+    assert app.sheet_manager.updates == [[7, SOURCE_TAB_COL, 'Done']]
+    assert app.sheet_manager.appended == []
+    assert app.journal.pending_count() == 0
+    app.journal.close()
@@ -0,0 +1,39 @@
+from job_index import JobIndex
+
+
+def test_from_rows_strips_and_keeps_last_duplicate():
+    index = JobIndex.from_rows([(2, ' A ', 'Open'), (3, '', 'Open'), (4, 'B', 'Open'), (5, 'A', 'Done')],
+                               source_tab_col=4)
+
+    assert len(index) == 2
+    assert ' A ' not in index
+    assert index.row('A') == 5
+    assert index.status('A') == 'Done'
+    assert index.source_tab_col == 4
+    assert sorted(index.items()) == [('A', 5, 'Done'), ('B', 4, 'Open')]
+
+
+def test_move_updates_tab_lookup():
+    index = JobIndex.from_rows([(2, 'A', 'Open'), (3, 'B', 'Open')])
+
+    index.set_status('A', 'Done')
+
+    assert index.jobs_in('Open') == {'B'}
+    assert index.jobs_in('Done') == {'A'}
+    assert index.jobs_in('Unknown') == set()
+    assert index.row('A') == 2
+
+
+def test_pending_append_has_no_row_until_written():
+    index = JobIndex.from_rows([(2, 'A', 'Open')])
+    index.add('N', 0, 'Open')  # new job whose append is still in the journal
+
+    assert 'N' in index
+    assert index.row('N') is None
+    assert index.row('missing') is None
+    index.set_status('N', 'Done')
+    assert index.jobs_in('Done') == {'N'}
+
+    index.add('N', 7, 'Done')  # re-indexed after the append landed
+    assert index.row('N') == 7
+    assert len(index) == 2
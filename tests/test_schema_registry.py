@@ -0,0 +1,59 @@
+from schema_registry import SchemaRegistry, JOB_NO, SOURCE_TAB
+
+
+def make_registry(tmp_path):
+    return SchemaRegistry(path=str(tmp_path / "schema_registry.json"))
+
+
+def test_resolve_reports_external_header_changes(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.resolve("sheet:Master_Data", ["Job_No", "Source_Tab", "Detail"])
+    schema = registry.resolve("sheet:Master_Data", ["Job_No", "Detail", "Source_Tab"])
+
+    assert schema.index(SOURCE_TAB) == 2
+    assert [d.describe() for d in registry.drifts] == ["sheet:Master_Data: reordered"]
+
+
+def test_accept_records_own_column_appends_without_drift(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.resolve("sheet:Master_Data", ["Job_No", "Source_Tab"])
+    registry.accept("sheet:Master_Data", ["Job_No", "Source_Tab", "Detail"])
+    schema = registry.resolve("sheet:Master_Data", ["Job_No", "Source_Tab", "Detail"])
+
+    assert schema.index("Detail") == 2
+    assert registry.drifts == []
+
+    registry.save()
+    reloaded = make_registry(tmp_path)
+    reloaded.resolve("sheet:Master_Data", ["Job_No", "Source_Tab", "Detail"])
+    assert reloaded.drifts == []
+    assert reloaded.resolve("tab:1", ["Job No.", "Name"]).index(JOB_NO) == 0
+
+
+def test_concurrent_resolve_and_save(tmp_path):
+    import threading
+
+    registry = make_registry(tmp_path)
+    errors = []
+
+    def resolve_many(prefix):
+        try:
+            for i in range(300):
+                registry.resolve(f"{prefix}:{i % 7}", ["Job_No", f"{prefix} column {i}"])
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=resolve_many, args=(name,)) for name in ("tab", "sheet")]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        registry.save()
+        registry.take_drifts()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    registry.save()
+    reloaded = make_registry(tmp_path)
+    assert reloaded.resolve("tab:6", ["Job_No", "tab column 293"]).index("tab column 293") == 1
+    assert reloaded.take_drifts() == []
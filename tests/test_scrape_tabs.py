@@ -0,0 +1,84 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("gspread")
+pytest.importorskip("selenium")
+
+import main_master_only
+from main_master_only import JobSyncApplication
+
+
+class FakeWatchdog:
+    def __init__(self, recycle_before):
+        self.recycle_before = recycle_before
+        self.pages = 0
+        self.quit_drivers = []
+
+    def recycle_reason(self, driver):
+        return "page budget" if self.pages == self.recycle_before else None
+
+    def quit(self, driver):
+        self.quit_drivers.append(driver)
+
+    def recycled(self, reason):
+        pass
+
+
+class FakeScraper:
+    """Logs in once; every later login fails (edoclite went down mid-run)"""
+
+    def __init__(self, recycle_before):
+        self.watchdog = FakeWatchdog(recycle_before)
+        self.drivers = 0
+        self.logins = 0
+
+    def create_driver(self):
+        self.drivers += 1
+        return f"driver-{self.drivers}"
+
+    def login(self, driver):
+        self.logins += 1
+        return self.logins == 1, driver
+
+
+def make_app(monkeypatch, recycle_before):
+    monkeypatch.setattr(main_master_only.time, 'sleep', lambda seconds: None)
+    app = JobSyncApplication.__new__(JobSyncApplication)
+    app.config = SimpleNamespace(TAB_RETRY_ATTEMPTS=1, TAB_RETRY_BACKOFF=0)
+    app.scraper = FakeScraper(recycle_before)
+    app.checkpoint = SimpleNamespace(save_tab=lambda tab, df, scan_mode: None)
+    app.cancelled = threading.Event()
+
+    def extract(driver, tab, incremental_tabs, existing_future):
+        app.scraper.watchdog.pages += 1
+        return pd.DataFrame({'Job No.': [f"J{tab}"]}), 'full', None
+
+    app._extract_tab = extract
+    app._record_scan = lambda tab, scan_mode, probe: None
+    return app
+
+
+def test_recycle_failure_keeps_finished_tabs(monkeypatch):
+    app = make_app(monkeypatch, recycle_before=2)
+    handled = []
+
+    failed = app._scrape_with_retry([1, 2, 3, 4], set(), None, lambda tab, df, scan_mode: handled.append(tab))
+
+    assert handled == [1, 2]
+    assert failed == [3, 4]
+
+
+def test_scrape_tabs_returns_only_remaining_tabs_after_recycle_failure(monkeypatch):
+    app = make_app(monkeypatch, recycle_before=1)
+    handled = []
+
+    scraped, failed, session_error = app._scrape_tabs([1, 2, 3], set(), None,
+                                                      lambda tab, df, scan_mode: handled.append(tab))
+
+    assert (scraped, handled, failed) == (1, [1], [2, 3])
+    assert session_error == "Login failed after recycling the browser"
+    # the original and the recycled browser are both closed, each once
+    assert app.scraper.watchdog.quit_drivers == ["driver-1", "driver-2"]
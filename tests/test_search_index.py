@@ -0,0 +1,74 @@
+import json
+
+from search_index import SearchIndex, _Postings, normalize
+
+
+def make_index(tmp_path, snapshot_every=2000):
+    return SearchIndex(db_path=str(tmp_path / "search.db"), snapshot_every=snapshot_every)
+
+
+def add_doc(index, **fields):
+    index.add(fields['Job_No'], json.dumps(fields, ensure_ascii=False))
+
+
+def job_nos(result):
+    return [r['job_no'] for r in result['results']]
+
+
+def test_match_requires_every_term_as_substring():
+    index = _Postings()
+    for job_no, detail in (('J1', 'ซ่อมท่อประปา อาคาร A'), ('J2', 'ประปา รั่ว'), ('J3', 'ท่อ ประ ปา')):
+        add_doc(index, Job_No=job_no, Detail=detail)
+
+    terms = normalize('ประปา ท่อ').split()
+    assert [index.job_nos[d] for d in SearchIndex._match(index, terms)] == ['J1']
+    assert [index.job_nos[d] for d in SearchIndex._match(index, ['ท่อประปา'])] == ['J1']
+    # every trigram of "abcd" is in J4, but not as one run
+    add_doc(index, Job_No='J4', Detail='abc bcd')
+    assert SearchIndex._match(index, ['abcd']) == []
+    # terms shorter than a trigram fall back to substring checks
+    assert sorted(index.job_nos[d] for d in SearchIndex._match(index, ['j'])) == ['J1', 'J2', 'J3', 'J4']
+    assert SearchIndex._match(index, ['ไม่มี']) == []
+
+
+def test_replaced_documents_are_not_matched():
+    index = _Postings()
+    add_doc(index, Job_No='J1', Source_Tab='open')
+    add_doc(index, Job_No='J1', Source_Tab='done')
+
+    assert index.tombstones == 1
+    assert SearchIndex._match(index, ['open']) == []
+    assert [index.job_nos[d] for d in SearchIndex._match(index, ['done'])] == ['J1']
+
+
+def test_moves_are_picked_up_by_refresh(tmp_path):
+    writer = make_index(tmp_path)
+    reader = make_index(tmp_path)
+    writer.rebuild([{'Job_No': 'J1', 'Source_Tab': 'Open', 'Detail': 'pump room'},
+                    {'Job_No': 'J2', 'Source_Tab': 'Open', 'Detail': 'roof'}])
+    assert set(job_nos(reader.search('open'))) == {'J1', 'J2'}
+
+    changed = writer.apply_changes([{'Job_No': 'J3', 'Source_Tab': 'Open', 'Detail': 'pump',
+                                     'Last_Updated': '01/01/2026 00:00:00'}],
+                                   [('J1', 'Open', 'Done', 0.0), ('UNKNOWN', 'Open', 'Done', 0.0)])
+
+    assert changed == 2  # J3 added, J1 moved; UNKNOWN was never indexed
+    assert set(job_nos(reader.search('open'))) == {'J2', 'J3'}
+    assert job_nos(reader.search('done')) == ['J1']
+    pump = reader.search('pump')
+    assert set(job_nos(pump)) == {'J1', 'J3'}
+    assert {r['job_no']: r['fields']['Source_Tab'] for r in pump['results']} == {'J1': 'Done', 'J3': 'Open'}
+    assert 'Last_Updated' not in pump['results'][0]['fields']
+    assert pump['indexed'] == 3
+
+
+def test_refresh_reloads_after_rebuild(tmp_path):
+    writer = make_index(tmp_path)
+    reader = make_index(tmp_path)
+    writer.rebuild([{'Job_No': 'J1', 'Detail': 'old'}])
+    assert job_nos(reader.search('old')) == ['J1']
+
+    writer.rebuild([{'Job_No': 'J2', 'Detail': 'new'}])
+
+    assert reader.search('old')['total'] == 0
+    assert job_nos(reader.search('new')) == ['J2']
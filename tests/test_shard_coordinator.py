@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from shard_coordinator import ShardCoordinator
+
+TTL = 0.5
+
+
+def make_node(tmp_path, node_id, max_attempts=3):
+    return ShardCoordinator(db_path=str(tmp_path / "shards.db"), node_id=node_id, lease_ttl=TTL,
+                            max_attempts=max_attempts, max_age_minutes=10)
+
+
+def frame(job_no):
+    return pd.DataFrame({'Job No.': [job_no]})
+
+
+def test_live_lease_is_not_claimed_by_another_node(tmp_path):
+    a, b = make_node(tmp_path, "a"), make_node(tmp_path, "b")
+    assert a.open_round([1, 2]) is False
+    assert b.open_round([1, 2]) is True
+    assert b.round_id == a.round_id
+
+    assert a.claim() == 1
+    assert b.claim() == 2
+    assert a.claim() is None
+    assert a.counts()['live'] == 2
+
+
+def test_expired_lease_is_taken_over_and_late_submit_dropped(tmp_path):
+    a, b = make_node(tmp_path, "a"), make_node(tmp_path, "b")
+    a.open_round([1])
+    b.open_round([1])
+    assert a.claim() == 1
+    assert b.claim() is None
+
+    time.sleep(TTL + 0.1)  # node a stopped renewing
+    assert b.claim() == 1
+    assert a.submit(1, frame('A'), 'full') is False
+    assert b.submit(1, frame('B'), 'full') is True
+
+    tab, df, scan_mode = b.next_result()
+    assert (tab, list(df['Job No.']), scan_mode) == (1, ['B'], 'full')
+    assert b.status()['tabs'][0]['attempts'] == 2
+
+
+def test_tab_fails_after_max_attempts(tmp_path):
+    a = make_node(tmp_path, "a", max_attempts=2)
+    a.open_round([1])
+    for _ in range(2):
+        assert a.claim() == 1
+        a.release(1, "timeout")
+
+    assert a.claim() is None
+    assert a.unwritten_tabs() == [1]
+    assert a.scraping_settled()
+    assert a.status()['tabs'][0]['state'] == 'failed'
+
+
+def test_renew_keeps_writer_lease(tmp_path):
+    a, b = make_node(tmp_path, "a"), make_node(tmp_path, "b")
+    a.open_round([1])
+    b.open_round([1])
+    assert a.try_acquire_writer()
+    assert not b.try_acquire_writer()
+
+    for _ in range(3):
+        time.sleep(TTL / 2)
+        assert a.renew()
+    assert a.holds_writer()
+    assert not b.try_acquire_writer()
+
+
+def test_writer_lease_is_lost_after_expiry(tmp_path):
+    a, b = make_node(tmp_path, "a"), make_node(tmp_path, "b")
+    a.open_round([1])
+    b.open_round([1])
+    assert a.try_acquire_writer()
+
+    time.sleep(TTL + 0.1)
+    assert not a.holds_writer()
+    assert b.try_acquire_writer()
+    assert b.holds_writer()
+    # the old writer cannot renew its way back in
+    assert a.renew() is False
+    assert not a.holds_writer()
@@ -0,0 +1,98 @@
+import os
+
+from sheet_journal import SheetJournal, cell_key, append_key
+
+
+def changes(cells=(), records=(), notifications=()):
+    return {'cell_updates': list(cells), 'new_records': list(records), 'data_headers': ['Detail'],
+            'stats_new_jobs': [], 'stats_moves': [], 'notifications': list(notifications)}
+
+
+def make_journal(tmp_path):
+    return SheetJournal(path=str(tmp_path / "journal.jsonl"))
+
+
+def test_pending_entries_replay_after_restart(tmp_path):
+    journal = make_journal(tmp_path)
+    assert not journal.needs_verify
+    batch_id = journal.record("run-1", [1], changes(cells=[(5, 4, 'Done', 'A')],
+                                                    records=[{'Job_No': 'B', 'Source_Tab': 'Open'}],
+                                                    notifications=["B is new"]))
+    journal.close()
+
+    replayed = make_journal(tmp_path)
+    cells, appends, batches = replayed.pending()
+    assert replayed.needs_verify  # may have reached the sheet before the process died
+    assert [(c['job'], c['row'], c['col'], c['value']) for c in cells] == [('A', 5, 4, 'Done')]
+    assert [a['record']['Job_No'] for a in appends] == ['B']
+    assert [b['id'] for b in batches] == [batch_id]
+    assert batches[0]['notifications'] == ["B is new"]
+    replayed.close()
+
+
+def test_applied_entries_are_not_replayed(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.record("run-1", [1], changes(cells=[(5, 4, 'Done', 'A')], records=[{'Job_No': 'B'}]))
+    cells, appends, _ = journal.pending()
+    journal.mark_applied([c['seq'] for c in cells] + [a['seq'] for a in appends])
+    journal.close()
+
+    replayed = make_journal(tmp_path)
+    cells, appends, batches = replayed.pending()
+    assert (cells, appends) == ([], [])
+    assert not replayed.needs_verify
+    assert len(batches) == 1  # stats/notifications still pending
+    replayed.close()
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.record("run-1", [1], changes(cells=[(5, 4, 'Done', 'A')]))
+    journal.close()
+    with open(journal.path, 'ab') as f:
+        f.write(b'{"op": "batch", "seq": 9')  # power cut mid-write
+
+    replayed = make_journal(tmp_path)
+    assert [c['job'] for c in replayed.pending()[0]] == ['A']
+    replayed.record("run-2", [1], changes(cells=[(6, 4, 'Open', 'C')]))
+    replayed.close()
+
+    again = make_journal(tmp_path)
+    assert [c['job'] for c in again.pending()[0]] == ['A', 'C']
+    again.close()
+
+
+def test_cells_with_same_key_keep_latest_value(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.record("run-1", [1], changes(cells=[(5, 4, 'Open', 'A')]))
+    journal.record("run-1", [2], changes(cells=[(5, 4, 'Done', 'A')]))
+    journal.record("run-1", [2], changes(records=[{'Job_No': 'B'}]))
+    journal.record("run-1", [3], changes(records=[{'Job_No': 'B', 'Detail': 'dup'}]))
+
+    cells, appends, _ = journal.pending()
+    assert [c['value'] for c in cells] == ['Done']
+    assert list(journal.cells) == [cell_key("run-1", 'A', 4)]
+    assert [a['record'] for a in appends] == [{'Job_No': 'B'}]
+    assert list(journal.appends) == [append_key("run-1", 'B')]
+    journal.close()
+
+
+def test_file_is_compacted_once_everything_is_done(tmp_path):
+    journal = make_journal(tmp_path)
+    first = journal.record("run-1", [1], changes(cells=[(5, 4, 'Done', 'A')]))
+    second = journal.record("run-1", [2], changes(records=[{'Job_No': 'B'}]))
+    cells, appends, _ = journal.pending()
+    journal.mark_applied([c['seq'] for c in cells] + [a['seq'] for a in appends])
+
+    journal.mark_done(first)
+    assert os.path.getsize(journal.path) > 0  # second batch still pending
+    journal.mark_done(second)
+    assert os.path.getsize(journal.path) == 0
+    assert journal.pending_count() == 0
+
+    # new entries after compaction are still journaled
+    journal.record("run-2", [1], changes(cells=[(7, 4, 'Open', 'D')]))
+    journal.close()
+    replayed = make_journal(tmp_path)
+    assert [c['job'] for c in replayed.pending()[0]] == ['D']
+    replayed.close()
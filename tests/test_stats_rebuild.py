@@ -0,0 +1,58 @@
+import time
+from datetime import datetime
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pytz")
+
+from snapshot_store import SnapshotStore
+from stats_store import StatsStore, THAILAND_TZ, SHEET_TIME_FORMAT
+
+DAY = 86400
+TAB_NAMES = {1: 'Open', 5: 'Done'}
+
+
+def sheet_time(ts):
+    return datetime.fromtimestamp(ts, THAILAND_TZ).strftime(SHEET_TIME_FORMAT)
+
+
+def frame(*job_nos):
+    return pd.DataFrame({'Job No.': list(job_nos), 'Detail': [f"d-{j}" for j in job_nos]})
+
+
+def test_rebuild_uses_snapshot_history_not_last_updated(tmp_path):
+    now = time.time()
+    t0, t1, t2 = now - 20 * DAY, now - 10 * DAY, now - 1 * DAY
+    snapshots = SnapshotStore(db_path=str(tmp_path / "snapshots.db"))
+    snapshots.record_run({1: frame('A', 'B'), 5: frame('C')}, started_at=t0)
+    snapshots.record_run({1: frame('B'), 5: frame('C', 'A')}, started_at=t1)
+    snapshots.record_run({1: frame('B', 'D')}, started_at=t2)
+
+    entries = snapshots.tab_entry_times()
+    # jobs present since the first snapshot have no known entry time
+    assert entries == {(1, 'B'): None, (1, 'D'): t2, (5, 'C'): None, (5, 'A'): t1}
+
+    first_seen = {'A': t0 - 2 * 3600, 'B': t0 - DAY, 'C': t0 - DAY, 'D': t2}
+    records = [{'Job_No': job_no, 'Source_Tab': tab, 'First_Seen': sheet_time(first_seen[job_no]),
+                'Last_Updated': sheet_time(now)}  # refreshed by every sync
+               for job_no, tab in (('A', 'Done'), ('B', 'Open'), ('C', 'Done'), ('D', 'Open'))]
+    stats = StatsStore(db_path=str(tmp_path / "stats.db"), finished_tab='Done', stale_days=7)
+    stats.rebuild(records, {(TAB_NAMES[tab], job_no): entered for (tab, job_no), entered in entries.items()})
+
+    summary = stats.summary()
+    finish = summary['time_to_finish_hours']
+    assert finish['jobs'] == 1  # only A has a known finish time
+    assert finish['mean'] == pytest.approx((t1 - first_seen['A']) / 3600, abs=0.01)
+    # B's tab entry is unknown and D entered a day ago: neither counts as stale
+    assert summary['stale_jobs_per_tab'] == {}
+    assert summary['jobs_per_tab'] == {'Done': 2, 'Open': 2}
+
+
+def test_padded_job_numbers_do_not_churn(tmp_path):
+    snapshots = SnapshotStore(db_path=str(tmp_path / "snapshots.db"))
+    snapshots.record_run({1: frame(' A ', 'B')})
+    run_id, changes = snapshots.record_run({1: frame(' A ', 'B')})
+
+    assert changes[1] == {'added': [], 'changed': [], 'removed': []}
+    assert set(snapshots.reconstruct(1, run_id)[1]) == {'A', 'B'}
@@ -0,0 +1,42 @@
+import time
+
+from status_store import StatusStore, RunHeartbeat
+
+
+def make_store(tmp_path, lock_ttl=1):
+    return StatusStore(db_path=str(tmp_path / "status.db"), lock_ttl=lock_ttl, spill_path="")
+
+
+def test_heartbeat_keeps_lock_past_ttl(tmp_path):
+    store = make_store(tmp_path)
+    owner = store.try_acquire_run("worker-1")
+    assert owner == "worker-1"
+
+    with RunHeartbeat(store, owner, interval=0.2) as heartbeat:
+        time.sleep(2.5)  # well past lock_ttl
+        assert store.try_acquire_run("worker-2") is None
+        assert store.snapshot()['is_running'] is True
+        assert not heartbeat.lost.is_set()
+
+    assert store.release_run(owner)
+    assert store.try_acquire_run("worker-2") == "worker-2"
+
+
+def test_lock_expires_without_heartbeat(tmp_path):
+    store = make_store(tmp_path)
+    assert store.try_acquire_run("worker-1")
+    time.sleep(1.2)
+    assert store.snapshot()['is_running'] is False
+    assert store.try_acquire_run("worker-2") == "worker-2"
+
+
+def test_heartbeat_reports_lost_lock(tmp_path):
+    store = make_store(tmp_path)
+    owner = store.try_acquire_run("worker-1")
+
+    with RunHeartbeat(store, owner, interval=0.1) as heartbeat:
+        store.release_run(owner)
+        store.try_acquire_run("worker-2")
+        assert heartbeat.lost.wait(2)
+
+    assert not store.heartbeat(owner)